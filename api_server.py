@@ -0,0 +1,433 @@
+"""Headless HTTP/JSON API over the inventory database.
+
+Serves articles, stock, assignments and transfers to other offices without the
+Tk application. Reads go through DatabaseManager's WAL reader pool, writes
+through its single serialized writer, so the API and the desktop app can share
+one database file.
+
+Responses carry an ETag built from ``PRAGMA data_version`` (read on a dedicated
+probe connection, where it changes whenever any other connection commits), so
+a client repeating a request with ``If-None-Match`` gets ``304 Not Modified``
+without the query running again. Lists use opaque cursor pagination
+(``?cursor=...&limit=...``) and responses are gzipped when the client accepts it.
+
+Usage (from the repository root):
+
+    python api_server.py --db gestion_patrimonial.db --port 8080
+
+    GET  /api/articulos?familia=2&limit=100      GET  /api/articulos/<id>
+    GET  /api/articulos/<id>/historial?page=0    GET  /api/stock?bajo_minimo=1
+    GET  /api/asignaciones?activas=1&agente=7    GET  /api/transferencias?articulo=42
+    GET  /api/buscar?q=notebook
+    POST /api/movimientos   {"id_articulo": 1, "cantidad": 5, "tipo_movimiento": "entrada"}
+    POST /api/asignaciones  {"id_articulo": 1, "id_agente": 7}
+    POST /api/ordenes/<id>/recepcion  {"id_ubicacion": 3, "series": {"<id_detalle>": ["SN1", "SN2"]}}
+"""
+import argparse
+import base64
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from database import purchase_receiving, search
+from database.database_manager import DatabaseManager
+from database.event_bus import EventBus
+from database.history_service import HistoryService
+from database.reference_cache import ReferenceCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+GZIP_MIN_BYTES = 1024
+
+# name -> (SELECT ... FROM ... [JOINs], key column, {query parameter: SQL condition})
+RESOURCES = {
+    'articulos': ('''
+        SELECT a.id_articulo, a.nombre_articulo, a.descripcion, a.id_subfamilia, a.id_marca,
+               a.id_proveedor, a.id_estado, a.precio_compra, s.cantidad AS stock, a.es_activo_fijo
+        FROM articulos a
+        LEFT JOIN stock s ON a.id_articulo = s.id_articulo
+    ''', 'a.id_articulo', {
+        'familia': "a.id_subfamilia IN (SELECT id_subfamilia FROM subfamilia WHERE id_familia = ?)",
+        'subfamilia': "a.id_subfamilia = ?",
+        'estado': "a.id_estado = ?",
+        'proveedor': "a.id_proveedor = ?",
+    }),
+    'stock': ('''
+        SELECT s.id_articulo, a.nombre_articulo, s.cantidad, sm.stock_minimo, s.fecha_ultimo_movimiento
+        FROM stock s
+        JOIN articulos a ON a.id_articulo = s.id_articulo
+        LEFT JOIN stock_minimo sm ON sm.id_articulo = s.id_articulo
+    ''', 's.id_articulo', {
+        'bajo_minimo': "(? = '1') = (s.cantidad <= sm.stock_minimo)",
+    }),
+    'asignaciones': ('''
+        SELECT ea.id_asignacion, ea.id_articulo, a.nombre_articulo, ea.id_agente, ag.nombre_agente,
+               ea.fecha_asignacion, ea.fecha_devolucion, ea.estado, ea.observaciones
+        FROM equipo_asignado ea
+        JOIN articulos a ON a.id_articulo = ea.id_articulo
+        JOIN agentes ag ON ag.id_agente = ea.id_agente
+    ''', 'ea.id_asignacion', {
+        'articulo': "ea.id_articulo = ?",
+        'agente': "ea.id_agente = ?",
+        'activas': "(? = '1') = (ea.fecha_devolucion IS NULL)",
+    }),
+    'transferencias': ('''
+        SELECT t.id_transferencia, t.id_articulo, a.nombre_articulo, t.agente_origen, t.agente_destino,
+               t.departamento_origen, t.departamento_destino, t.fecha_transferencia, t.motivo,
+               t.estado_transferencia, t.observaciones
+        FROM transferencias t
+        JOIN articulos a ON a.id_articulo = t.id_articulo
+    ''', 't.id_transferencia', {
+        'articulo': "t.id_articulo = ?",
+        'agente': "t.agente_destino = ?",
+        'estado': "t.estado_transferencia = ?",
+    }),
+}
+
+# name -> {id column: (reference kind, name column)} filled from the reference cache
+NAME_COLUMNS = {
+    'articulos': {
+        'id_familia': ('familia', 'nombre_familia'),
+        'id_subfamilia': ('subfamilia', 'nombre_subfamilia'),
+        'id_marca': ('marca', 'nombre_marca'),
+        'id_proveedor': ('proveedor', 'nombre_proveedor'),
+        'id_estado': ('estado', 'estado'),
+    },
+}
+
+
+class APIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _is_integer(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor):
+    """Return the integer key stored in ``cursor`` (every resource pages on an integer id)."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeDecodeError):
+        raise APIError(HTTPStatus.BAD_REQUEST, "Invalid cursor")
+    if not _is_integer(key):
+        raise APIError(HTTPStatus.BAD_REQUEST, "Invalid cursor")
+    return key
+
+
+def _int_parameter(query, name, default, maximum=None):
+    try:
+        value = int(query.get(name, [default])[0])
+    except ValueError:
+        raise APIError(HTTPStatus.BAD_REQUEST, f"'{name}' must be an integer")
+    if value < 0:
+        raise APIError(HTTPStatus.BAD_REQUEST, f"'{name}' must not be negative")
+    return min(value, maximum) if maximum else value
+
+
+class InventoryAPI:
+    """Request handling independent of the HTTP plumbing."""
+
+    def __init__(self, db_path, readers=4):
+        self.db_manager = DatabaseManager(db_path, readers=readers)
+        self.event_bus = EventBus(self.db_manager)
+        self.history = HistoryService(self.db_manager)
+        self.history.attach(self.event_bus)
+        self.references = ReferenceCache(db_path)
+        self.references.attach(self.db_manager)
+        # data_version only moves for commits made by *other* connections, so the
+        # probe must be a connection that never writes
+        self._probe = sqlite3.connect(db_path, check_same_thread=False)
+        self._probe_lock = threading.Lock()
+        # ETags from a previous server process must never match
+        self.instance = f"{os.getpid():x}{int(time.time()):x}"
+
+    def close(self):
+        self.event_bus.close()
+        self.references.close()
+        self._probe.close()
+        self.db_manager.close()
+
+    def data_version(self):
+        with self._probe_lock:
+            return self._probe.execute("PRAGMA data_version").fetchone()[0]
+
+    def etag(self, target):
+        # The writer's commits bump the probe's data_version like anyone else's
+        return f'W/"{self.instance}-{self.data_version()}-{abs(hash(target)):x}"'
+
+    def _rows(self, name, query, params):
+        with self.db_manager.reader() as conn:
+            cursor = conn.execute(query, params)
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        if name == 'articulos':
+            familias = self.references.parents('subfamilia')
+            for row in rows:
+                row['id_familia'] = familias.get(row['id_subfamilia'])
+        if name in NAME_COLUMNS:
+            self.references.add_names(rows, NAME_COLUMNS[name])
+        return rows
+
+    def list_resource(self, name, query):
+        base, key, filters = RESOURCES[name]
+        limit = _int_parameter(query, 'limit', DEFAULT_LIMIT, MAX_LIMIT) or DEFAULT_LIMIT
+        conditions, params = [], []
+        for parameter, condition in filters.items():
+            if parameter in query:
+                conditions.append(condition)
+                params.append(query[parameter][0])
+        if 'cursor' in query:
+            conditions.append(f"{key} > ?")
+            params.append(decode_cursor(query['cursor'][0]))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        rows = self._rows(name, f"{base} {where} ORDER BY {key} LIMIT ?", params + [limit + 1])
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        key_name = key.split('.')[-1]
+        return {
+            'data': rows,
+            'next_cursor': encode_cursor(rows[-1][key_name]) if has_more else None,
+        }
+
+    def get_resource(self, name, id_value):
+        base, key, _ = RESOURCES[name]
+        rows = self._rows(name, f"{base} WHERE {key} = ?", (id_value,))
+        if not rows:
+            raise APIError(HTTPStatus.NOT_FOUND, f"{name} {id_value} not found")
+        return rows[0]
+
+    def history_page(self, id_articulo, query):
+        page = _int_parameter(query, 'page', 0)
+        page_size = _int_parameter(query, 'page_size', 50, MAX_LIMIT) or 50
+        # The ETag follows data_version; so must the cached timelines
+        self.history.sync(self.data_version())
+        events, has_more = self.history.page(id_articulo, page, page_size)
+        columns = ('tipo_evento', 'fecha_evento', 'persona_relacionada', 'detalles')
+        return {
+            'data': [dict(zip(columns, event)) for event in events],
+            'next_page': page + 1 if has_more else None,
+        }
+
+    def search(self, query):
+        text = query.get('q', [''])[0]
+        limit = _int_parameter(query, 'limit', 20, 100) or 20
+        columns = ('entidad', 'id_registro', 'id_articulo', 'titulo', 'detalle', 'rank')
+        with self.db_manager.reader() as conn:
+            rows = search.search(conn, text, limit)
+        return {'data': [dict(zip(columns, row)) for row in rows]}
+
+    def create_movement(self, body):
+        for field in ('id_articulo', 'cantidad', 'tipo_movimiento'):
+            if field not in body:
+                raise APIError(HTTPStatus.BAD_REQUEST, f"'{field}' is required")
+        if body['tipo_movimiento'] not in ('entrada', 'salida'):
+            raise APIError(HTTPStatus.BAD_REQUEST, "'tipo_movimiento' must be 'entrada' or 'salida'")
+        if not _is_integer(body['cantidad']) or body['cantidad'] <= 0:
+            raise APIError(HTTPStatus.BAD_REQUEST, "'cantidad' must be a positive integer")
+        with self.db_manager.transaction() as conn:
+            id_movimiento = conn.execute('''
+            INSERT INTO movimientos (id_articulo, cantidad, tipo_movimiento, fecha_movimiento,
+                                     id_usuario, id_ubicacion, observaciones)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                body['id_articulo'], body['cantidad'], body['tipo_movimiento'],
+                body.get('fecha_movimiento') or date.today().isoformat(),
+                body.get('id_usuario'), body.get('id_ubicacion'), body.get('observaciones'),
+            )).lastrowid
+        self.event_bus.publish_stock_change(body['id_articulo'])
+        return {'id_movimiento': id_movimiento}
+
+    def create_assignment(self, body):
+        for field in ('id_articulo', 'id_agente'):
+            if field not in body:
+                raise APIError(HTTPStatus.BAD_REQUEST, f"'{field}' is required")
+        with self.db_manager.transaction() as conn:
+            id_asignacion = conn.execute('''
+            INSERT INTO equipo_asignado (id_articulo, id_agente, fecha_asignacion, estado,
+                                         observaciones, id_usuario_asignacion)
+            VALUES (?, ?, ?, 'Asignado', ?, ?)
+            ''', (
+                body['id_articulo'], body['id_agente'], body.get('fecha_asignacion') or date.today().isoformat(),
+                body.get('observaciones'), body.get('id_usuario'),
+            )).lastrowid
+        self.event_bus.publish_assignment(id_asignacion, body['id_articulo'], body['id_agente'], body.get('id_usuario'))
+        return {'id_asignacion': id_asignacion}
+
+    def receive_order(self, id_orden, body):
+        try:
+            series = {int(id_detalle): numbers for id_detalle, numbers in (body.get('series') or {}).items()}
+        except (AttributeError, ValueError):
+            raise APIError(HTTPStatus.BAD_REQUEST, "'series' must map line ids to lists of serial numbers")
+        try:
+            receipt = purchase_receiving.receive_order(
+                self.db_manager, id_orden, body.get('id_usuario'), body.get('fecha'), body.get('id_ubicacion'),
+                body.get('responsable_id'), series, body.get('lineas'), self.event_bus,
+            )
+        except KeyError as e:
+            raise APIError(HTTPStatus.NOT_FOUND, str(e.args[0]))
+        except ValueError as e:
+            raise APIError(HTTPStatus.CONFLICT, str(e))
+        return receipt._asdict()
+
+    def route_get(self, parts, query):
+        if parts == ['buscar']:
+            return self.search(query)
+        if not parts or parts[0] not in RESOURCES:
+            raise APIError(HTTPStatus.NOT_FOUND, "Unknown resource")
+        if len(parts) == 1:
+            return self.list_resource(parts[0], query)
+        try:
+            id_value = int(parts[1])
+        except ValueError:
+            raise APIError(HTTPStatus.NOT_FOUND, "Unknown resource")
+        if len(parts) == 2:
+            return self.get_resource(parts[0], id_value)
+        if parts[0] == 'articulos' and parts[2:] == ['historial']:
+            return self.history_page(id_value, query)
+        raise APIError(HTTPStatus.NOT_FOUND, "Unknown resource")
+
+    def route_post(self, parts, body):
+        if parts == ['movimientos']:
+            return self.create_movement(body)
+        if parts == ['asignaciones']:
+            return self.create_assignment(body)
+        if len(parts) == 3 and parts[0] == 'ordenes' and parts[2] == 'recepcion' and parts[1].isdigit():
+            return self.receive_order(int(parts[1]), body)
+        raise APIError(HTTPStatus.NOT_FOUND, "Unknown resource")
+
+
+class APIRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'GestionPatrimonialAPI/1.0'
+    # Headers and body go out in separate writes; with Nagle on, the body waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    @property
+    def api(self):
+        return self.server.api
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _parts(self, path):
+        parts = [part for part in path.split('/') if part]
+        if not parts or parts[0] != 'api':
+            raise APIError(HTTPStatus.NOT_FOUND, "Unknown resource")
+        return parts[1:]
+
+    def _send_json(self, status, payload, etag=None):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        headers = {'Content-Type': 'application/json; charset=utf-8', 'Cache-Control': 'no-cache'}
+        if etag:
+            headers['ETag'] = etag
+        if len(body) >= GZIP_MIN_BYTES and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+            headers['Vary'] = 'Accept-Encoding'
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, error):
+        self._send_json(error.status, {'error': str(error)})
+
+    def do_GET(self):
+        try:
+            url = urlsplit(self.path)
+            parts = self._parts(url.path)
+            etag = self.api.etag(self.path)
+            if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            payload = self.api.route_get(parts, parse_qs(url.query))
+            self._send_json(HTTPStatus.OK, payload, etag)
+        except APIError as e:
+            self._send_error(e)
+        except Exception as e:
+            logger.error(f"Error serving GET {self.path}: {str(e)}", exc_info=True)
+            self._send_error(APIError(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal error"))
+
+    def do_POST(self):
+        try:
+            parts = self._parts(urlsplit(self.path).path)
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                raise APIError(HTTPStatus.BAD_REQUEST, "Body must be JSON")
+            if not isinstance(body, dict):
+                raise APIError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+            try:
+                payload = self.api.route_post(parts, body)
+            except sqlite3.IntegrityError as e:
+                raise APIError(HTTPStatus.CONFLICT, str(e))
+            self._send_json(HTTPStatus.CREATED, payload)
+        except APIError as e:
+            self._send_error(e)
+        except Exception as e:
+            logger.error(f"Error serving POST {self.path}: {str(e)}", exc_info=True)
+            self._send_error(APIError(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal error"))
+
+
+class APIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 makes bursts of new connections wait for a SYN retransmit
+    request_queue_size = 128
+
+    def __init__(self, address, api):
+        super().__init__(address, APIRequestHandler)
+        self.api = api
+
+
+def create_server(db_path, host='127.0.0.1', port=8080, readers=4):
+    """Build (but do not start) a server; port 0 picks a free port."""
+    return APIServer((host, port), InventoryAPI(db_path, readers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the inventory over HTTP/JSON")
+    parser.add_argument('--db', default='gestion_patrimonial.db')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--readers', type=int, default=4, help="WAL reader connections")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = create_server(args.db, args.host, args.port, args.readers)
+    logger.info(f"Serving {args.db} on http://{args.host}:{server.server_address[1]}/api/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.api.close()
+
+
+if __name__ == "__main__":
+    main()
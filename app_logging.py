@@ -0,0 +1,219 @@
+"""Non-blocking logging pipeline for the desktop application.
+
+Loggers only put records on a bounded in-memory queue (``QueueHandler``); a
+``QueueListener`` thread formats them and does the file and console I/O, so a
+slow disk never stalls the Tk mainloop. Records are queued unformatted, which
+keeps ``%``-style argument formatting off the calling thread as well, unless an
+argument is mutable (a parameter list, a dict): those messages are rendered
+before queueing so later changes cannot leak into the log. When the queue is
+full, records are dropped and counted instead of blocking.
+
+The log file is rotated when it reaches ``max_bytes`` and at local midnight,
+keeping at most ``backup_count`` files and none older than ``max_age_days``.
+With ``json_lines`` the file holds one JSON object per record instead of text.
+
+``QueryLogSampler`` is the DatabaseManager query hook: errors and slow queries
+are always logged, the rest is sampled and rate-limited.
+
+Usage:
+
+    listener = setup_logging(level=logging.INFO, json_lines=True)
+    db_manager.add_query_hook(QueryLogSampler(logging.getLogger('gestion_patrimonial.sql')))
+    ...
+    listener.stop()
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
+CONSOLE_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_IMMUTABLE = (str, int, float, bytes, type(None))
+
+
+def _frozen(value):
+    return isinstance(value, _IMMUTABLE) or (isinstance(value, tuple) and all(_frozen(item) for item in value))
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks and never formats on the caller's thread."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The stock prepare() renders the message here; the listener does it instead.
+        # Traceback text is captured now, while the exception is still current.
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        args = record.args.values() if isinstance(record.args, dict) else record.args or ()
+        if isinstance(record.args, dict) or not all(_frozen(arg) for arg in args):
+            # The caller may mutate the argument (QueryLogSampler's params list)
+            # before the listener gets to it: render the message now
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Roll over on size or at local midnight, pruning backups by count and age."""
+
+    def __init__(self, filename, max_bytes=5 * 1024 * 1024, backup_count=20, max_age_days=30, encoding='utf-8'):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding, delay=True)
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        # A file left by a previous day's session rolls over on its first record
+        start = os.path.getmtime(filename) if os.path.exists(filename) else time.time()
+        self.rollover_at = self._next_midnight(start)
+        self.prune()
+
+    @staticmethod
+    def _next_midnight(timestamp):
+        day = datetime.fromtimestamp(timestamp).replace(hour=0, minute=0, second=0, microsecond=0)
+        return (day + timedelta(days=1)).timestamp()
+
+    def shouldRollover(self, record):
+        if record.created >= self.rollover_at and os.path.exists(self.baseFilename):
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = self._next_midnight(time.time())
+        self.prune()
+
+    def prune(self):
+        """Delete rotated files beyond the retention age."""
+        if not self.max_age:
+            return
+        cutoff = time.time() - self.max_age
+        for number in range(1, self.backupCount + 1):
+            path = f"{self.baseFilename}.{number}"
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'where': f"{record.filename}:{record.lineno}",
+            'thread': record.threadName,
+        }
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(log_dir='logs', level=logging.INFO, console=True, json_lines=False,
+                  max_bytes=5 * 1024 * 1024, backup_count=20, max_age_days=30, queue_size=10000):
+    """Route every logger through one queue to a rotating file (and the console).
+
+    Replaces the root logger's handlers, so module loggers (``database.*``)
+    share the pipeline. Returns the started ``QueueListener``; call ``stop()``
+    on exit to flush what is still queued.
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    if json_lines:
+        file_handler = SizeAndTimeRotatingFileHandler(
+            os.path.join(log_dir, 'app.jsonl'), max_bytes, backup_count, max_age_days)
+        file_handler.setFormatter(JsonLinesFormatter())
+    else:
+        file_handler = SizeAndTimeRotatingFileHandler(
+            os.path.join(log_dir, 'app.log'), max_bytes, backup_count, max_age_days)
+        file_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    handlers = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        handlers.append(console_handler)
+
+    log_queue = queue.Queue(queue_size)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(DroppingQueueHandler(log_queue))
+    root.setLevel(level)
+    return listener
+
+
+class QueryLogSampler:
+    """DatabaseManager query hook that logs errors, slow queries and a sample of the rest.
+
+    Errors are logged at ERROR and queries slower than ``slow_ms`` at WARNING,
+    both limited to ``max_per_second`` records (a token bucket). Of the other
+    queries every ``sample_every``-th one is logged at DEBUG, and only when
+    DEBUG is enabled. Suppressed records are counted and reported in the next
+    record that gets through.
+    """
+
+    def __init__(self, logger, sample_every=100, slow_ms=200, max_per_second=20):
+        self.logger = logger
+        self.sample_every = sample_every
+        self.slow = slow_ms / 1000
+        self.max_per_second = max_per_second
+        self._lock = threading.Lock()
+        self._tokens = float(max_per_second)
+        self._refilled = time.monotonic()
+        self._seen = 0
+        self.suppressed = 0
+
+    def _allow(self):
+        now = time.monotonic()
+        with self._lock:
+            self._tokens = min(self.max_per_second, self._tokens + (now - self._refilled) * self.max_per_second)
+            self._refilled = now
+            if self._tokens < 1:
+                self.suppressed += 1
+                return 0
+            self._tokens -= 1
+            suppressed, self.suppressed = self.suppressed, 0
+            return suppressed + 1
+
+    def __call__(self, query, params, elapsed, error):
+        if error is not None:
+            level, message = logging.ERROR, "Query failed after %.2f ms (%s): %s %s"
+            args = (elapsed * 1000, error, query, params or '')
+        elif elapsed >= self.slow:
+            level, message = logging.WARNING, "Slow query (%.2f ms): %s %s"
+            args = (elapsed * 1000, query, params or '')
+        else:
+            self._seen += 1
+            if self._seen % self.sample_every or not self.logger.isEnabledFor(logging.DEBUG):
+                return
+            level, message = logging.DEBUG, "Sampled query (1 in %d) in %.2f ms: %s %s"
+            args = (self.sample_every, elapsed * 1000, query, params or '')
+        if not self.logger.isEnabledFor(level):
+            return
+        allowed = self._allow()
+        if not allowed:
+            return
+        if allowed > 1:
+            message += " [%d query log records suppressed]"
+            args += (allowed - 1,)
+        self.logger.log(level, message, *args)
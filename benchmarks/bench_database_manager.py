@@ -0,0 +1,77 @@
+"""Micro-benchmark: queries per second before and after the pooled DatabaseManager.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_database_manager --rows 50000 --queries 20000
+"""
+import argparse
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from database.database_manager import DatabaseManager
+
+
+def build_database(db_path, rows):
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE articulos (id_articulo INTEGER PRIMARY KEY, nombre_articulo TEXT, precio_compra REAL)")
+    conn.executemany(
+        "INSERT INTO articulos VALUES (?, ?, ?)",
+        ((i, f"Articulo {i}", i * 1.5) for i in range(1, rows + 1)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_execute_query(db_path, log, query, params):
+    """What every query used to cost: a fresh connection plus eager f-string logging."""
+    log.debug(f"Executing query: {query}")
+    if params:
+        log.debug(f"With parameters: {params}")
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+
+
+def run(label, execute, ids):
+    query = "SELECT id_articulo, nombre_articulo, precio_compra FROM articulos WHERE id_articulo = ?"
+    start = time.perf_counter()
+    for article_id in ids:
+        execute(query, (article_id,))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<45} {len(ids) / elapsed:>12,.0f} queries/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=20000)
+    args = parser.parse_args()
+
+    # Logger at INFO, like a production session: DEBUG calls must be cheap no-ops
+    log = logging.getLogger('bench')
+    log.addHandler(logging.NullHandler())
+    log.setLevel(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        build_database(db_path, args.rows)
+        ids = [random.randint(1, args.rows) for _ in range(args.queries)]
+
+        run("before: connect per query + f-string logging", lambda q, p: legacy_execute_query(db_path, log, q, p), ids)
+
+        manager = DatabaseManager(db_path)
+        run("after: pooled DatabaseManager, no hooks", manager.execute_query, ids)
+
+        manager.add_query_hook(lambda query, params, elapsed, error: None)
+        run("after: pooled DatabaseManager, timing hook", manager.execute_query, ids)
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
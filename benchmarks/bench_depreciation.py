@@ -0,0 +1,65 @@
+"""Benchmark: value a synthetic fixed-asset register with the vectorized engine.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_depreciation --assets 1000000 --months 12
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from database.depreciation import AssetRegister, DECLINING_BALANCE, STRAIGHT_LINE, save_valuation
+
+
+def synthetic_register(assets, seed=42):
+    rng = np.random.default_rng(seed)
+    cost = rng.uniform(100, 50000, assets).round(2)
+    return AssetRegister(
+        ids=np.arange(1, assets + 1, dtype=np.int64),
+        cost=cost,
+        salvage=(cost * rng.uniform(0, 0.2, assets)).round(2),
+        life_months=rng.integers(1, 21, assets) * 12,
+        start_month=np.datetime64('2010-01', 'M').astype(np.int64) + rng.integers(0, 180, assets),
+        method=rng.choice([STRAIGHT_LINE, DECLINING_BALANCE], assets).astype(np.int8),
+    )
+
+
+def timed(label, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    print(f"{label:<40} {time.perf_counter() - start:8.3f} s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--assets', type=int, default=1000000)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--save', action='store_true', help="Also time the bulk write-back to SQLite")
+    args = parser.parse_args()
+
+    register = timed(f"build register ({args.assets:,} assets)", synthetic_register, args.assets)
+    book, accumulated = timed("value as of 2025-12-31", register.value_as_of, '2025-12-31')
+    last = np.datetime64('2025-01', 'M') + (args.months - 1)
+    timed(f"monthly series ({args.months} months)", register.monthly_series, '2025-01', str(last))
+    print(f"total book value {book.sum():,.2f}, accumulated {accumulated.sum():,.2f}")
+
+    if args.save:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+            conn.execute(
+                "CREATE TABLE valuacion_activos (id_articulo INTEGER NOT NULL, fecha_valuacion DATE NOT NULL, "
+                "valor_libros REAL NOT NULL, depreciacion_acumulada REAL NOT NULL, "
+                "PRIMARY KEY (fecha_valuacion, id_articulo)) WITHOUT ROWID"
+            )
+            with conn:
+                timed("write back (executemany)", save_valuation, conn, register, '2025-12-31', book, accumulated)
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
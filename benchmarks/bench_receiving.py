@@ -0,0 +1,139 @@
+"""Benchmark: receive a large purchase order in one batch vs line by line.
+
+Builds a small synthetic database, adds a purchase order of ``--lines`` lines
+(fixed assets get serial numbers for every unit), and receives it on two
+copies of the database: once the way the tabs do it (every movement, serial
+and patrimony number its own insert and commit, the stock triggers firing per
+row) and once with ``purchase_receiving.receive_order``. The resulting stock,
+family summary and patrimony counts are compared, so a mismatch fails the run.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_receiving --lines 10000
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from database import synthetic_data
+from database.database_manager import DatabaseManager
+from database.purchase_receiving import allocate_patrimony_numbers, receive_order
+
+FECHA = '2026-01-15'
+
+
+def create_order(db_path, lines, seed=42):
+    """Insert an order of ``lines`` lines; returns ``(id_orden, series)``."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    articles = conn.execute("SELECT id_articulo, COALESCE(es_activo_fijo, 0), id_proveedor FROM articulos").fetchall()
+    with conn:
+        id_orden = conn.execute('''
+        INSERT INTO orden_compra (id_proveedor, numero_orden, fecha_orden, monto_total, estado, id_usuario_creacion)
+        VALUES (?, 'OC-BENCH-0001', ?, 0, 'Emitida', 1)
+        ''', (articles[0][2], FECHA)).lastrowid
+        rows = []
+        for _ in range(lines):
+            id_articulo, fixed, _ = rng.choice(articles)
+            cantidad = rng.randint(1, 4) if fixed else rng.randint(1, 50)
+            rows.append((id_orden, f"Artículo {id_articulo}", cantidad, round(rng.uniform(10, 2000), 2), id_articulo))
+        conn.executemany('''
+        INSERT INTO detalle_orden (id_orden, descripcion_articulo, cantidad, precio_unitario, id_articulo)
+        VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        fixed_lines = conn.execute('''
+        SELECT d.id_detalle, d.cantidad FROM detalle_orden d JOIN articulos a ON a.id_articulo = d.id_articulo
+        WHERE d.id_orden = ? AND a.es_activo_fijo = 1
+        ''', (id_orden,)).fetchall()
+    conn.close()
+    series = {id_detalle: [f"BENCH-{id_detalle}-{unit}" for unit in range(cantidad)]
+              for id_detalle, cantidad in fixed_lines}
+    return id_orden, series
+
+
+def receive_line_by_line(db_manager, id_orden, series):
+    """One insert and commit per movement, serial and patrimony number, as entered through the tabs."""
+    lines = db_manager.execute_query(
+        "SELECT d.id_detalle, d.id_articulo, d.cantidad, COALESCE(a.es_activo_fijo, 0) "
+        "FROM detalle_orden d JOIN articulos a ON a.id_articulo = d.id_articulo WHERE d.id_orden = ?",
+        (id_orden,)
+    )
+    for id_detalle, id_articulo, cantidad, fixed in lines:
+        db_manager.execute_query(
+            "INSERT INTO movimientos (id_articulo, cantidad, tipo_movimiento, fecha_movimiento) "
+            "VALUES (?, ?, 'entrada', ?)", (id_articulo, cantidad, FECHA), is_select=False)
+        for numero in series.get(id_detalle, ()):
+            db_manager.execute_query(
+                "INSERT INTO numeros_serie (id_articulo, numero_serie) VALUES (?, ?)",
+                (id_articulo, numero), is_select=False)
+        for _ in range(cantidad if fixed else 0):
+            with db_manager.transaction() as conn:
+                numero, = allocate_patrimony_numbers(conn, 1)
+                conn.execute("INSERT INTO numeros_patrimonio (id_articulo, numero_patrimonio, estado) "
+                             "VALUES (?, ?, 'Activo')", (id_articulo, numero))
+        db_manager.execute_query("UPDATE detalle_orden SET recibido = 1, fecha_recepcion = ? WHERE id_detalle = ?",
+                                 (FECHA, id_detalle), is_select=False)
+
+
+def state(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return (
+            conn.execute("SELECT id_articulo, cantidad FROM stock ORDER BY id_articulo").fetchall(),
+            # valor_total is a running float sum; the two runs add it up in a different order
+            conn.execute("SELECT id_familia, total_stock, articulos_con_stock, ROUND(valor_total, 2), filas_valoradas "
+                         "FROM resumen_inventario_familia ORDER BY id_familia").fetchall(),
+            conn.execute("SELECT COUNT(*), MAX(numero_patrimonio) FROM numeros_patrimonio").fetchone(),
+            conn.execute("SELECT COUNT(*) FROM numeros_serie").fetchone(),
+            conn.execute("SELECT COUNT(*) FROM movimientos").fetchone(),
+        )
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=10000)
+    parser.add_argument('--scale', type=float, default=0.01, help="synthetic database scale")
+    parser.add_argument('--template', default='gestion_empresa.db')
+    parser.add_argument('--skip-line-by-line', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        batch_db = os.path.join(tmp, 'batch.db')
+        synthetic_data.create_database(batch_db, args.template, scale=args.scale, overwrite=True)
+        id_orden, series = create_order(batch_db, args.lines)
+        single_db = os.path.join(tmp, 'single.db')
+        shutil.copy(batch_db, single_db)
+        units = sum(row[0] for row in sqlite3.connect(batch_db).execute(
+            "SELECT SUM(cantidad) FROM detalle_orden WHERE id_orden = ?", (id_orden,)))
+        print(f"order of {args.lines:,} lines, {units:,} units, "
+              f"{sum(len(numbers) for numbers in series.values()):,} serial numbers")
+
+        db_manager = DatabaseManager(batch_db)
+        start = time.perf_counter()
+        receipt = receive_order(db_manager, id_orden, id_usuario=1, fecha=FECHA, series=series)
+        batch_time = time.perf_counter() - start
+        db_manager.close()
+        print(f"{'receive_order (one transaction)':<34} {batch_time:8.2f} s {args.lines / batch_time:>10,.0f} lines/s "
+              f"(patrimony {'..'.join(receipt.patrimony or ('-',))})")
+
+        if not args.skip_line_by_line:
+            db_manager = DatabaseManager(single_db)
+            start = time.perf_counter()
+            receive_line_by_line(db_manager, id_orden, series)
+            single_time = time.perf_counter() - start
+            db_manager.close()
+            print(f"{'line by line (commit per insert)':<34} {single_time:8.2f} s "
+                  f"{args.lines / single_time:>10,.0f} lines/s   {single_time / batch_time:.0f}x slower")
+            if state(batch_db) != state(single_db):
+                raise SystemExit("stock, summary or patrimony differ between the two runs")
+            print("stock, family summary, serial and patrimony numbers match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Benchmark: dashboard aggregations on the live database vs a memory-mapped snapshot.
+
+Builds a synthetic database (``--scale 0.2`` is 1 million movements), exports
+a snapshot, and computes the dashboard figures both ways: with SQL over
+``vista_inventario_completo``, ``movimientos`` and the assignments, and with
+``snapshot_export.dashboard`` over the memory-mapped columns. The figures are
+compared, so a mismatch fails the run. Then ``--new`` movements are added and
+the incremental refresh is timed against a full re-export.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_snapshot --scale 0.2
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from database import synthetic_data
+from database.database_manager import DatabaseManager
+from database.snapshot_export import Snapshot, dashboard, export_snapshot
+
+SQL_FIGURES = {
+    'stock_por_familia': '''
+    SELECT nombre_familia, SUM(stock_actual) FROM vista_inventario_completo
+    WHERE nombre_familia IS NOT NULL GROUP BY nombre_familia HAVING SUM(stock_actual)
+    ''',
+    'valor_por_familia': '''
+    SELECT nombre_familia, SUM(stock_actual * precio_compra) FROM vista_inventario_completo
+    WHERE nombre_familia IS NOT NULL GROUP BY nombre_familia HAVING SUM(stock_actual * precio_compra)
+    ''',
+    'entradas_por_mes': '''
+    SELECT substr(fecha_movimiento, 1, 7), SUM(cantidad) FROM movimientos
+    WHERE tipo_movimiento = 'entrada' GROUP BY 1 ORDER BY 1
+    ''',
+    'salidas_por_mes': '''
+    SELECT substr(fecha_movimiento, 1, 7), SUM(cantidad) FROM movimientos
+    WHERE tipo_movimiento = 'salida' GROUP BY 1 ORDER BY 1
+    ''',
+    'asignados_por_departamento': '''
+    SELECT d.nombre_departamento, COUNT(*)
+    FROM equipo_asignado ea
+    JOIN articulos a ON ea.id_articulo = a.id_articulo
+    JOIN agentes ag ON ea.id_agente = ag.id_agente
+    LEFT JOIN agente_departamento ad ON ag.id_agente = ad.id_agente AND ad.es_principal = 1
+    LEFT JOIN departamentos d ON ad.id_departamento = d.id_departamento
+    WHERE ea.estado = 'Asignado' AND d.nombre_departamento IS NOT NULL
+    GROUP BY d.nombre_departamento
+    ''',
+}
+
+
+def sql_dashboard(conn):
+    figures = {name: dict(conn.execute(query)) for name, query in SQL_FIGURES.items()}
+    figures['bajo_minimo'] = conn.execute(
+        "SELECT COUNT(*) FROM vista_inventario_completo WHERE stock_actual <= stock_minimo"
+    ).fetchone()[0]
+    return figures
+
+
+def same(expected, actual):
+    if isinstance(expected, dict):
+        return expected.keys() == actual.keys() and all(
+            abs(expected[key] - actual[key]) <= 1e-6 * max(1, abs(expected[key])) for key in expected
+        )
+    return expected == actual
+
+
+def timed(label, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed * 1000:10.1f} ms")
+    return elapsed, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=float, default=0.2, help="synthetic database scale")
+    parser.add_argument('--template', default='gestion_empresa.db')
+    parser.add_argument('--new', type=int, default=10000, help="movements added before the incremental refresh")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        snapshot_path = os.path.join(tmp, 'snapshot')
+        counts = synthetic_data.create_database(db_path, args.template, scale=args.scale, overwrite=True)
+        print(f"{counts.get('movimientos', 0):,} movements, {counts.get('articulos', 0):,} articles\n")
+        db_manager = DatabaseManager(db_path)
+
+        timed("full export", export_snapshot, db_manager, snapshot_path)
+        conn = sqlite3.connect(db_path)
+        sql_time, expected = timed("dashboard in SQL (live database)", sql_dashboard, conn)
+        load_time, snapshot = timed("open snapshot (memory map)", Snapshot, snapshot_path)
+        snapshot_time, figures = timed("dashboard from snapshot", dashboard, snapshot)
+        for name, value in expected.items():
+            if not same(value, figures[name]):
+                raise SystemExit(f"{name} differs between SQL and the snapshot")
+        print(f"figures match; snapshot is {sql_time / (load_time + snapshot_time):.0f}x faster\n")
+
+        with db_manager.transaction() as writer:
+            articles = [row[0] for row in writer.execute("SELECT id_articulo FROM articulos LIMIT 1000")]
+            writer.executemany(
+                "INSERT INTO movimientos (id_articulo, cantidad, tipo_movimiento, fecha_movimiento) "
+                "VALUES (?, 1, 'entrada', '2026-01-15')",
+                ((articles[n % len(articles)],) for n in range(args.new))
+            )
+        timed(f"incremental refresh (+{args.new:,} movements)", export_snapshot, db_manager, snapshot_path)
+        timed("full re-export", export_snapshot, db_manager, snapshot_path, None, True)
+        conn.close()
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
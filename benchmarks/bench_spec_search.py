@@ -0,0 +1,191 @@
+"""Benchmark: specification filters and facet counts, self-joins vs SpecIndex.
+
+Builds a scratch database with ``--articles`` articles carrying every one of
+the benchmark specifications (``--articles 500000`` is 3 million
+``articulo_especificacion`` rows) and runs the same filters both ways: as the
+N-way self-join over ``articulo_especificacion`` the application would write
+today, and through the in-memory ``SpecIndex``. Counts are compared, so a
+mismatch fails the run.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_spec_search --articles 500000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from database.spec_index import Range, SpecIndex
+
+SPECIFICATIONS = [
+    ('Memoria RAM (GB)', 'numero', [4, 8, 16, 32, 64]),
+    ('Almacenamiento (GB)', 'numero', [128, 256, 512, 1000, 2000]),
+    ('Procesador', 'texto', ['Intel Core i3', 'Intel Core i5', 'Intel Core i7', 'AMD Ryzen 5', 'AMD Ryzen 7']),
+    ('Pantalla (pulgadas)', 'numero', [13.3, 14, 15.6, 21.5, 24, 27]),
+    ('Sistema operativo', 'texto', ['Windows 10', 'Windows 11', 'Ubuntu 22.04', 'Sin sistema']),
+    ('Garantía (meses)', 'numero', [6, 12, 24, 36]),
+]
+
+# Same tables and indexes as the application schema
+SCHEMA = [
+    '''
+    CREATE TABLE especificaciones (
+        id_especificacion INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre_especificacion TEXT NOT NULL,
+        tipo_dato TEXT NOT NULL,
+        descripcion TEXT,
+        obligatorio BOOLEAN DEFAULT 0,
+        activo BOOLEAN DEFAULT 1
+    )
+    ''',
+    '''
+    CREATE TABLE articulo_especificacion (
+        id_articulo INTEGER NOT NULL,
+        id_especificacion INTEGER NOT NULL,
+        valor TEXT NOT NULL,
+        fecha_registro DATE NOT NULL,
+        PRIMARY KEY (id_articulo, id_especificacion)
+    )
+    ''',
+    "CREATE INDEX idx_articulo_especificacion_articulo ON articulo_especificacion(id_articulo)",
+    "CREATE INDEX idx_articulo_especificacion_valor ON articulo_especificacion(valor)",
+]
+
+QUERIES = [
+    ('RAM >= 16 and i7', {
+        'Memoria RAM (GB)': Range(16),
+        'Procesador': 'Intel Core i7',
+    }),
+    ('4 attributes', {
+        'Memoria RAM (GB)': Range(16),
+        'Procesador': ['Intel Core i7', 'AMD Ryzen 7'],
+        'Pantalla (pulgadas)': Range(None, 15.6),
+        'Almacenamiento (GB)': Range(512),
+    }),
+    ('6 attributes', {
+        'Memoria RAM (GB)': Range(8, 32),
+        'Procesador': ['Intel Core i5', 'Intel Core i7'],
+        'Pantalla (pulgadas)': Range(14, 24),
+        'Almacenamiento (GB)': Range(256),
+        'Sistema operativo': 'Windows 11',
+        'Garantía (meses)': Range(12),
+    }),
+]
+
+
+def build_database(db_path, articles, seed=42):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    for sql in SCHEMA:
+        conn.execute(sql)
+    spec_ids = [
+        (conn.execute("INSERT INTO especificaciones (nombre_especificacion, tipo_dato) VALUES (?, ?)",
+                      (name, kind)).lastrowid, values)
+        for name, kind, values in SPECIFICATIONS
+    ]
+    conn.executemany(
+        "INSERT INTO articulo_especificacion VALUES (?, ?, ?, '2025-12-31')",
+        ((id_articulo, spec_id, str(rng.choice(values)))
+         for id_articulo in range(1, articles + 1) for spec_id, values in spec_ids),
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    return conn
+
+
+def join_query(conn, filters):
+    """The self-join form: one articulo_especificacion alias per filtered specification."""
+    spec_ids = dict(conn.execute("SELECT nombre_especificacion, id_especificacion FROM especificaciones"))
+    joins, conditions, params = [], [], []
+    for n, (name, condition) in enumerate(filters.items()):
+        alias = f"f{n}"
+        joins.append(f"articulo_especificacion {alias}" + (f" ON {alias}.id_articulo = f0.id_articulo" if n else ''))
+        conditions.append(f"{alias}.id_especificacion = ?")
+        params.append(spec_ids[name])
+        if isinstance(condition, Range):
+            if condition.minimum is not None:
+                conditions.append(f"CAST({alias}.valor AS REAL) >= ?")
+                params.append(condition.minimum)
+            if condition.maximum is not None:
+                conditions.append(f"CAST({alias}.valor AS REAL) <= ?")
+                params.append(condition.maximum)
+        else:
+            values = condition if isinstance(condition, list) else [condition]
+            conditions.append(f"{alias}.valor IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+    return f"SELECT f0.id_articulo FROM {' JOIN '.join(joins)} WHERE {' AND '.join(conditions)}", params
+
+
+def sql_facets(conn, filters):
+    """Facet counts in SQL: per specification, GROUP BY valor over the articles matching the other filters."""
+    result = {}
+    for name, id_especificacion in conn.execute("SELECT nombre_especificacion, id_especificacion FROM especificaciones"):
+        others = {key: value for key, value in filters.items() if key != name}
+        if others:
+            subquery, params = join_query(conn, others)
+            where = f"AND id_articulo IN ({subquery})"
+        else:
+            where, params = '', []
+        result[name] = dict(conn.execute(
+            f"SELECT valor, COUNT(*) FROM articulo_especificacion WHERE id_especificacion = ? {where} GROUP BY valor",
+            [id_especificacion] + params,
+        ))
+    return result
+
+
+def timed(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--articles', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'specs.db')
+        start = time.perf_counter()
+        conn = build_database(db_path, args.articles)
+        rows = conn.execute("SELECT COUNT(*) FROM articulo_especificacion").fetchone()[0]
+        print(f"{rows:,} specification rows for {args.articles:,} articles "
+              f"(generated in {time.perf_counter() - start:.1f} s)")
+
+        build, index = timed(lambda: SpecIndex.build(conn), 1)
+        size = sum(
+            (bitmap.bit_length() + 7) // 8 for spec in index.specifications.values() for bitmap in spec.bitmaps.values()
+        )
+        print(f"SpecIndex built in {build:.2f} s, {size / 1024 / 1024:.1f} MiB of bitmaps\n")
+
+        print(f"{'query':<20} {'matches':>9} {'self-join ms':>13} {'index ms':>9} {'speed-up':>9}")
+        for label, filters in QUERIES:
+            query, params = join_query(conn, filters)
+            join_time, join_rows = timed(lambda: conn.execute(query, params).fetchall(), args.repeat)
+            index_time, ids = timed(lambda: index.search(filters), args.repeat)
+            if sorted(row[0] for row in join_rows) != ids:
+                raise SystemExit(f"{label}: self-join returned {len(join_rows)} articles, index {len(ids)}")
+            print(f"{label:<20} {len(ids):>9,} {join_time * 1000:>13.1f} {index_time * 1000:>9.1f} "
+                  f"{join_time / index_time:>8.0f}x")
+
+        label, filters = QUERIES[1]
+        join_time, expected = timed(lambda: sql_facets(conn, filters), 1)
+        index_time, facets = timed(lambda: index.facets(filters), args.repeat)
+        for name, counts in facets.items():
+            if dict(counts) != expected[name]:
+                raise SystemExit(f"facet counts differ for {name}")
+        print(f"{'facets (' + label + ')':<20} {'':>9} {join_time * 1000:>13.1f} {index_time * 1000:>9.1f} "
+              f"{join_time / index_time:>8.0f}x")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Startup benchmark: time to first paint and time to interactive, lazy vs eager tabs.
+
+Needs a display (or Xvfb). Each run is a fresh interpreter, so import costs count.
+Run from the repository root:
+
+    python -m benchmarks.bench_startup --db gestion_empresa.db --runs 5
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(lazy):
+    start = time.perf_counter()
+    import tkinter as tk
+    import main
+
+    root = tk.Tk()
+    app = main.GestionPatrimonialApp(root, lazy_tabs=lazy)
+    painted = {}
+    root.bind('<Map>', lambda event: painted.setdefault('t', time.perf_counter()), add='+')
+    root.update()
+    root.wait_visibility(root)
+    first_paint = painted.get('t', time.perf_counter()) - start
+
+    # Interactive: the selected tab is built and pending idle work has run
+    deadline = start + 60
+    while app.notebook.select() in app.pending_tabs and time.perf_counter() < deadline:
+        root.update()
+    root.update_idletasks()
+    interactive = time.perf_counter() - start
+
+    app.on_close()
+    print(json.dumps({'first_paint': first_paint, 'interactive': interactive}))
+
+
+def run(db, lazy, runs):
+    results = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            if db:
+                shutil.copy2(db, os.path.join(workdir, 'gestion_patrimonial.db'))
+            env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_startup', '--child', 'lazy' if lazy else 'eager'],
+                cwd=workdir, env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help="Database to copy as gestion_patrimonial.db for each run")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child', choices=['lazy', 'eager'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child == 'lazy')
+        return
+
+    for label, lazy in (('eager tabs', False), ('lazy tabs', True)):
+        results = run(os.path.abspath(args.db) if args.db else None, lazy, args.runs)
+        paint = statistics.median(r['first_paint'] for r in results) * 1000
+        ready = statistics.median(r['interactive'] for r in results) * 1000
+        print(f"{label:<12} first paint {paint:8.1f} ms   interactive {ready:8.1f} ms   (median of {args.runs})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Load test: drive the HTTP/JSON API with concurrent clients.
+
+Starts ``api_server`` in-process on a free port against ``--db`` (or targets an
+already running instance with ``--url``), then runs ``--clients`` threads for
+``--duration`` seconds. Each client walks list pages through their cursors,
+re-requests pages with ``If-None-Match`` as a polling client would, opens
+article details and histories, and optionally posts stock movements.
+
+Run from the repository root:
+
+    python -m benchmarks.load_test_api --db datos_sinteticos.db --clients 16 --duration 20
+"""
+import argparse
+import gzip
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import api_server
+
+LIST_PATHS = [
+    '/api/articulos?limit=100',
+    '/api/stock?limit=100',
+    '/api/stock?bajo_minimo=1&limit=100',
+    '/api/asignaciones?activas=1&limit=100',
+    '/api/transferencias?limit=100',
+]
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.status = {}
+        self.bytes = 0
+        self.errors = 0
+
+    def add(self, kind, elapsed, status, size):
+        with self.lock:
+            self.latencies.setdefault(kind, []).append(elapsed)
+            self.status[status] = self.status.get(status, 0) + 1
+            self.bytes += size
+
+
+def request(base_url, path, stats, kind, etag=None, body=None):
+    headers = {'Accept-Encoding': 'gzip'}
+    if etag:
+        headers['If-None-Match'] = etag
+    data = None
+    if body is not None:
+        data = json.dumps(body).encode('utf-8')
+        headers['Content-Type'] = 'application/json'
+    req = urllib.request.Request(base_url + path, data=data, headers=headers)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            raw = response.read()
+            status = response.status
+            etag = response.headers.get('ETag')
+            encoding = response.headers.get('Content-Encoding')
+    except urllib.error.HTTPError as e:
+        raw, status, etag, encoding = e.read(), e.code, e.headers.get('ETag'), None
+    except Exception:
+        with stats.lock:
+            stats.errors += 1
+        return None, None, None
+    stats.add(kind, time.perf_counter() - start, status, len(raw))
+    if status == 304 or not raw:
+        return status, etag, None
+    if encoding == 'gzip':
+        raw = gzip.decompress(raw)
+    return status, etag, json.loads(raw)
+
+
+def client(base_url, stats, deadline, articles, writes, seed):
+    rng = random.Random(seed)
+    etags = {}
+    while time.monotonic() < deadline:
+        roll = rng.random()
+        if roll < 0.45:
+            path = rng.choice(LIST_PATHS)
+            for _ in range(rng.randint(1, 5)):
+                status, etag, payload = request(base_url, path, stats, 'list')
+                if etag:
+                    etags[path] = etag
+                if not payload or not payload.get('next_cursor'):
+                    break
+                path = path.split('&cursor=')[0] + f"&cursor={payload['next_cursor']}"
+        elif roll < 0.70 and etags:
+            # Polling clients revalidate what they already have
+            path, etag = rng.choice(list(etags.items()))
+            request(base_url, path, stats, 'conditional', etag=etag)
+        elif roll < 0.85 and articles:
+            request(base_url, f"/api/articulos/{rng.choice(articles)}", stats, 'detail')
+        elif roll < 0.95 and articles:
+            request(base_url, f"/api/articulos/{rng.choice(articles)}/historial", stats, 'history')
+        elif writes and articles:
+            request(base_url, '/api/movimientos', stats, 'write', body={
+                'id_articulo': rng.choice(articles), 'cantidad': rng.randint(1, 5), 'tipo_movimiento': 'entrada',
+            })
+        else:
+            request(base_url, '/api/buscar?q=' + rng.choice(['notebook', 'monitor', 'switch']), stats, 'search')
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='datos_sinteticos.db', help="database to serve in-process")
+    parser.add_argument('--url', help="target a running server instead, e.g. http://127.0.0.1:8080")
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writes', action='store_true', help="also POST stock movements")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        server = api_server.create_server(args.db, port=0, readers=args.readers)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    stats = Stats()
+    _, _, page = request(base_url, '/api/articulos?limit=1000', Stats(), 'warmup')
+    articles = [row['id_articulo'] for row in (page or {}).get('data', [])]
+
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(target=client, args=(base_url, stats, deadline, articles, args.writes, n))
+        for n in range(args.clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    if server:
+        server.shutdown()
+        server.server_close()
+        server.api.close()
+
+    total = sum(len(values) for values in stats.latencies.values())
+    print(f"{total} requests in {elapsed:.1f} s with {args.clients} clients: {total / elapsed:,.0f} req/s, "
+          f"{stats.bytes / 1024 / 1024:.1f} MiB on the wire, {stats.errors} connection errors")
+    print(f"status codes: {dict(sorted(stats.status.items()))}")
+    print(f"{'kind':<12} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for kind, values in sorted(stats.latencies.items()):
+        print(f"{kind:<12} {len(values):>7} {statistics.median(values) * 1000:>8.1f} "
+              f"{percentile(values, 0.95) * 1000:>8.1f} {percentile(values, 0.99) * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
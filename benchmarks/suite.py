@@ -0,0 +1,316 @@
+"""End-to-end benchmark suite over a (synthetic) production-scale database.
+
+Times the first screen of every view, every tab's load query (keyset first page
+plus row count, as LazyTreeview does it), global search, point-in-time stock,
+a burst of stock movements (rolled back) and a bulk CSV import into a scratch
+database. Runs headless; nothing here imports Tk.
+
+Results can be stored as a baseline and later runs compared against it: a case
+whose median is slower than the baseline by more than ``--tolerance`` (and by at
+least ``--min-delta`` ms) is reported as a regression and the exit code is 1.
+
+Run from the repository root:
+
+    python -m database.synthetic_data --db datos_sinteticos.db --scale 0.1
+    python -m benchmarks.suite --db datos_sinteticos.db --save-baseline
+    python -m benchmarks.suite --db datos_sinteticos.db            # compare with the baseline
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from database import search, stock_ledger, synthetic_data
+from database.bulk_import import BulkImporter
+from database.data_source import KeysetDataSource
+from database.database_manager import DatabaseManager
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baselines', 'suite.json')
+
+# label -> (table or view, key column, columns); mirrors what each tab loads
+TAB_QUERIES = {
+    'Categorías': ('categoria', 'id_categoria', ['id_categoria', 'nombre_categoria']),
+    'Familias': ('familia', 'id_familia', ['id_familia', 'nombre_familia']),
+    'Subfamilias': ('subfamilia', 'id_subfamilia', ['id_subfamilia', 'id_familia', 'nombre_subfamilia']),
+    'Artículos': ('vista_inventario_completo', 'id_articulo', [
+        'id_articulo', 'nombre_articulo', 'nombre_familia', 'nombre_subfamilia', 'nombre_marca',
+        'nombre_proveedor', 'stock_actual', 'precio_compra', 'estado',
+    ]),
+    'Patrimonio': ('numeros_patrimonio', 'id_numero_patrimonio', [
+        'id_numero_patrimonio', 'id_articulo', 'numero_patrimonio', 'ubicacion', 'estado',
+    ]),
+    'Agentes': ('agentes', 'id_agente', ['id_agente', 'nombre_agente', 'cargo', 'email']),
+    'Marcas': ('marcas', 'id_marca', ['id_marca', 'nombre_marca']),
+    'Proveedores': ('proveedores', 'id_proveedor', ['id_proveedor', 'nombre_proveedor', 'contacto']),
+    'Stock': ('stock', 'id_articulo', ['id_articulo', 'cantidad', 'fecha_ultimo_movimiento']),
+    'Números de Serie': ('numeros_serie', 'id_numero_serie', ['id_numero_serie', 'id_articulo', 'numero_serie']),
+}
+
+SEARCH_TERMS = ['notebook', 'switch hp', 'SN0000', 'PAT-0001', 'gonzalez']
+
+
+class Suite:
+    """Registry of named cases; each case is timed ``repeat`` times after one warm-up run."""
+
+    def __init__(self, repeat=5):
+        self.repeat = repeat
+        self.cases = []
+
+    def add(self, group, name, function, repeat=None):
+        self.cases.append((f"{group}/{name}", function, repeat or self.repeat))
+
+    def run(self, selected=None):
+        results = {}
+        for name, function, repeat in self.cases:
+            if selected and not any(pattern in name for pattern in selected):
+                continue
+            try:
+                function()
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    function()
+                    timings.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                print(f"{name:<60} ERROR {str(e)}")
+                results[name] = {'error': str(e)}
+                continue
+            timings.sort()
+            results[name] = {
+                'median_ms': round(statistics.median(timings), 3),
+                'min_ms': round(timings[0], 3),
+                'max_ms': round(timings[-1], 3),
+                'runs': repeat,
+            }
+            print(f"{name:<60} {results[name]['median_ms']:>10.2f} ms")
+        return results
+
+
+def database_profile(conn):
+    tables = ('articulos', 'movimientos', 'equipo_asignado', 'mantenimiento', 'transferencias')
+    profile = {}
+    for table in tables:
+        try:
+            profile[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        except sqlite3.Error:
+            profile[table] = None
+    return profile
+
+
+def view_cases(suite, db_manager, full):
+    with db_manager.reader() as conn:
+        views = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'view' ORDER BY name"
+        )]
+
+    for view in views:
+        def first_screen(view=view):
+            return db_manager.execute_query(f"SELECT * FROM {view} LIMIT 100")
+        suite.add('view', view, first_screen)
+
+        if full:
+            def full_fetch(view=view):
+                with db_manager.reader() as conn:
+                    cursor = conn.execute(f"SELECT * FROM {view}")
+                    while cursor.fetchmany(5000):
+                        pass
+            suite.add('view_full', view, full_fetch, repeat=1)
+
+
+def tab_cases(suite, db_manager):
+    with db_manager.reader() as conn:
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+    for label, (table, key, columns) in TAB_QUERIES.items():
+        if table not in existing:
+            continue
+        source = KeysetDataSource(db_manager, table, key, columns)
+
+        def load(source=source):
+            source.invalidate()
+            source.fetch_after(None, 100)
+            source.count()
+        suite.add('tab', label, load)
+
+
+def lookup_cases(suite, db_manager, rng):
+    with db_manager.reader() as conn:
+        articles = [row[0] for row in conn.execute("SELECT id_articulo FROM articulos ORDER BY random() LIMIT 50")]
+        has_search = search.is_installed(conn)
+        has_ledger = stock_ledger.is_installed(conn)
+    if not articles:
+        return
+
+    if has_search:
+        for term in SEARCH_TERMS:
+            def run_search(term=term):
+                with db_manager.reader() as conn:
+                    search.search(conn, term)
+            suite.add('search', term, run_search)
+
+    def history():
+        db_manager.execute_query(
+            "SELECT * FROM vista_historial_equipo WHERE id_articulo = ?", (rng.choice(articles),)
+        )
+    suite.add('article', 'vista_historial_equipo', history)
+
+    if has_ledger:
+        def point_in_time():
+            with db_manager.reader() as conn:
+                stock_ledger.stock_at(conn, rng.choice(articles), '2024-06-30')
+        suite.add('article', 'stock_at', point_in_time)
+
+
+def write_cases(suite, db_manager, rng, movements):
+    """Stock movements run through every trigger and are then rolled back."""
+    with db_manager.reader() as conn:
+        articles = [row[0] for row in conn.execute("SELECT id_articulo FROM articulos ORDER BY random() LIMIT 1000")]
+    if not articles:
+        return
+    rows = [(rng.choice(articles), rng.randint(1, 20), 'entrada', '2025-12-31') for _ in range(movements)]
+
+    def stock_updates():
+        with db_manager.writer() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT INTO movimientos (id_articulo, cantidad, tipo_movimiento, fecha_movimiento) "
+                    "VALUES (?, ?, ?, ?)", rows
+                )
+            finally:
+                conn.execute("ROLLBACK")
+    suite.add('write', f"stock_movements_x{movements}", stock_updates)
+
+
+def import_case(suite, template, rows, workdir):
+    """Bulk import of ``rows`` articles into a small scratch database (recreated every run)."""
+    csv_path = os.path.join(workdir, 'articulos.csv')
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['nombre_articulo', 'subfamilia', 'marca', 'proveedor', 'precio_compra', 'es_activo_fijo'])
+        for n in range(rows):
+            writer.writerow([f"Importado {n}", 'Notebooks', 'HP', 'Proveedor 00001 S.A.', '1000.50', '1'])
+
+    scratch_template = os.path.join(workdir, 'plantilla.db')
+    synthetic_data.create_database(scratch_template, template, scale=0.001, overwrite=True)
+
+    def bulk_import():
+        scratch = os.path.join(workdir, 'importacion.db')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(scratch + suffix):
+                os.remove(scratch + suffix)
+        source = sqlite3.connect(scratch_template)
+        target = sqlite3.connect(scratch)
+        source.backup(target)
+        source.close()
+        target.close()
+        db_manager = DatabaseManager(scratch, readers=0)
+        try:
+            stats = BulkImporter(db_manager, 'articulos').run(csv_path)
+            if stats.inserted != rows:
+                raise RuntimeError(f"imported {stats.inserted} of {rows} rows")
+        finally:
+            db_manager.close()
+    suite.add('write', f"bulk_import_x{rows}", bulk_import, repeat=1)
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """Return the list of (case, baseline ms, current ms) regressions."""
+    regressions = []
+    print()
+    print(f"{'case':<60} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or 'median_ms' not in previous or 'median_ms' not in current:
+            continue
+        before, after = previous['median_ms'], current['median_ms']
+        change = (after - before) / before if before else 0.0
+        flag = ''
+        if after > before * (1 + tolerance) and after - before >= min_delta:
+            regressions.append((name, before, after))
+            flag = '  REGRESSION'
+        print(f"{name:<60} {before:>10.2f} {after:>10.2f} {change:>+7.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless end-to-end benchmark suite")
+    parser.add_argument('--db', default='datos_sinteticos.db')
+    parser.add_argument('--generate', type=float, metavar='SCALE', default=None,
+                        help="(re)create --db with synthetic data at this scale first")
+    parser.add_argument('--template', default='gestion_empresa.db')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--full', action='store_true', help="also time fetching every row of every view")
+    parser.add_argument('--movements', type=int, default=1000)
+    parser.add_argument('--import-rows', type=int, default=20000)
+    parser.add_argument('--only', nargs='*', help="run only cases whose name contains one of these")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument('--min-delta', type=float, default=1.0, help="ignore slowdowns below this many ms")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # database.setup_database configures INFO logging on import; keep the timing table readable
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    if args.generate is not None:
+        synthetic_data.create_database(args.db, args.template, args.generate, args.seed, overwrite=True)
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} does not exist (use --generate SCALE)")
+
+    rng = random.Random(args.seed)
+    db_manager = DatabaseManager(args.db)
+    try:
+        with db_manager.reader() as conn:
+            profile = database_profile(conn)
+        print(f"Database {args.db}: {profile}")
+        suite = Suite(args.repeat)
+        view_cases(suite, db_manager, args.full)
+        tab_cases(suite, db_manager)
+        lookup_cases(suite, db_manager, rng)
+        write_cases(suite, db_manager, rng, args.movements)
+        with tempfile.TemporaryDirectory() as workdir:
+            if args.import_rows:
+                import_case(suite, args.template, args.import_rows, workdir)
+            results = suite.run(args.only)
+    finally:
+        db_manager.close()
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'database': profile,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'machine': platform.platform(),
+        'results': results,
+    }
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('database') != profile:
+        print(f"Warning: baseline was taken on a different data set {baseline.get('database')}")
+    regressions = compare(results, baseline, args.tolerance, args.min_delta)
+    if regressions:
+        print(f"{len(regressions)} regressions")
+        sys.exit(1)
+    print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,325 @@
-import sqlite3
+"""Integrity and consistency checker for the inventory database.
+
+Every check runs in a process pool over read-only connections, split per table
+(and, for the stock reconciliation, per range of article ids), so a large
+database is checked on all cores without blocking writers:
+
+* ``quick_check``: ``PRAGMA quick_check(table)`` for every table;
+* ``foreign_key_check``: declared foreign keys, per table;
+* ``orphans``: references the schema does not declare as foreign keys;
+* ``legacy_tables``: pre-consolidation tables that still hold their own rows;
+* ``stock``: ``stock.cantidad`` against the sum of the movement ledger;
+* ``aggregates``: the trigger-maintained summaries against a recomputation;
+* ``duplicates``: serial and patrimony numbers registered more than once.
+
+The report is JSON with one entry per check, its problem count, a sample of
+the offending rows and its timing. The exit status is 1 if anything failed.
+
+Usage (from the repository root):
+
+    python check_db.py --db gestion_patrimonial.db --output reports/check_db.json
+    python check_db.py --db gestion_patrimonial.db --workers 8 --skip quick_check
+"""
+import argparse
+import json
+import logging
 import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from urllib.parse import quote
+
+from database import aggregates
+from database.stock_ledger import DELTA_SQL
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_SIZE = 20
+
+# (table, column, referenced table, referenced column) for references without a FOREIGN KEY
+UNDECLARED_REFERENCES = [
+    ('historial_estado', 'usuario', 'usuarios', 'id_usuario'),
+    ('stock_snapshot', 'id_articulo', 'articulos', 'id_articulo'),
+    ('alertas_stock_actuales', 'id_articulo', 'articulos', 'id_articulo'),
+    ('resumen_inventario_familia', 'id_familia', 'familia', 'id_familia'),
+]
+
+# legacy table -> table its rows were consolidated into (migration 3 turns them into views)
+LEGACY_TABLES = {
+    'familias': 'familia',
+    'subfamilias': 'subfamilia',
+    'numero_serie': 'numeros_serie',
+    'numero_patrimonio': 'numeros_patrimonio',
+    'movimientos_stock': 'movimientos',
+    'categorias': 'categoria',
+}
+
+# (table, code column): codes compared trimmed and case-insensitively
+UNIQUE_CODES = [
+    ('numeros_serie', 'numero_serie'),
+    ('numeros_patrimonio', 'numero_patrimonio'),
+]
+
+_conn = None
+
+
+def connect_read_only(db_path):
+    conn = sqlite3.connect(f"file:{quote(os.path.abspath(db_path))}?mode=ro", uri=True)
+    conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+def _init_worker(db_path):
+    global _conn
+    _conn = connect_read_only(db_path)
+
+
+def _table_exists(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone() is not None
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _sample(rows):
+    return [list(row) if isinstance(row, tuple) else row for row in rows[:SAMPLE_SIZE]]
+
+
+# -- checks (run in the worker processes) --------------------------------
+#
+# Each returns (number of problems, sample rows); the caller adds timing.
+
+def check_quick(table):
+    rows = _conn.execute(f'PRAGMA quick_check("{table}")').fetchall()
+    problems = [row[0] for row in rows if row[0] != 'ok']
+    return len(problems), problems[:SAMPLE_SIZE]
+
+
+def check_foreign_keys(table):
+    rows = _conn.execute(f'PRAGMA foreign_key_check("{table}")').fetchall()
+    # (table, rowid, referenced table, foreign key index)
+    return len(rows), _sample(rows)
+
 
-def check_database():
-    db_path = 'gestion_empresa.db'
-    
+def check_orphans(table, column, parent, parent_column):
+    if not (_table_exists(_conn, table) and _table_exists(_conn, parent)):
+        return 0, []
+    if column not in _columns(_conn, table):
+        return 0, []
+    # Grouped by the missing key: some of these tables are WITHOUT ROWID
+    rows = _conn.execute(f'''
+    SELECT t.{column}, COUNT(*) FROM {table} t
+    WHERE t.{column} IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM {parent} p WHERE p.{parent_column} = t.{column})
+    GROUP BY t.{column}
+    ORDER BY COUNT(*) DESC
+    ''').fetchall()
+    # (missing key, referencing rows)
+    return sum(row[1] for row in rows), _sample(rows)
+
+
+def check_legacy_table(legacy, current):
+    if not _table_exists(_conn, legacy):
+        return 0, []
+    count = _conn.execute(f"SELECT COUNT(*) FROM {legacy}").fetchone()[0]
+    if not count:
+        return 0, []
+    return count, [f"{legacy} is still a table with {count} rows; its data belongs in {current} (run migrations)"]
+
+
+def check_stock(first_id, last_id):
+    """Articles in [first_id, last_id] whose stock row disagrees with the summed ledger."""
+    rows = _conn.execute(f'''
+    WITH libro AS (
+        SELECT id_articulo, SUM({DELTA_SQL}) AS cantidad FROM movimientos
+        WHERE id_articulo BETWEEN :desde AND :hasta
+        GROUP BY id_articulo
+    )
+    SELECT l.id_articulo, l.cantidad, s.cantidad
+    FROM libro l LEFT JOIN stock s ON s.id_articulo = l.id_articulo
+    WHERE l.cantidad != COALESCE(s.cantidad, 0)
+    UNION ALL
+    SELECT s.id_articulo, 0, s.cantidad FROM stock s
+    WHERE s.id_articulo BETWEEN :desde AND :hasta AND s.cantidad != 0
+      AND NOT EXISTS (SELECT 1 FROM libro l WHERE l.id_articulo = s.id_articulo)
+    ORDER BY 1
+    ''', {'desde': first_id, 'hasta': last_id}).fetchall()
+    # (id_articulo, ledger quantity, stock quantity)
+    return len(rows), _sample(rows)
+
+
+def check_aggregates():
+    if not aggregates.is_installed(_conn):
+        return 0, []
+    differences = aggregates.verify(_conn)
+    return len(differences), differences[:SAMPLE_SIZE]
+
+
+def check_duplicates(table, column):
+    if not _table_exists(_conn, table):
+        return 0, []
+    rows = _conn.execute(f'''
+    SELECT UPPER(TRIM({column})) AS codigo, COUNT(*), GROUP_CONCAT(id_articulo)
+    FROM {table}
+    WHERE {column} IS NOT NULL AND TRIM({column}) != ''
+    GROUP BY codigo HAVING COUNT(*) > 1
+    ORDER BY COUNT(*) DESC
+    ''').fetchall()
+    # (code, occurrences, article ids)
+    return len(rows), _sample(rows)
+
+
+CHECKS = {
+    'quick_check': check_quick,
+    'foreign_key_check': check_foreign_keys,
+    'orphans': check_orphans,
+    'legacy_tables': check_legacy_table,
+    'stock': check_stock,
+    'aggregates': check_aggregates,
+    'duplicates': check_duplicates,
+}
+
+
+def _run(check, target, args):
+    start = time.perf_counter()
+    try:
+        problems, sample = CHECKS[check](*args)
+        status = 'failed' if problems else 'ok'
+        error = None
+    except sqlite3.Error as e:
+        problems, sample, status, error = 0, [], 'error', str(e)
+    result = {
+        'check': check,
+        'target': target,
+        'status': status,
+        'problems': problems,
+        'sample': sample,
+        'seconds': round(time.perf_counter() - start, 4),
+    }
+    if error:
+        result['error'] = error
+    return result
+
+
+# -- planning (parent process) -----------------------------------------------
+
+def plan(conn, workers, skip=()):
+    """List the (check, target, args) tasks for this database."""
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' "
+        "AND sql NOT LIKE 'CREATE VIRTUAL%' ORDER BY name"
+    )]
+    tasks = []
+
+    if _table_exists(conn, 'movimientos') and _table_exists(conn, 'stock') and 'stock' not in skip:
+        first, last = conn.execute(
+            "SELECT MIN(id), MAX(id) FROM (SELECT MIN(id_articulo) AS id FROM movimientos UNION ALL "
+            "SELECT MAX(id_articulo) FROM movimientos UNION ALL SELECT MIN(id_articulo) FROM stock "
+            "UNION ALL SELECT MAX(id_articulo) FROM stock)"
+        ).fetchone()
+        if first is not None:
+            # A few ranges per worker keep the pool busy when the ledger is skewed
+            parts = max(1, workers * 2)
+            step = max(1, (last - first + parts) // parts)
+            for start in range(first, last + 1, step):
+                end = min(last, start + step - 1)
+                tasks.append(('stock', f"articulos {start}-{end}", (start, end)))
+
+    if 'quick_check' not in skip:
+        tasks.extend(('quick_check', table, (table,)) for table in tables)
+    if 'foreign_key_check' not in skip:
+        tasks.extend(
+            ('foreign_key_check', table, (table,)) for table in tables
+            if conn.execute(f'PRAGMA foreign_key_list("{table}")').fetchone()
+        )
+    if 'orphans' not in skip:
+        tasks.extend(
+            ('orphans', f"{table}.{column} -> {parent}", (table, column, parent, parent_column))
+            for table, column, parent, parent_column in UNDECLARED_REFERENCES
+        )
+    if 'legacy_tables' not in skip:
+        tasks.extend(('legacy_tables', legacy, (legacy, current)) for legacy, current in LEGACY_TABLES.items())
+    if 'aggregates' not in skip:
+        tasks.append(('aggregates', 'resumen_inventario_familia/alertas_stock_actuales', ()))
+    if 'duplicates' not in skip:
+        tasks.extend(('duplicates', f"{table}.{column}", (table, column)) for table, column in UNIQUE_CODES)
+    return tasks
+
+
+def check_database(db_path='gestion_empresa.db', workers=None, skip=()):
+    """Run every check and return the report as a dict (None if the file does not exist)."""
     if not os.path.exists(db_path):
         print(f"Error: La base de datos {db_path} no existe")
-        return
-    
+        return None
+
+    workers = workers or os.cpu_count() or 1
+    started = datetime.now()
+    start = time.perf_counter()
+    conn = connect_read_only(db_path)
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Verificar si la tabla familias existe
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='familias'")
-        if cursor.fetchone() is None:
-            print("La tabla 'familias' no existe")
-            return
-        
-        # Verificar la estructura de la tabla familias
-        cursor.execute("PRAGMA table_info(familias)")
-        columns = cursor.fetchall()
-        print("\nEstructura de la tabla familias:")
-        for col in columns:
-            print(f"Columna: {col[1]}, Tipo: {col[2]}")
-        
-        # Verificar si hay datos en la tabla
-        cursor.execute("SELECT * FROM familias")
-        rows = cursor.fetchall()
-        print(f"\nNúmero de familias en la base de datos: {len(rows)}")
-        if rows:
-            print("\nPrimeras 5 familias:")
-            for row in rows[:5]:
-                print(row)
-        
+        tasks = plan(conn, workers, skip)
+        sqlite_version = conn.execute("SELECT sqlite_version()").fetchone()[0]
+    finally:
         conn.close()
-        
-    except sqlite3.Error as e:
-        print(f"Error al acceder a la base de datos: {str(e)}")
+    logger.info(f"Running {len(tasks)} checks on {db_path} with {workers} processes")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(db_path,)) as pool:
+        futures = [pool.submit(_run, check, target, args) for check, target, args in tasks]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if result['status'] != 'ok':
+                logger.warning(f"{result['check']} {result['target']}: {result['status']} "
+                               f"({result['problems']} problems{', ' + result['error'] if 'error' in result else ''})")
+
+    results.sort(key=lambda result: (list(CHECKS).index(result['check']), result['target']))
+    by_check = {}
+    for result in results:
+        summary = by_check.setdefault(result['check'], {'tasks': 0, 'problems': 0, 'seconds': 0.0})
+        summary['tasks'] += 1
+        summary['problems'] += result['problems']
+        summary['seconds'] = round(summary['seconds'] + result['seconds'], 4)
+    failed = [result for result in results if result['status'] != 'ok']
+    return {
+        'database': os.path.abspath(db_path),
+        'generated': started.isoformat(timespec='seconds'),
+        'sqlite_version': sqlite_version,
+        'workers': workers,
+        'elapsed_seconds': round(time.perf_counter() - start, 3),
+        'ok': not failed,
+        'summary': {'checks': len(results), 'failed': len(failed), 'by_check': by_check},
+        'checks': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check database integrity and consistency in parallel")
+    parser.add_argument('--db', default='gestion_empresa.db')
+    parser.add_argument('--workers', type=int, help="processes to use (default: one per CPU)")
+    parser.add_argument('--output', help="write the JSON report here instead of standard output")
+    parser.add_argument('--skip', action='append', default=[], choices=list(CHECKS), help="leave out a check")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    report = check_database(args.db, args.workers, args.skip)
+    if report is None:
+        return 2
+
+    text = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    logger.info(f"{report['summary']['checks']} checks in {report['elapsed_seconds']} s: "
+                f"{report['summary']['failed']} failed")
+    return 0 if report['ok'] else 1
+
 
 if __name__ == "__main__":
-    check_database() 
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,376 @@
+"""Incrementally maintained inventory aggregates.
+
+``vista_dashboard_inventario`` and ``vista_alertas_stock`` used to aggregate the
+whole articulos/subfamilia/familia/stock join on every read. Here they are
+backed by two summary tables kept current by triggers on the tables they
+depend on, including the stock updates made by ``update_stock_after_movement``:
+
+* ``resumen_inventario_familia``: one row per family with running totals.
+* ``alertas_stock_actuales``: the articles currently at or below their minimum.
+
+Usage (from the repository root):
+
+    python -m database.aggregates install --db gestion_empresa.db
+    python -m database.aggregates verify --db gestion_empresa.db
+    python -m database.aggregates rebuild --db gestion_empresa.db
+"""
+import argparse
+import logging
+
+from database.database_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_TABLES = ('familia', 'subfamilia', 'articulos', 'stock', 'stock_minimo')
+
+# Original (full recomputation) definitions, kept to verify the summaries
+LEGACY_DASHBOARD_SQL = '''
+    SELECT
+        f.nombre_familia as categoria,
+        COUNT(a.id_articulo) as total_articulos,
+        SUM(s.cantidad) as total_stock,
+        SUM(a.precio_compra * s.cantidad) as valor_total
+    FROM
+        articulos a
+    JOIN subfamilia sf ON a.id_subfamilia = sf.id_subfamilia
+    JOIN familia f ON sf.id_familia = f.id_familia
+    LEFT JOIN stock s ON a.id_articulo = s.id_articulo
+    GROUP BY f.nombre_familia
+'''
+
+LEGACY_ALERTS_SQL = '''
+    SELECT
+        a.id_articulo,
+        a.nombre_articulo,
+        s.cantidad as stock_actual,
+        sm.stock_minimo,
+        (s.cantidad - sm.stock_minimo) as diferencia
+    FROM
+        articulos a
+    JOIN stock s ON a.id_articulo = s.id_articulo
+    JOIN stock_minimo sm ON a.id_articulo = sm.id_articulo
+    WHERE s.cantidad <= sm.stock_minimo
+    ORDER BY diferencia ASC
+'''
+
+SUMMARY_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS resumen_inventario_familia (
+        id_familia INTEGER PRIMARY KEY,
+        nombre_familia TEXT NOT NULL,
+        total_articulos INTEGER NOT NULL DEFAULT 0,
+        total_stock INTEGER NOT NULL DEFAULT 0,
+        articulos_con_stock INTEGER NOT NULL DEFAULT 0,
+        valor_total REAL NOT NULL DEFAULT 0,
+        filas_valoradas INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS alertas_stock_actuales (
+        id_articulo INTEGER PRIMARY KEY,
+        stock_actual INTEGER NOT NULL,
+        stock_minimo INTEGER NOT NULL
+    )
+    ''',
+]
+
+FAST_VIEWS = [
+    '''
+    CREATE VIEW vista_dashboard_inventario AS
+        SELECT
+            nombre_familia as categoria,
+            SUM(total_articulos) as total_articulos,
+            CASE WHEN SUM(articulos_con_stock) > 0 THEN SUM(total_stock) END as total_stock,
+            CASE WHEN SUM(filas_valoradas) > 0 THEN SUM(valor_total) END as valor_total
+        FROM
+            resumen_inventario_familia
+        WHERE total_articulos > 0
+        GROUP BY nombre_familia
+    ''',
+    '''
+    CREATE VIEW vista_alertas_stock AS
+        SELECT
+            al.id_articulo,
+            a.nombre_articulo,
+            al.stock_actual,
+            al.stock_minimo,
+            (al.stock_actual - al.stock_minimo) as diferencia
+        FROM
+            alertas_stock_actuales al
+        JOIN articulos a ON al.id_articulo = a.id_articulo
+        ORDER BY diferencia ASC
+    ''',
+]
+
+
+def _family_of_subfamily(subfamily):
+    return f"(SELECT id_familia FROM subfamilia WHERE id_subfamilia = {subfamily})"
+
+
+def _family_of_article(article):
+    return _family_of_subfamily(f"(SELECT id_subfamilia FROM articulos WHERE id_articulo = {article})")
+
+
+def _apply_article(sign, article, subfamily, price):
+    """UPDATE adding (sign=+) or removing (sign=-) one article's contribution to its family."""
+    quantity = f"(SELECT cantidad FROM stock WHERE id_articulo = {article})"
+    return f'''
+        UPDATE resumen_inventario_familia SET
+            total_articulos = total_articulos {sign} 1,
+            total_stock = total_stock {sign} COALESCE({quantity}, 0),
+            articulos_con_stock = articulos_con_stock {sign} ({quantity} IS NOT NULL),
+            valor_total = valor_total {sign} COALESCE({price} * {quantity}, 0),
+            filas_valoradas = filas_valoradas {sign} ({price} * {quantity} IS NOT NULL)
+        WHERE id_familia = {_family_of_subfamily(subfamily)};
+    '''
+
+
+def _apply_stock(sign, article, quantity):
+    """UPDATE adding or removing one stock row's contribution to its article's family."""
+    price = f"(SELECT precio_compra FROM articulos WHERE id_articulo = {article})"
+    return f'''
+        UPDATE resumen_inventario_familia SET
+            total_stock = total_stock {sign} {quantity},
+            articulos_con_stock = articulos_con_stock {sign} 1,
+            valor_total = valor_total {sign} COALESCE({price} * {quantity}, 0),
+            filas_valoradas = filas_valoradas {sign} ({price} IS NOT NULL)
+        WHERE id_familia = {_family_of_article(article)};
+    '''
+
+
+def _refresh_alert(article):
+    return f'''
+        DELETE FROM alertas_stock_actuales WHERE id_articulo = {article};
+        INSERT INTO alertas_stock_actuales (id_articulo, stock_actual, stock_minimo)
+        SELECT s.id_articulo, s.cantidad, sm.stock_minimo
+        FROM stock s
+        JOIN stock_minimo sm ON s.id_articulo = sm.id_articulo
+        JOIN articulos a ON s.id_articulo = a.id_articulo
+        WHERE s.id_articulo = {article} AND s.cantidad <= sm.stock_minimo;
+    '''
+
+
+def _recompute_family(family):
+    return f'''
+        UPDATE resumen_inventario_familia SET
+            (total_articulos, total_stock, articulos_con_stock, valor_total, filas_valoradas) = (
+                SELECT COUNT(a.id_articulo), COALESCE(SUM(s.cantidad), 0), COUNT(s.cantidad),
+                       COALESCE(SUM(a.precio_compra * s.cantidad), 0), COUNT(a.precio_compra * s.cantidad)
+                FROM articulos a
+                JOIN subfamilia sf ON a.id_subfamilia = sf.id_subfamilia
+                LEFT JOIN stock s ON a.id_articulo = s.id_articulo
+                WHERE sf.id_familia = {family}
+            )
+        WHERE id_familia = {family};
+    '''
+
+
+def _triggers():
+    return {
+        'resumen_stock_insert': f'''
+            AFTER INSERT ON stock
+            BEGIN
+                {_apply_stock('+', 'NEW.id_articulo', 'NEW.cantidad')}
+                {_refresh_alert('NEW.id_articulo')}
+            END''',
+        'resumen_stock_update': f'''
+            AFTER UPDATE OF id_articulo, cantidad ON stock
+            BEGIN
+                {_apply_stock('-', 'OLD.id_articulo', 'OLD.cantidad')}
+                {_apply_stock('+', 'NEW.id_articulo', 'NEW.cantidad')}
+                {_refresh_alert('OLD.id_articulo')}
+                {_refresh_alert('NEW.id_articulo')}
+            END''',
+        'resumen_stock_delete': f'''
+            AFTER DELETE ON stock
+            BEGIN
+                {_apply_stock('-', 'OLD.id_articulo', 'OLD.cantidad')}
+                DELETE FROM alertas_stock_actuales WHERE id_articulo = OLD.id_articulo;
+            END''',
+        'resumen_articulo_insert': f'''
+            AFTER INSERT ON articulos
+            BEGIN
+                {_apply_article('+', 'NEW.id_articulo', 'NEW.id_subfamilia', 'NEW.precio_compra')}
+                {_refresh_alert('NEW.id_articulo')}
+            END''',
+        'resumen_articulo_update': f'''
+            AFTER UPDATE OF id_articulo, id_subfamilia, precio_compra ON articulos
+            BEGIN
+                {_apply_article('-', 'OLD.id_articulo', 'OLD.id_subfamilia', 'OLD.precio_compra')}
+                {_apply_article('+', 'NEW.id_articulo', 'NEW.id_subfamilia', 'NEW.precio_compra')}
+                {_refresh_alert('OLD.id_articulo')}
+                {_refresh_alert('NEW.id_articulo')}
+            END''',
+        'resumen_articulo_delete': f'''
+            AFTER DELETE ON articulos
+            BEGIN
+                {_apply_article('-', 'OLD.id_articulo', 'OLD.id_subfamilia', 'OLD.precio_compra')}
+                DELETE FROM alertas_stock_actuales WHERE id_articulo = OLD.id_articulo;
+            END''',
+        'resumen_stock_minimo_insert': f'''
+            AFTER INSERT ON stock_minimo
+            BEGIN
+                {_refresh_alert('NEW.id_articulo')}
+            END''',
+        'resumen_stock_minimo_update': f'''
+            AFTER UPDATE ON stock_minimo
+            BEGIN
+                {_refresh_alert('OLD.id_articulo')}
+                {_refresh_alert('NEW.id_articulo')}
+            END''',
+        'resumen_stock_minimo_delete': '''
+            AFTER DELETE ON stock_minimo
+            BEGIN
+                DELETE FROM alertas_stock_actuales WHERE id_articulo = OLD.id_articulo;
+            END''',
+        # Moving a subfamily between families is rare: recompute both families
+        'resumen_subfamilia_update': f'''
+            AFTER UPDATE OF id_familia ON subfamilia
+            BEGIN
+                {_recompute_family('OLD.id_familia')}
+                {_recompute_family('NEW.id_familia')}
+            END''',
+        'resumen_familia_insert': '''
+            AFTER INSERT ON familia
+            BEGIN
+                INSERT OR IGNORE INTO resumen_inventario_familia (id_familia, nombre_familia)
+                VALUES (NEW.id_familia, NEW.nombre_familia);
+            END''',
+        'resumen_familia_update': '''
+            AFTER UPDATE OF nombre_familia ON familia
+            BEGIN
+                UPDATE resumen_inventario_familia SET nombre_familia = NEW.nombre_familia
+                WHERE id_familia = NEW.id_familia;
+            END''',
+        'resumen_familia_delete': '''
+            AFTER DELETE ON familia
+            BEGIN
+                DELETE FROM resumen_inventario_familia WHERE id_familia = OLD.id_familia;
+            END''',
+    }
+
+
+def is_supported(conn):
+    """Return True if the database has the tables the summaries are built from."""
+    placeholders = ', '.join('?' for _ in REQUIRED_TABLES)
+    found = conn.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name IN ({placeholders})",
+        REQUIRED_TABLES,
+    ).fetchone()[0]
+    return found == len(REQUIRED_TABLES)
+
+
+def is_installed(conn):
+    """Return True if the summary tables already exist."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='resumen_inventario_familia'"
+    ).fetchone() is not None
+
+
+def install(conn):
+    """Create summary tables, maintenance triggers and the summary-backed views, then fill them."""
+    for sql in SUMMARY_TABLES:
+        conn.execute(sql)
+    for name, body in _triggers().items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {body}")
+    conn.execute("DROP VIEW IF EXISTS vista_dashboard_inventario")
+    conn.execute("DROP VIEW IF EXISTS vista_alertas_stock")
+    for sql in FAST_VIEWS:
+        conn.execute(sql)
+    rebuild(conn)
+    logger.info("Inventory aggregates installed")
+
+
+def ensure_installed(conn):
+    """Install the aggregates once on databases that have the inventory schema."""
+    if is_supported(conn) and not is_installed(conn):
+        install(conn)
+
+
+def rebuild(conn):
+    """Recompute both summary tables from scratch."""
+    conn.execute("DELETE FROM resumen_inventario_familia")
+    conn.execute('''
+    INSERT INTO resumen_inventario_familia
+        (id_familia, nombre_familia, total_articulos, total_stock, articulos_con_stock, valor_total, filas_valoradas)
+    SELECT f.id_familia, f.nombre_familia,
+           COUNT(a.id_articulo), COALESCE(SUM(s.cantidad), 0), COUNT(s.cantidad),
+           COALESCE(SUM(a.precio_compra * s.cantidad), 0), COUNT(a.precio_compra * s.cantidad)
+    FROM familia f
+    LEFT JOIN subfamilia sf ON sf.id_familia = f.id_familia
+    LEFT JOIN articulos a ON a.id_subfamilia = sf.id_subfamilia
+    LEFT JOIN stock s ON s.id_articulo = a.id_articulo
+    GROUP BY f.id_familia
+    ''')
+    conn.execute("DELETE FROM alertas_stock_actuales")
+    conn.execute('''
+    INSERT INTO alertas_stock_actuales (id_articulo, stock_actual, stock_minimo)
+    SELECT s.id_articulo, s.cantidad, sm.stock_minimo
+    FROM stock s
+    JOIN stock_minimo sm ON s.id_articulo = sm.id_articulo
+    JOIN articulos a ON s.id_articulo = a.id_articulo
+    WHERE s.cantidad <= sm.stock_minimo
+    ''')
+    logger.info("Inventory aggregates rebuilt")
+
+
+def verify(conn, tolerance=0.01):
+    """Compare the summary-backed views with a full recomputation; return a list of differences."""
+    differences = []
+
+    expected = {row[0]: row[1:] for row in conn.execute(LEGACY_DASHBOARD_SQL)}
+    actual = {row[0]: row[1:] for row in conn.execute("SELECT * FROM vista_dashboard_inventario")}
+    for family in sorted(set(expected) | set(actual), key=str):
+        exp = expected.get(family)
+        act = actual.get(family)
+        if exp is None or act is None:
+            differences.append(f"Family {family}: expected {exp}, summary has {act}")
+            continue
+        for label, e, a in zip(('total_articulos', 'total_stock', 'valor_total'), exp, act):
+            if e is None or a is None:
+                mismatch = e is not a
+            else:
+                mismatch = abs(e - a) > tolerance
+            if mismatch:
+                differences.append(f"Family {family} {label}: expected {e}, summary has {a}")
+
+    expected_alerts = {row[0]: row for row in conn.execute(LEGACY_ALERTS_SQL)}
+    actual_alerts = {row[0]: row for row in conn.execute("SELECT * FROM vista_alertas_stock")}
+    for article in sorted(set(expected_alerts) | set(actual_alerts)):
+        if expected_alerts.get(article) != actual_alerts.get(article):
+            differences.append(
+                f"Stock alert for article {article}: expected {expected_alerts.get(article)}, "
+                f"summary has {actual_alerts.get(article)}"
+            )
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the incrementally maintained inventory aggregates")
+    parser.add_argument('command', choices=['install', 'verify', 'rebuild'])
+    parser.add_argument('--db', default='gestion_patrimonial.db')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db_manager = DatabaseManager(args.db)
+    try:
+        with db_manager.transaction() as conn:
+            if not is_supported(conn):
+                print(f"The database lacks one of the tables {', '.join(REQUIRED_TABLES)}")
+                return
+            if args.command == 'install':
+                install(conn)
+            elif args.command == 'rebuild':
+                rebuild(conn)
+            else:
+                differences = verify(conn)
+                for difference in differences:
+                    print(difference)
+                print("Aggregates are consistent" if not differences else f"{len(differences)} differences found")
+    finally:
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
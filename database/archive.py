@@ -0,0 +1,436 @@
+"""Hot/cold tiering: move old rows of the append-only tables into per-year archives.
+
+``movimientos``, ``auditoria``, ``historial_estado`` and (read) ``notificaciones``
+rows dated before a cutoff are copied into ``<db>_archivo_<year>.db`` files
+next to the live database and then deleted from it, one year at a time:
+
+1. ``ATTACH`` the year's archive and copy the year's rows with
+   ``INSERT OR IGNORE ... SELECT`` (its own transaction);
+2. delete them from the live table and advance the table's boundary in
+   ``archivo_limites`` (a second transaction).
+
+Ids are kept, so re-running after a crash between the two steps just skips
+the rows already copied. Rows without a date are never archived.
+
+Archiving movements must not change any stock figure: the ledger total per
+article is what ``stock`` and the snapshots are reconciled against. The
+archived movements of each article and location are therefore replaced by one
+carry-forward movement dated the day before the cutoff (``observaciones`` =
+``SALDO_ARCHIVADO``), inserted with the stock and snapshot triggers suspended.
+Point-in-time stock (``stock_ledger.stock_at``) stays exact from that date on;
+for earlier dates it raises ValueError, since only the archives hold those
+movements.
+
+``query_range`` reads a table over a date range and only attaches the archive
+years the range reaches. ``incremental_vacuum`` and ``MaintenanceScheduler``
+give the freed pages back to the file system.
+
+Usage (from the repository root):
+
+    python -m database.archive --db gestion_patrimonial.db archive --before 2024-01-01
+    python -m database.archive --db gestion_patrimonial.db query movimientos --desde 2019-03-01 --hasta 2019-04-01
+    python -m database.archive --db gestion_patrimonial.db vacuum --enable-incremental
+    python -m database.archive --db gestion_patrimonial.db status
+"""
+import argparse
+import heapq
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+from database.database_manager import DatabaseManager
+from database.stock_ledger import DELTA_SQL, suspended_triggers
+
+logger = logging.getLogger(__name__)
+
+# table -> (date column, extra condition a row must meet to be archived)
+ARCHIVED_TABLES = {
+    'movimientos': ('fecha_movimiento', None),
+    'auditoria': ('fecha_hora', None),
+    'historial_estado': ('fecha_cambio', None),
+    # Unread notifications stay live whatever their age
+    'notificaciones': ('fecha_creacion', 'leida = 1'),
+}
+
+SALDO_ARCHIVADO = 'Saldo de movimientos archivados'
+
+# Triggers suspended while carry-forward movements replace archived ones
+CARRY_FORWARD_TRIGGERS = ('update_stock_after_movement', 'ledger_invalidar_snapshots')
+
+# SQLite attaches at most 10 databases; leave room for temp and others
+MAX_ATTACHED = 8
+
+REGISTRY_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS archivo_limites (
+        tabla TEXT PRIMARY KEY,
+        hasta DATE NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS archivo_particiones (
+        tabla TEXT NOT NULL,
+        anio TEXT NOT NULL,
+        archivo TEXT NOT NULL,
+        filas INTEGER NOT NULL DEFAULT 0,
+        actualizado TIMESTAMP NOT NULL,
+        PRIMARY KEY (tabla, anio)
+    )
+    ''',
+]
+
+
+def install(conn):
+    """Create the registry of archived ranges and archive files."""
+    for sql in REGISTRY_SCHEMA:
+        conn.execute(sql)
+
+
+def _main_path(conn):
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == 'main':
+            return path
+    return ''
+
+
+def archive_path(db_path, year):
+    """Archive file for ``year`` of the live database at ``db_path``."""
+    base, _ = os.path.splitext(os.path.abspath(db_path))
+    return f"{base}_archivo_{year}.db"
+
+
+def archived_until(conn, table):
+    """Exclusive upper date of the archived rows of ``table``, or None."""
+    try:
+        row = conn.execute("SELECT hasta FROM archivo_limites WHERE tabla = ?", (table,)).fetchone()
+    except sqlite3.OperationalError:
+        # Registry not created yet: nothing archived
+        return None
+    return row[0] if row else None
+
+
+def _archive_ddl(conn, alias, table, date_column):
+    """CREATE statements for ``alias.table``: same columns and key, no constraints to tables left behind."""
+    columns = conn.execute(f"PRAGMA main.table_info({table})").fetchall()
+    keys = [column[1] for column in sorted(columns, key=lambda column: column[5]) if column[5]]
+    # An INTEGER PRIMARY KEY stays the rowid alias, so archived rows keep their ids cheaply
+    rowid_key = len(keys) == 1 and any(column[1] == keys[0] and column[2].upper() == 'INTEGER' for column in columns)
+    definitions = [
+        f"{name} INTEGER PRIMARY KEY" if rowid_key and name == keys[0] else f"{name} {type_}".strip()
+        for _, name, type_, _, _, _ in columns
+    ]
+    if keys and not rowid_key:
+        definitions.append(f"PRIMARY KEY ({', '.join(keys)})")
+    statements = [
+        f"CREATE TABLE IF NOT EXISTS {alias}.{table} ({', '.join(definitions)})",
+        f"CREATE INDEX IF NOT EXISTS {alias}.idx_{table}_{date_column} ON {table}({date_column})",
+    ]
+    if 'id_articulo' in {column[1] for column in columns}:
+        statements.append(
+            f"CREATE INDEX IF NOT EXISTS {alias}.idx_{table}_articulo_{date_column} ON {table}(id_articulo, {date_column})"
+        )
+    return statements
+
+
+def _carry_forward(conn, where, params, fecha_saldo):
+    """Replace the movements selected by ``where`` with one balance movement per article and location."""
+    conn.execute("DROP TABLE IF EXISTS temp.saldo_archivado")
+    conn.execute(f'''
+    CREATE TEMP TABLE saldo_archivado AS
+    SELECT id_articulo, id_ubicacion, SUM({DELTA_SQL}) AS cantidad
+    FROM main.movimientos WHERE {where}
+    GROUP BY id_articulo, id_ubicacion
+    ''', params)
+    # The append-only guard forbids deletes; the stock trigger would re-apply
+    # the balance to stock and the snapshot trigger would drop every cut after it
+    with suspended_triggers(conn, ('ledger_movimientos_sin_delete',) + CARRY_FORWARD_TRIGGERS):
+        conn.execute(f"DELETE FROM main.movimientos WHERE {where}", params)
+        conn.execute('''
+        INSERT INTO main.movimientos (id_articulo, cantidad, tipo_movimiento, fecha_movimiento,
+                                      id_ubicacion, observaciones)
+        SELECT id_articulo, ABS(cantidad), CASE WHEN cantidad > 0 THEN 'entrada' ELSE 'salida' END,
+               ?, id_ubicacion, ?
+        FROM temp.saldo_archivado WHERE cantidad != 0
+        ''', (fecha_saldo, SALDO_ARCHIVADO))
+    conn.execute("DROP TABLE temp.saldo_archivado")
+
+
+def archive_table(db_manager, table, cutoff):
+    """Move the rows of ``table`` dated before ``cutoff`` into per-year archives; return rows moved."""
+    date_column, condition = ARCHIVED_TABLES[table]
+    cutoff = date.fromisoformat(str(cutoff)[:10])
+    extra = f" AND {condition}" if condition else ''
+    with db_manager.writer() as conn:
+        install(conn)
+        db_path = _main_path(conn)
+        years = [row[0] for row in conn.execute(
+            f"SELECT DISTINCT substr({date_column}, 1, 4) FROM main.{table} "
+            f"WHERE {date_column} < ?{extra} ORDER BY 1", (cutoff.isoformat(),)
+        )]
+    if table == 'movimientos':
+        # Earlier years' balances are dated the day before the cutoff and are folded into that year's
+        year_of_balance = str((cutoff - timedelta(days=1)).year)
+        if years and year_of_balance not in years:
+            years.append(year_of_balance)
+
+    moved = 0
+    for year in years:
+        desde = f"{year}-01-01"
+        hasta = min(f"{int(year) + 1}-01-01", cutoff.isoformat())
+        path = archive_path(db_path, year)
+        alias = f"archivo_{year}"
+        where = f"{date_column} >= ? AND {date_column} < ?{extra}"
+        params = (desde, hasta)
+        start = time.perf_counter()
+        with db_manager.writer() as conn:
+            conn.execute("ATTACH DATABASE ? AS " + alias, (path,))
+            try:
+                for sql in _archive_ddl(conn, alias, table, date_column):
+                    conn.execute(sql)
+                copy_filter = where
+                if table == 'movimientos':
+                    # Balances are derived rows; the archive keeps the original movements only
+                    copy_filter += " AND observaciones IS NOT ?"
+                    copy_params = params + (SALDO_ARCHIVADO,)
+                else:
+                    copy_params = params
+                with db_manager.transaction():
+                    copied = conn.execute(
+                        f"INSERT OR IGNORE INTO {alias}.{table} SELECT * FROM main.{table} WHERE {copy_filter}",
+                        copy_params,
+                    ).rowcount
+                with db_manager.transaction():
+                    if table == 'movimientos':
+                        _carry_forward(conn, where, params, (cutoff - timedelta(days=1)).isoformat())
+                    else:
+                        conn.execute(f"DELETE FROM main.{table} WHERE {where}", params)
+                    conn.execute(
+                        "INSERT INTO archivo_limites (tabla, hasta) VALUES (?, ?) "
+                        "ON CONFLICT(tabla) DO UPDATE SET hasta = MAX(hasta, excluded.hasta)",
+                        (table, hasta),
+                    )
+                    conn.execute('''
+                    INSERT INTO archivo_particiones (tabla, anio, archivo, filas, actualizado)
+                    VALUES (?, ?, ?, (SELECT COUNT(*) FROM {alias}.{table}), CURRENT_TIMESTAMP)
+                    ON CONFLICT(tabla, anio) DO UPDATE SET filas = excluded.filas, actualizado = excluded.actualizado
+                    '''.format(alias=alias, table=table), (table, year, os.path.basename(path)))
+            finally:
+                conn.execute(f"DETACH DATABASE {alias}")
+        moved += copied
+        logger.info(f"{table} {year}: {copied} rows archived to {os.path.basename(path)} "
+                    f"in {time.perf_counter() - start:.2f} s")
+    return moved
+
+
+def archive(db_manager, cutoff, tables=None):
+    """Archive every table in ``ARCHIVED_TABLES`` (or ``tables``) up to ``cutoff``; return {table: rows}."""
+    moved = {}
+    for table in tables or ARCHIVED_TABLES:
+        with db_manager.reader() as conn:
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+        if exists:
+            moved[table] = archive_table(db_manager, table, cutoff)
+    return moved
+
+
+def query_range(conn, table, desde=None, hasta=None, columns='*', where=None, params=()):
+    """Rows of ``table`` with ``desde <= date < hasta``, live and archived, ordered by date.
+
+    Archive years are attached only when the range reaches below the table's
+    archive boundary, and detached again before returning. ``where`` is an
+    extra condition on unqualified column names. Carry-forward balances are
+    left out of movement ranges, since the archived movements they stand for
+    are returned instead.
+    """
+    date_column, condition = ARCHIVED_TABLES[table]
+    bounds, bound_params = [], []
+    if desde is not None:
+        bounds.append(f"{date_column} >= ?")
+        bound_params.append(str(desde))
+    if hasta is not None:
+        bounds.append(f"{date_column} < ?")
+        bound_params.append(str(hasta))
+    if where:
+        bounds.append(f"({where})")
+        bound_params.extend(params)
+
+    boundary = archived_until(conn, table)
+    live = list(bounds)
+    live_params = list(bound_params)
+    if table == 'movimientos':
+        live.append("observaciones IS NOT ?")
+        live_params.append(SALDO_ARCHIVADO)
+    if boundary:
+        # Rows below the boundary that qualified for archiving live in the archives
+        archived = f"{date_column} < ?" + (f" AND {condition}" if condition else '')
+        live.append(f"NOT COALESCE({archived}, 0)")
+        live_params.append(boundary)
+
+    years = []
+    if boundary and (desde is None or str(desde) < boundary):
+        first = str(desde)[:4] if desde is not None else '0000'
+        last = min(str(hasta), boundary)[:4] if hasta is not None else boundary[:4]
+        years = [row[0] for row in conn.execute(
+            "SELECT anio FROM archivo_particiones WHERE tabla = ? AND anio BETWEEN ? AND ? ORDER BY anio",
+            (table, first, last),
+        )]
+
+    def select(schema, conditions):
+        return (f"SELECT {columns}, {date_column} AS orden_fecha FROM {schema}.{table}"
+                + (f" WHERE {' AND '.join(conditions)}" if conditions else ''))
+
+    db_path = _main_path(conn)
+    archive_bounds = bounds + [f"{date_column} < ?"]
+    archive_params = bound_params + [boundary]
+    groups = [years[i:i + MAX_ATTACHED] for i in range(0, len(years), MAX_ATTACHED)] or [[]]
+    results = []
+    for number, group in enumerate(groups):
+        parts, part_params = [], []
+        attached = []
+        try:
+            for year in group:
+                alias = f"archivo_{year}"
+                conn.execute("ATTACH DATABASE ? AS " + alias, (archive_path(db_path, year),))
+                attached.append(alias)
+                parts.append(select(alias, archive_bounds))
+                part_params.extend(archive_params)
+            # The live table joins the last group's UNION
+            if number == len(groups) - 1:
+                parts.append(select('main', live))
+                part_params.extend(live_params)
+            rows = conn.execute(
+                f"SELECT * FROM ({' UNION ALL '.join(parts)}) ORDER BY orden_fecha", part_params
+            ).fetchall()
+        finally:
+            for alias in attached:
+                conn.execute(f"DETACH DATABASE {alias}")
+        results.append(rows)
+    merged = results[0] if len(results) == 1 else heapq.merge(*results, key=lambda row: row[-1] or '')
+    return [row[:-1] for row in merged]
+
+
+# -- vacuum -------------------------------------------------------------------
+
+def incremental_vacuum(db_manager, pages=2000):
+    """Return up to ``pages`` free pages to the file system; returns the pages freed.
+
+    Does nothing (and returns 0) unless ``auto_vacuum`` is INCREMENTAL; see
+    ``enable_incremental_vacuum``.
+    """
+    with db_manager.writer() as conn:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return 0
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not before:
+            return 0
+        # execute() steps the pragma once, which frees a single page; a script runs it to completion
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+        freed = before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    logger.info(f"Incremental vacuum freed {freed} pages ({before - freed} still free)")
+    return freed
+
+
+def enable_incremental_vacuum(db_manager):
+    """Switch the live database to auto_vacuum=INCREMENTAL; this needs one full VACUUM."""
+    vacuum(db_manager, auto_vacuum='INCREMENTAL')
+
+
+def vacuum(db_manager, auto_vacuum=None):
+    """Rewrite the whole file (blocks writers for the duration)."""
+    start = time.perf_counter()
+    with db_manager.writer() as conn:
+        if auto_vacuum:
+            conn.execute(f"PRAGMA auto_vacuum={auto_vacuum}")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    logger.info(f"VACUUM finished in {time.perf_counter() - start:.1f} s")
+
+
+class MaintenanceScheduler:
+    """Background thread that runs ``incremental_vacuum`` every ``interval`` seconds."""
+
+    def __init__(self, db_manager, interval=3600, pages=2000):
+        self.db_manager = db_manager
+        self.interval = interval
+        self.pages = pages
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='db-maintenance', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                incremental_vacuum(self.db_manager, self.pages)
+                with self.db_manager.writer() as conn:
+                    conn.execute("PRAGMA optimize")
+            except Exception as e:
+                logger.error(f"Database maintenance failed: {str(e)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old rows into per-year databases and vacuum the live one")
+    parser.add_argument('--db', default='gestion_patrimonial.db')
+    commands = parser.add_subparsers(dest='command', required=True)
+    archive_parser = commands.add_parser('archive', help="move rows dated before --before into the archives")
+    archive_parser.add_argument('--before', required=True, help="cutoff date (YYYY-MM-DD), exclusive")
+    archive_parser.add_argument('--table', action='append', choices=list(ARCHIVED_TABLES))
+    archive_parser.add_argument('--vacuum', action='store_true', help="run an incremental vacuum afterwards")
+    query_parser = commands.add_parser('query', help="rows of a table over a date range, archives included")
+    query_parser.add_argument('table', choices=list(ARCHIVED_TABLES))
+    query_parser.add_argument('--desde')
+    query_parser.add_argument('--hasta')
+    query_parser.add_argument('--limit', type=int, default=20)
+    vacuum_parser = commands.add_parser('vacuum', help="incremental vacuum (or a full one)")
+    vacuum_parser.add_argument('--full', action='store_true')
+    vacuum_parser.add_argument('--enable-incremental', action='store_true', help="switch auto_vacuum (full VACUUM)")
+    vacuum_parser.add_argument('--pages', type=int, default=100000)
+    commands.add_parser('status', help="archive boundaries and files")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db_manager = DatabaseManager(args.db)
+    try:
+        if args.command == 'archive':
+            moved = archive(db_manager, args.before, args.table)
+            logger.info(f"Archived: {moved}")
+            if args.vacuum:
+                incremental_vacuum(db_manager)
+        elif args.command == 'query':
+            with db_manager.reader() as conn:
+                rows = query_range(conn, args.table, args.desde, args.hasta)
+            print(f"{len(rows)} rows")
+            for row in rows[:args.limit]:
+                print(row)
+        elif args.command == 'vacuum':
+            if args.enable_incremental:
+                enable_incremental_vacuum(db_manager)
+            elif args.full:
+                vacuum(db_manager)
+            else:
+                incremental_vacuum(db_manager, args.pages)
+        else:
+            with db_manager.reader() as conn:
+                for table in ARCHIVED_TABLES:
+                    print(f"{table}: archived until {archived_until(conn, table) or '-'}")
+                try:
+                    for row in conn.execute("SELECT tabla, anio, archivo, filas FROM archivo_particiones ORDER BY 1, 2"):
+                        print("  {} {}: {} ({} rows)".format(*row))
+                except sqlite3.OperationalError:
+                    print("Nothing archived yet")
+    finally:
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
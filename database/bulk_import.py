@@ -0,0 +1,418 @@
+"""Streaming bulk importer for articulos, numeros_serie and numeros_patrimonio.
+
+Usage (from the repository root):
+
+    python -m database.bulk_import articulos nuevos_articulos.csv --db gestion_empresa.db
+    python -m database.bulk_import numeros_serie series.xlsx --chunk-size 10000 --defer-indexes
+
+Rows are read lazily from CSV or XLSX, foreign keys given by name are resolved
+through in-memory dictionaries, every chunk is validated and then loaded with a
+single ``executemany`` inside its own transaction. The number of source rows
+consumed is committed in the same transaction, so an interrupted import resumes
+after the last committed chunk.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import time
+from itertools import islice
+
+from database.database_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Lookups resolve a human-readable column in the file to a foreign-key id:
+# target column -> (source column, table, id column, name column)
+IMPORT_SPECS = {
+    'articulos': {
+        'columns': [
+            'id_subfamilia', 'id_marca', 'id_proveedor', 'id_estado', 'nombre_articulo',
+            'descripcion', 'modelo', 'precio_compra', 'precio_venta', 'anio_fabricacion',
+            'garantia_meses', 'fecha_compra', 'es_activo_fijo',
+        ],
+        'required': ['id_subfamilia', 'id_marca', 'id_proveedor', 'nombre_articulo'],
+        'lookups': {
+            'id_subfamilia': ('subfamilia', 'subfamilia', 'id_subfamilia', 'nombre_subfamilia'),
+            'id_marca': ('marca', 'marcas', 'id_marca', 'nombre_marca'),
+            'id_proveedor': ('proveedor', 'proveedores', 'id_proveedor', 'nombre_proveedor'),
+            'id_estado': ('estado', 'estados_articulo', 'id_estado', 'nombre_estado'),
+        },
+        'integers': ['anio_fabricacion', 'garantia_meses', 'es_activo_fijo'],
+        'reals': ['precio_compra', 'precio_venta'],
+    },
+    'numeros_serie': {
+        'columns': ['id_articulo', 'numero_serie', 'observaciones'],
+        'required': ['id_articulo', 'numero_serie'],
+        'lookups': {},
+        'integers': [],
+        'reals': [],
+        'articles': True,
+        'unique': ('id_articulo', 'numero_serie'),
+    },
+    'numeros_patrimonio': {
+        'columns': ['id_articulo', 'numero_patrimonio', 'ubicacion', 'responsable_id', 'estado', 'observaciones'],
+        'required': ['id_articulo', 'numero_patrimonio'],
+        'lookups': {},
+        'integers': ['responsable_id'],
+        'reals': [],
+        'articles': True,
+        'unique': ('numero_patrimonio',),
+    },
+}
+
+
+class ImportStats:
+    """Counters reported while and after an import runs."""
+
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.skipped = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.inserted / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f"{self.inserted} inserted, {self.rejected} rejected, {self.skipped} skipped (resume) "
+                f"in {self.elapsed:.1f}s ({self.rows_per_second:,.0f} rows/s)")
+
+
+def read_rows(path):
+    """Yield each data row of a CSV or XLSX file as a dict keyed by header."""
+    if path.lower().endswith('.xlsx'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise RuntimeError("openpyxl is required to import .xlsx files")
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(h).strip() if h is not None else '' for h in next(rows, [])]
+            for values in rows:
+                yield {h: v for h, v in zip(header, values) if h}
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                yield {k.strip(): v for k, v in row.items() if k}
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _ensure_progress_table(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS importaciones_progreso (
+        clave_importacion TEXT PRIMARY KEY,
+        tabla TEXT NOT NULL,
+        archivo TEXT NOT NULL,
+        filas_procesadas INTEGER NOT NULL DEFAULT 0,
+        ddl_diferido TEXT,
+        completada BOOLEAN NOT NULL DEFAULT 0,
+        fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+
+class BulkImporter:
+    """Load one file into one of the IMPORT_SPECS tables in committed chunks."""
+
+    def __init__(self, db_manager, table, chunk_size=5000, defer_indexes=False,
+                 defer_triggers=False, progress_callback=None):
+        if table not in IMPORT_SPECS:
+            raise ValueError(f"Unsupported import table: {table}")
+        self.db_manager = db_manager
+        self.table = table
+        self.spec = IMPORT_SPECS[table]
+        self.chunk_size = chunk_size
+        self.defer_indexes = defer_indexes
+        self.defer_triggers = defer_triggers
+        self.progress_callback = progress_callback
+        self.lookups = {}
+        self.known_ids = {}
+        self.insert_sql = (
+            f"INSERT INTO {table} ({', '.join(self.spec['columns'])}) "
+            f"VALUES ({', '.join('?' for _ in self.spec['columns'])})"
+        )
+
+    def load_lookups(self):
+        """Read every referenced table once into a lowercase name -> id dictionary."""
+        with self.db_manager.reader() as conn:
+            for column, (_, table, id_column, name_column) in self.spec['lookups'].items():
+                rows = conn.execute(f"SELECT {id_column}, {name_column} FROM {table}").fetchall()
+                self.lookups[column] = {str(name).strip().lower(): row_id for row_id, name in rows if name is not None}
+                self.known_ids[column] = {row_id for row_id, _ in rows}
+
+    def convert(self, raw):
+        """Turn one source row into an insert tuple, or raise ValueError with the reason."""
+        values = []
+        for column in self.spec['columns']:
+            value = raw.get(column)
+            if column in self.spec['lookups'] and _blank(value):
+                source_column = self.spec['lookups'][column][0]
+                name = raw.get(source_column)
+                if not _blank(name):
+                    value = self.lookups[column].get(str(name).strip().lower())
+                    if value is None:
+                        raise ValueError(f"Unknown {source_column}: {name}")
+            if _blank(value):
+                if column in self.spec['required']:
+                    raise ValueError(f"Missing required column: {column}")
+                value = None
+            elif column.startswith('id_') or column in self.spec['integers']:
+                value = int(float(value))
+            elif column in self.spec['reals']:
+                value = float(value)
+            elif isinstance(value, str):
+                value = value.strip()
+            values.append(value)
+        return tuple(values)
+
+    def validate_chunk(self, conn, raw_rows):
+        """Convert a chunk and check what can only be checked against the database."""
+        accepted = []
+        rejected = []
+        for raw in raw_rows:
+            try:
+                accepted.append((raw, self.convert(raw)))
+            except (TypeError, ValueError) as e:
+                rejected.append((raw, str(e)))
+
+        if self.known_ids and accepted:
+            # Ids given as numbers, not names, must exist too: one bad row would fail the whole chunk
+            positions = [(self.spec['columns'].index(column), column) for column in self.known_ids]
+            still_ok = []
+            for raw, values in accepted:
+                unknown = [f"{column}: {values[p]}" for p, column in positions
+                           if values[p] is not None and values[p] not in self.known_ids[column]]
+                if unknown:
+                    rejected.append((raw, f"Unknown {', '.join(unknown)}"))
+                else:
+                    still_ok.append((raw, values))
+            accepted = still_ok
+
+        if self.spec.get('articles') and accepted:
+            article_ids = {values[0] for _, values in accepted}
+            existing = self._existing(conn, 'articulos', 'id_articulo', article_ids)
+            still_ok = []
+            for raw, values in accepted:
+                if values[0] in existing:
+                    still_ok.append((raw, values))
+                else:
+                    rejected.append((raw, f"Unknown id_articulo: {values[0]}"))
+            accepted = still_ok
+
+        unique = self.spec.get('unique')
+        if unique and accepted:
+            positions = [self.spec['columns'].index(column) for column in unique]
+            keys = {tuple(values[p] for p in positions) for _, values in accepted}
+            existing = self._existing_keys(conn, unique, keys)
+            seen = set()
+            still_ok = []
+            for raw, values in accepted:
+                key = tuple(values[p] for p in positions)
+                if key in existing or key in seen:
+                    rejected.append((raw, f"Duplicate {', '.join(unique)}: {', '.join(map(str, key))}"))
+                else:
+                    seen.add(key)
+                    still_ok.append((raw, values))
+            accepted = still_ok
+
+        return [values for _, values in accepted], rejected
+
+    def _existing(self, conn, table, column, keys):
+        found = set()
+        keys = list(keys)
+        # Stay below SQLITE_MAX_VARIABLE_NUMBER on older builds
+        for start in range(0, len(keys), 900):
+            batch = keys[start:start + 900]
+            query = f"SELECT {column} FROM {table} WHERE {column} IN ({', '.join('?' for _ in batch)})"
+            found.update(row[0] for row in conn.execute(query, batch))
+        return found
+
+    def _existing_keys(self, conn, columns, keys):
+        """The ``keys`` (tuples of ``columns`` values) already present in the target table."""
+        found = set()
+        keys = list(keys)
+        names = ', '.join(f"t.{column}" for column in columns)
+        # A join on the VALUES list searches the unique index; a row-value IN would scan it
+        match = ' AND '.join(f"t.{column} = k.column{n}" for n, column in enumerate(columns, 1))
+        row = f"({', '.join('?' for _ in columns)})"
+        size = 900 // len(columns)
+        for start in range(0, len(keys), size):
+            batch = keys[start:start + size]
+            query = (f"SELECT {names} FROM (VALUES {', '.join(row for _ in batch)}) k "
+                     f"JOIN {self.table} t ON {match}")
+            found.update(conn.execute(query, [value for key in batch for value in key]))
+        return found
+
+    def _job_key(self, path):
+        stat = os.stat(path)
+        source = f"{self.table}|{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+    def _deferrable_ddl(self, conn):
+        types = []
+        if self.defer_indexes:
+            types.append('index')
+        if self.defer_triggers:
+            types.append('trigger')
+        if not types:
+            return []
+        return conn.execute(
+            f"SELECT type, name, sql FROM sqlite_master WHERE tbl_name = ? AND sql IS NOT NULL "
+            f"AND type IN ({', '.join('?' for _ in types)})",
+            [self.table] + types,
+        ).fetchall()
+
+    def restore_deferred(self, conn):
+        """Recreate indexes/triggers dropped by any import that did not finish."""
+        _ensure_progress_table(conn)
+        pending = conn.execute(
+            "SELECT clave_importacion, ddl_diferido FROM importaciones_progreso WHERE ddl_diferido IS NOT NULL"
+        ).fetchall()
+        for job_key, ddl in pending:
+            for _, name, sql in json.loads(ddl):
+                logger.info(f"Recreating deferred {name}")
+                conn.execute(sql)
+            conn.execute(
+                "UPDATE importaciones_progreso SET ddl_diferido = NULL WHERE clave_importacion = ?", (job_key,)
+            )
+
+    def run(self, path, reject_path=None):
+        """Import ``path``; rejected rows go to ``reject_path`` (default ``<path>.rechazos.csv``)."""
+        stats = ImportStats()
+        reject_path = reject_path or f"{os.path.splitext(path)[0]}.rechazos.csv"
+        job_key = self._job_key(path)
+
+        with self.db_manager.transaction() as conn:
+            _ensure_progress_table(conn)
+            row = conn.execute(
+                "SELECT filas_procesadas, completada FROM importaciones_progreso WHERE clave_importacion = ?",
+                (job_key,),
+            ).fetchone()
+            if row and row[1]:
+                logger.info(f"{path} was already imported completely; nothing to do")
+                return stats
+            already_done = row[0] if row else 0
+            if row is None:
+                conn.execute(
+                    "INSERT INTO importaciones_progreso (clave_importacion, tabla, archivo) VALUES (?, ?, ?)",
+                    (job_key, self.table, os.path.abspath(path)),
+                )
+
+            deferred = self._deferrable_ddl(conn)
+            if deferred:
+                # A resumed run may defer other objects; keep what the first attempt already dropped
+                stored = conn.execute(
+                    "SELECT ddl_diferido FROM importaciones_progreso WHERE clave_importacion = ?", (job_key,)
+                ).fetchone()[0]
+                kept = json.loads(stored) if stored else []
+                names = {name for _, name, _ in kept}
+                conn.execute(
+                    "UPDATE importaciones_progreso SET ddl_diferido = ? WHERE clave_importacion = ?",
+                    (json.dumps(kept + [list(entry) for entry in deferred if entry[1] not in names]), job_key),
+                )
+                for object_type, name, _ in deferred:
+                    conn.execute(f"DROP {object_type.upper()} IF EXISTS {name}")
+                logger.info(f"Deferred {len(deferred)} indexes/triggers on {self.table}")
+
+        self.load_lookups()
+        rows = read_rows(path)
+        if already_done:
+            logger.info(f"Resuming {path} after {already_done} committed rows")
+            stats.skipped = sum(1 for _ in islice(rows, already_done))
+
+        reject_file = None
+        reject_writer = None
+        try:
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                stats.read += len(chunk)
+
+                with self.db_manager.transaction() as conn:
+                    accepted, rejected = self.validate_chunk(conn, chunk)
+                    if accepted:
+                        conn.executemany(self.insert_sql, accepted)
+                    conn.execute(
+                        "UPDATE importaciones_progreso SET filas_procesadas = filas_procesadas + ?, "
+                        "fecha_actualizacion = CURRENT_TIMESTAMP WHERE clave_importacion = ?",
+                        (len(chunk), job_key),
+                    )
+
+                stats.inserted += len(accepted)
+                stats.rejected += len(rejected)
+                if rejected:
+                    if reject_writer is None:
+                        new_file = not os.path.exists(reject_path)
+                        reject_file = open(reject_path, 'a', newline='', encoding='utf-8')
+                        fields = list(chunk[0].keys()) + ['motivo_rechazo']
+                        reject_writer = csv.DictWriter(reject_file, fieldnames=fields, extrasaction='ignore')
+                        if new_file:
+                            reject_writer.writeheader()
+                    for raw, reason in rejected:
+                        reject_writer.writerow(dict(raw, motivo_rechazo=reason))
+                    reject_file.flush()
+
+                logger.info(f"{self.table}: {stats}")
+                if self.progress_callback:
+                    self.progress_callback(stats)
+
+            with self.db_manager.transaction() as conn:
+                conn.execute(
+                    "UPDATE importaciones_progreso SET completada = 1 WHERE clave_importacion = ?", (job_key,)
+                )
+        finally:
+            if reject_file:
+                reject_file.close()
+            # Indexes and triggers come back even if the load failed half-way
+            with self.db_manager.transaction() as conn:
+                self.restore_deferred(conn)
+
+        logger.info(f"Import of {path} into {self.table} finished: {stats}")
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import articulos, numeros_serie or numeros_patrimonio")
+    parser.add_argument('table', choices=sorted(IMPORT_SPECS))
+    parser.add_argument('path', help="CSV or XLSX file with a header row")
+    parser.add_argument('--db', default='gestion_patrimonial.db')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--rejects', help="Reject file (default: <file>.rechazos.csv)")
+    parser.add_argument('--defer-indexes', action='store_true', help="Drop secondary indexes during the load")
+    parser.add_argument('--defer-triggers', action='store_true', help="Drop triggers on the table during the load")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db_manager = DatabaseManager(args.db)
+    try:
+        importer = BulkImporter(
+            db_manager,
+            args.table,
+            chunk_size=args.chunk_size,
+            defer_indexes=args.defer_indexes,
+            defer_triggers=args.defer_triggers,
+        )
+        stats = importer.run(args.path, args.rejects)
+    finally:
+        db_manager.close()
+    print(f"Import finished: {stats}")
+
+
+if __name__ == "__main__":
+    main()
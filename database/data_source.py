@@ -0,0 +1,78 @@
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def _check_identifier(name):
+    """Reject anything that is not a plain SQL identifier."""
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid SQL identifier: {name}")
+    return name
+
+
+class KeysetDataSource:
+    """Lazy, keyset-paginated access to a table or view through DatabaseManager.
+
+    Rows are always fetched in windows of ``WHERE key > ? ORDER BY key LIMIT ?``
+    (or the mirrored ``<``/``DESC`` form when scrolling back), so each page costs
+    an index seek instead of an ``OFFSET`` scan over every preceding row.
+    """
+
+    def __init__(self, db_manager, table, key_column, columns, where=None, params=()):
+        self.db_manager = db_manager
+        self.table = _check_identifier(table)
+        self.key_column = _check_identifier(key_column)
+        self.columns = [_check_identifier(col) for col in columns]
+        if self.key_column not in self.columns:
+            self.columns.insert(0, self.key_column)
+        self.key_index = self.columns.index(self.key_column)
+        self.where = where
+        self.params = tuple(params)
+        self._count = None
+
+    def _select(self, comparison, order, key, limit):
+        conditions = []
+        params = []
+        if self.where:
+            conditions.append(f"({self.where})")
+            params.extend(self.params)
+        if key is not None:
+            conditions.append(f"{self.key_column} {comparison} ?")
+            params.append(key)
+        query = f"SELECT {', '.join(self.columns)} FROM {self.table}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {self.key_column} {order} LIMIT ?"
+        params.append(limit)
+        return self.db_manager.execute_query(query, tuple(params)) or []
+
+    def fetch_after(self, key, limit):
+        """Return up to ``limit`` rows whose key is greater than ``key`` (None = start)."""
+        return list(self._select('>', 'ASC', key, limit))
+
+    def fetch_before(self, key, limit):
+        """Return up to ``limit`` rows whose key is lower than ``key``, in ascending order."""
+        rows = list(self._select('<', 'DESC', key, limit))
+        rows.reverse()
+        return rows
+
+    def key_of(self, row):
+        """Return the pagination key of a row returned by this data source."""
+        return row[self.key_index]
+
+    def count(self):
+        """Return the total number of rows, computed once and cached until invalidated."""
+        if self._count is None:
+            query = f"SELECT COUNT(*) FROM {self.table}"
+            if self.where:
+                query += f" WHERE {self.where}"
+            result = self.db_manager.execute_query(query, self.params or None)
+            self._count = result[0][0] if result else 0
+        return self._count
+
+    def invalidate(self):
+        """Forget the cached row count; call after inserts or deletes on the table."""
+        self._count = None
@@ -0,0 +1,161 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# sqlite3's default per-connection statement cache only holds 128 entries;
+# the tab queries, views and lookups together easily exceed that.
+DEFAULT_CACHED_STATEMENTS = 512
+
+
+class DatabaseManager:
+    """Own the application's SQLite connections.
+
+    One writer connection serializes every INSERT/UPDATE/DELETE, and a small pool
+    of reader connections serves SELECTs concurrently thanks to WAL mode. All
+    connections are long-lived so their prepared-statement caches stay warm.
+    """
+
+    def __init__(self, db_path, readers=3, cached_statements=DEFAULT_CACHED_STATEMENTS, timeout=30.0):
+        self.db_path = db_path
+        self.logger = logger
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self._hooks = []
+        self._execute = self._run
+
+        self._writer_lock = threading.RLock()
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.execute("PRAGMA synchronous=NORMAL")
+        self._writer.execute("PRAGMA foreign_keys=ON")
+
+        # An in-memory database is private to its connection, so readers would see nothing
+        if db_path == ':memory:':
+            readers = 0
+        self._readers = queue.LifoQueue()
+        for _ in range(readers):
+            conn = self._connect()
+            conn.execute("PRAGMA query_only=1")
+            self._readers.put(conn)
+        self._reader_count = readers
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """Borrow a read-only connection from the pool (the writer if there are no readers)."""
+        if not self._reader_count:
+            with self._writer_lock:
+                yield self._writer
+            return
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def writer(self):
+        """Hold the writer connection exclusively, without opening a transaction."""
+        with self._writer_lock:
+            yield self._writer
+
+    @contextmanager
+    def transaction(self):
+        """Run a block of writes on the writer connection inside one transaction."""
+        with self._writer_lock:
+            conn = self._writer
+            if conn.in_transaction:
+                # Nested use joins the outer transaction
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            # The block may already have committed (e.g. setup_database calls commit())
+            if conn.in_transaction:
+                conn.execute("COMMIT")
+
+    def _run(self, query, params, is_select):
+        if is_select:
+            with self.reader() as conn:
+                return conn.execute(query, params or ()).fetchall()
+        with self.transaction() as conn:
+            cursor = conn.execute(query, params or ())
+            return cursor.lastrowid
+
+    def _run_instrumented(self, query, params, is_select):
+        start = time.perf_counter()
+        error = None
+        try:
+            return self._run(query, params, is_select)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            for hook in self._hooks:
+                # A broken hook must neither fail the query nor hide its error
+                try:
+                    hook(query, params, elapsed, error)
+                except Exception as e:
+                    logger.error(f"Query hook failed: {str(e)}")
+
+    def execute_query(self, query, params=None, is_select=True):
+        """Execute a query; SELECTs return all rows, writes return the last inserted rowid."""
+        return self._execute(query, params, is_select)
+
+    def execute_many(self, query, seq_of_params):
+        """Execute a write statement for every parameter tuple inside a single transaction."""
+        with self.transaction() as conn:
+            return conn.executemany(query, seq_of_params).rowcount
+
+    def add_query_hook(self, hook):
+        """Call ``hook(query, params, elapsed, error)`` after every execute_query.
+
+        Without hooks execute_query dispatches straight to the uninstrumented path,
+        so timing and logging cost nothing unless someone asked for them.
+        """
+        self._hooks.append(hook)
+        self._execute = self._run_instrumented
+
+    def remove_query_hook(self, hook):
+        """Unregister a hook added with add_query_hook."""
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+        if not self._hooks:
+            self._execute = self._run
+
+    def delete_record(self, table, condition, params=None):
+        """Delete records from a table based on a condition."""
+        try:
+            self.execute_query(f"DELETE FROM {table} WHERE {condition}", params, is_select=False)
+            return True
+        except Exception as e:
+            self.logger.error(f"Error deleting record: {str(e)}")
+            return False
+
+    def close(self):
+        """Close every pooled connection."""
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+        self._reader_count = 0
+        with self._writer_lock:
+            self._writer.close()
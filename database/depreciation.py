@@ -0,0 +1,203 @@
+"""Vectorized depreciation and book-value calculation for the fixed-asset register.
+
+The register (``depreciacion`` rows of articles with ``es_activo_fijo = 1``) is
+loaded once into NumPy arrays and every asset is valued in the same array
+operation, for one as-of date or for a whole monthly series.
+
+Conventions: ``vida_util`` is in years, depreciation accrues per whole month
+elapsed since the month of ``fecha_inicio``, and book value never drops below
+``valor_residual``. Declining balance uses a double rate (2 / useful life).
+
+Usage (from the repository root):
+
+    python -m database.depreciation --db gestion_empresa.db --as-of 2025-12-31 --save
+    python -m database.depreciation --db gestion_empresa.db --series 2025-01 2025-12
+"""
+import argparse
+import logging
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+STRAIGHT_LINE = 0
+DECLINING_BALANCE = 1
+
+METHODS = {
+    'lineal': STRAIGHT_LINE,
+    'linea recta': STRAIGHT_LINE,
+    'línea recta': STRAIGHT_LINE,
+    'straight_line': STRAIGHT_LINE,
+    'straight line': STRAIGHT_LINE,
+    'saldo decreciente': DECLINING_BALANCE,
+    'saldos decrecientes': DECLINING_BALANCE,
+    'doble saldo decreciente': DECLINING_BALANCE,
+    'declining_balance': DECLINING_BALANCE,
+    'declining balance': DECLINING_BALANCE,
+}
+
+DECLINING_FACTOR = 2.0
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("numpy is required for asset valuation (pip install numpy)")
+
+
+def to_month(dates):
+    """Convert ISO date strings (or one string) to integer months since 1970-01."""
+    return np.asarray(dates, dtype='datetime64[M]').astype(np.int64)
+
+
+class AssetRegister:
+    """Column arrays for every depreciable asset."""
+
+    def __init__(self, ids, cost, salvage, life_months, start_month, method):
+        self.ids = ids
+        self.cost = cost
+        self.salvage = np.minimum(salvage, cost)
+        self.life_months = np.maximum(life_months, 1)
+        self.start_month = start_month
+        self.method = method
+        self.depreciable = self.cost - self.salvage
+        self.monthly_rate = DECLINING_FACTOR / self.life_months
+        self.straight_line = self.method == STRAIGHT_LINE
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build the register from ``(id, valor_inicial, metodo, vida_util, fecha_inicio, valor_residual)`` rows."""
+        _require_numpy()
+        if not rows:
+            empty_int = np.empty(0, dtype=np.int64)
+            empty = np.empty(0, dtype=np.float64)
+            return cls(empty_int, empty, empty, empty_int, empty_int, np.empty(0, dtype=np.int8))
+        ids, cost, method, life, start, salvage = zip(*rows)
+        methods = np.fromiter(
+            (METHODS.get(str(m).strip().lower(), STRAIGHT_LINE) for m in method), dtype=np.int8, count=len(rows)
+        )
+        unknown = sum(1 for m in set(method) if str(m).strip().lower() not in METHODS)
+        if unknown:
+            logger.warning(f"{unknown} unknown depreciation methods valued as straight-line")
+        return cls(
+            np.asarray(ids, dtype=np.int64),
+            np.asarray(cost, dtype=np.float64),
+            np.asarray([s or 0.0 for s in salvage], dtype=np.float64),
+            np.asarray(life, dtype=np.int64) * 12,
+            to_month([str(s)[:10] for s in start]),
+            methods,
+        )
+
+    @classmethod
+    def load(cls, conn):
+        """Load the fixed-asset register from the database."""
+        rows = conn.execute('''
+        SELECT d.id_articulo, d.valor_inicial, d.metodo_depreciacion, d.vida_util,
+               d.fecha_inicio, d.valor_residual
+        FROM depreciacion d
+        JOIN articulos a ON a.id_articulo = d.id_articulo
+        WHERE a.es_activo_fijo = 1
+        ''').fetchall()
+        return cls.from_rows(rows)
+
+    def book_value(self, as_of_month):
+        """Return ``(book value, accumulated depreciation)`` arrays at an integer month."""
+        elapsed = np.clip(as_of_month - self.start_month, 0, self.life_months)
+        straight = self.cost - self.depreciable * (elapsed / self.life_months)
+        declining = np.maximum(self.cost * np.power(1.0 - np.minimum(self.monthly_rate, 1.0), elapsed), self.salvage)
+        book = np.where(self.straight_line, straight, declining)
+        # Fully depreciated assets sit exactly at their residual value
+        book = np.where(elapsed >= self.life_months, self.salvage, book)
+        return book, self.cost - book
+
+    def value_as_of(self, as_of):
+        """Book values at an ISO date (month granularity)."""
+        return self.book_value(to_month(as_of))
+
+    def monthly_series(self, first, last):
+        """Return ``(months, total book value per month, total depreciation per month)``."""
+        months = np.arange(to_month(first), to_month(last) + 1)
+        totals = np.empty(len(months))
+        for index, month in enumerate(months):
+            totals[index] = self.book_value(month)[0].sum()
+        previous = self.book_value(months[0] - 1)[0].sum() if len(months) else 0.0
+        charges = np.concatenate(([previous], totals[:-1])) - totals
+        return months.astype('datetime64[M]'), totals, charges
+
+    def schedule(self, first, last):
+        """Per-asset book values, shape ``(assets, months)``; use on subsets of large registers."""
+        months = np.arange(to_month(first), to_month(last) + 1)
+        elapsed = np.clip(months[None, :] - self.start_month[:, None], 0, self.life_months[:, None])
+        life = self.life_months[:, None]
+        straight = self.cost[:, None] - self.depreciable[:, None] * (elapsed / life)
+        declining = np.maximum(
+            self.cost[:, None] * np.power(1.0 - np.minimum(self.monthly_rate, 1.0)[:, None], elapsed),
+            self.salvage[:, None],
+        )
+        book = np.where(self.straight_line[:, None], straight, declining)
+        return np.where(elapsed >= life, self.salvage[:, None], book)
+
+
+def save_valuation(conn, register, as_of, book, accumulated):
+    """Write one as-of valuation per article with a single executemany.
+
+    An article with several ``depreciacion`` entries (one per component) is
+    stored as their sum, since the table is keyed on article and date.
+    """
+    fecha = str(np.datetime64(as_of, 'D'))
+    ids, position = np.unique(register.ids, return_inverse=True)
+    book = np.bincount(position, weights=book, minlength=len(ids))
+    accumulated = np.bincount(position, weights=accumulated, minlength=len(ids))
+    conn.execute("DELETE FROM valuacion_activos WHERE fecha_valuacion = ?", (fecha,))
+    conn.executemany(
+        "INSERT INTO valuacion_activos (id_articulo, fecha_valuacion, valor_libros, depreciacion_acumulada) "
+        "VALUES (?, ?, ?, ?)",
+        zip(ids.tolist(), [fecha] * len(ids), book.round(2).tolist(), accumulated.round(2).tolist()),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Value the fixed-asset register")
+    parser.add_argument('--db', default='gestion_patrimonial.db')
+    parser.add_argument('--as-of', help="Valuation date (YYYY-MM-DD)")
+    parser.add_argument('--save', action='store_true', help="Store the --as-of valuation in valuacion_activos")
+    parser.add_argument('--series', nargs=2, metavar=('FIRST', 'LAST'), help="Monthly totals, YYYY-MM")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    _require_numpy()
+    from database.database_manager import DatabaseManager
+    db_manager = DatabaseManager(args.db)
+    try:
+        start = time.perf_counter()
+        with db_manager.reader() as conn:
+            register = AssetRegister.load(conn)
+        logger.info(f"Loaded {len(register)} assets in {time.perf_counter() - start:.2f}s")
+
+        if args.as_of:
+            start = time.perf_counter()
+            book, accumulated = register.value_as_of(args.as_of)
+            print(f"As of {args.as_of}: {len(register)} assets, book value {book.sum():,.2f}, "
+                  f"accumulated depreciation {accumulated.sum():,.2f} "
+                  f"({time.perf_counter() - start:.3f}s)")
+            if args.save:
+                with db_manager.transaction() as conn:
+                    save_valuation(conn, register, args.as_of, book, accumulated)
+                print("Valuation saved to valuacion_activos")
+
+        if args.series:
+            months, totals, charges = register.monthly_series(*args.series)
+            for month, total, charge in zip(months, totals, charges):
+                print(f"{month}  book value {total:>18,.2f}  depreciation {charge:>16,.2f}")
+    finally:
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
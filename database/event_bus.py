@@ -0,0 +1,312 @@
+"""In-process event bus for audit records and low-stock notifications.
+
+Callers publish events after their own transaction commits; a single
+background thread drains the queue and writes whole batches in one transaction,
+so assignment and stock operations no longer pay for the audit insert or the
+notification fan-out.
+
+Not every write path has a bus (bulk import, the desktop tabs, the CLI tools,
+the sqlite shell). For those, ``encolar_asignacion_equipo`` and
+``encolar_stock_bajo`` append one row to ``eventos_pendientes`` (the change
+log) and nothing else; the writer drains the log together with its queue, so
+the audit row and the fan-out still happen outside the caller's transaction.
+While a log trigger exists the bus does not queue the same event again:
+assignment and stock events only reach the listeners.
+
+The queue is bounded: when the writer falls behind, ``publish_*`` blocks (up to
+``put_timeout``, then ``queue.Full``) instead of letting memory grow. Stock
+events only carry the article id; the writer reads the committed quantity once
+per batch, notifies active 'Administrador' and 'Gestor de Inventario' users,
+and sends at most one alert per article per ``dedup_window`` seconds.
+"""
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_ROLES = ('Administrador', 'Gestor de Inventario')
+
+ASSIGNMENT_ACTION = 'Asignación de Equipo'
+
+LOG_TABLE = 'eventos_pendientes'
+# Per-row fan-out triggers replaced by the change log
+LEGACY_TRIGGERS = ('auditar_asignacion_equipo', 'notificar_stock_bajo')
+
+# name -> (tables the bus needs to write the event, body); each one only appends a row to the change log
+TRIGGERS = {
+    'encolar_asignacion_equipo': (('equipo_asignado', 'auditoria'), f'''
+    AFTER INSERT ON equipo_asignado
+    BEGIN
+        INSERT INTO {LOG_TABLE} (tipo, id_articulo, id_registro, id_usuario, datos)
+        VALUES ('asignacion', NEW.id_articulo, NEW.id_asignacion, NEW.id_usuario_asignacion,
+                'Artículo: ' || NEW.id_articulo || ', Agente: ' || NEW.id_agente);
+    END
+    '''),
+    'encolar_stock_bajo': (('stock', 'stock_minimo', 'articulos', 'usuarios', 'notificaciones'), f'''
+    AFTER UPDATE OF cantidad ON stock
+    WHEN NEW.cantidad <= (SELECT stock_minimo FROM stock_minimo WHERE id_articulo = NEW.id_articulo)
+    BEGIN
+        INSERT INTO {LOG_TABLE} (tipo, id_articulo) VALUES ('stock', NEW.id_articulo);
+    END
+    '''),
+}
+
+_STOP = object()
+_DRAIN = ('drain', None)
+
+
+def install(conn):
+    """Create the change log, replace the fan-out triggers and return the log triggers installed."""
+    conn.execute(f'''
+    CREATE TABLE IF NOT EXISTS {LOG_TABLE} (
+        id_evento INTEGER PRIMARY KEY,
+        tipo TEXT NOT NULL,
+        id_articulo INTEGER NOT NULL,
+        id_registro INTEGER,
+        id_usuario INTEGER,
+        datos TEXT,
+        fecha_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    for name in LEGACY_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    installed = []
+    for name, (tables, body) in TRIGGERS.items():
+        present = conn.execute(
+            f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({','.join('?' * len(tables))})",
+            tables
+        ).fetchone()[0]
+        if present == len(tables):
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute(f"CREATE TRIGGER {name} {body}")
+            installed.append(name)
+    return installed
+
+
+class EventBus:
+    """Bounded event queue with a batching background writer."""
+
+    def __init__(self, db_manager, max_queue=10000, batch_size=500, flush_interval=0.5,
+                 dedup_window=3600, put_timeout=None, retries=3):
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dedup_window = dedup_window
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self.written = {'auditoria': 0, 'notificaciones': 0}
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._last_alert = {}
+        self._listeners = []
+        with db_manager.reader() as conn:
+            self.triggers = {row[0] for row in conn.execute(
+                f"SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN ({','.join('?' * len(TRIGGERS))})",
+                tuple(TRIGGERS)
+            )}
+        self._thread = threading.Thread(target=self._run, name='event-bus', daemon=True)
+        self._thread.start()
+
+    def _put(self, event):
+        self._queue.put(event, timeout=self.put_timeout)
+
+    def add_listener(self, listener):
+        """Call ``listener(id_articulo)`` on the publishing thread for every event about an article."""
+        self._listeners.append(listener)
+
+    def article_changed(self, id_articulo):
+        """Tell listeners an article has a new event (maintenance, state change...) without writing anything."""
+        for listener in self._listeners:
+            try:
+                listener(id_articulo)
+            except Exception as e:
+                logger.error(f"Event listener failed: {str(e)}")
+
+    def publish_audit(self, accion, tabla_afectada, id_registro=None, id_usuario=None,
+                      datos_anteriores=None, datos_nuevos=None, ip_address=None):
+        """Queue one ``auditoria`` row; the timestamp is taken now, not at flush time."""
+        self._put(('audit', (
+            id_usuario, accion, tabla_afectada, id_registro, datos_anteriores, datos_nuevos,
+            time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()), ip_address,
+        )))
+
+    def publish_assignment(self, id_asignacion, id_articulo, id_agente, id_usuario=None):
+        """Audit an equipment assignment, unless ``encolar_asignacion_equipo`` already logged it."""
+        if 'encolar_asignacion_equipo' not in self.triggers:
+            self.publish_audit(
+                ASSIGNMENT_ACTION, 'equipo_asignado', id_asignacion, id_usuario,
+                datos_nuevos=f"Artículo: {id_articulo}, Agente: {id_agente}",
+            )
+        self.article_changed(id_articulo)
+
+    def publish_stock_change(self, id_articulo):
+        """Signal that an article's stock changed; the writer checks it against ``stock_minimo``.
+
+        With ``encolar_stock_bajo`` installed a low stock is already in the
+        change log, and only the listeners are told.
+        """
+        if 'encolar_stock_bajo' not in self.triggers:
+            self._put(('stock', id_articulo))
+        self.article_changed(id_articulo)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self, timeout=None):
+        """Block until every event queued or logged so far has been written (or ``timeout`` expires)."""
+        if self.triggers:
+            self._put(_DRAIN)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=10):
+        """Write what is queued and stop the writer thread."""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        logger.info(
+            f"Event bus closed: {self.written['auditoria']} audit rows, "
+            f"{self.written['notificaciones']} notifications, {self.dropped} events dropped"
+        )
+
+    def _run(self):
+        running = True
+        while running:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._drain_log()
+                continue
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            running = _STOP not in batch
+            events = [event for event in batch if event is not _STOP and event is not _DRAIN]
+            try:
+                if events:
+                    self._write_with_retries(events)
+                self._drain_log()
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _drain_log(self):
+        """Write change-log rows one batch at a time until the log is empty."""
+        if not self.triggers:
+            return
+        while self._write_with_retries([]) == self.batch_size:
+            pass
+
+    def _write_with_retries(self, events):
+        """Write ``events`` plus up to ``batch_size`` change-log rows; return the log rows taken."""
+        for attempt in range(1, self.retries + 1):
+            try:
+                return self._write_batch(events)
+            except Exception as e:
+                logger.error(f"Event batch of {len(events)} failed (attempt {attempt}): {str(e)}")
+                time.sleep(0.1 * attempt)
+        # Log rows stay in the table and are retried on the next drain
+        if events:
+            self.dropped += len(events)
+            logger.error(f"Dropped {len(events)} audit/notification events after {self.retries} attempts")
+        return 0
+
+    def _write_batch(self, events):
+        if not events and not self._log_pending():
+            return 0
+        with self.db_manager.transaction() as conn:
+            logged = self._take_log(conn) if self.triggers else []
+            audits = [payload for kind, payload in events if kind == 'audit']
+            audits.extend(
+                (id_usuario, ASSIGNMENT_ACTION, 'equipo_asignado', id_registro, None, datos, fecha_hora, None)
+                for tipo, id_articulo, id_registro, id_usuario, datos, fecha_hora in logged if tipo == 'asignacion'
+            )
+            # Several changes to one article in a batch collapse into one check
+            articles = list(dict.fromkeys(
+                [payload for kind, payload in events if kind == 'stock'] +
+                [row[1] for row in logged if row[0] == 'stock']
+            ))
+            if audits:
+                conn.executemany('''
+                INSERT INTO auditoria (id_usuario, accion, tabla_afectada, id_registro,
+                                       datos_anteriores, datos_nuevos, fecha_hora, ip_address)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', audits)
+            notifications, alerted = self._low_stock_notifications(conn, articles)
+            if notifications:
+                conn.executemany(
+                    "INSERT INTO notificaciones (id_usuario, titulo, mensaje, tipo) VALUES (?, ?, ?, ?)",
+                    notifications
+                )
+        self.written['auditoria'] += len(audits)
+        self.written['notificaciones'] += len(notifications)
+        # Only start the dedup window once the alert is actually committed
+        now = time.monotonic()
+        for id_articulo in alerted:
+            self._last_alert[id_articulo] = now
+        return len(logged)
+
+    def _log_pending(self):
+        if not self.triggers:
+            return False
+        with self.db_manager.reader() as conn:
+            return conn.execute(f"SELECT 1 FROM {LOG_TABLE} LIMIT 1").fetchone() is not None
+
+    def _take_log(self, conn):
+        """Read and delete the oldest ``batch_size`` change-log rows (same transaction as the writes)."""
+        rows = conn.execute(f'''
+        SELECT id_evento, tipo, id_articulo, id_registro, id_usuario, datos, fecha_hora
+        FROM {LOG_TABLE} ORDER BY id_evento LIMIT ?
+        ''', (self.batch_size,)).fetchall()
+        if rows:
+            conn.execute(f"DELETE FROM {LOG_TABLE} WHERE id_evento <= ?", (rows[-1][0],))
+        return [row[1:] for row in rows]
+
+    def _low_stock_notifications(self, conn, articles):
+        now = time.monotonic()
+        due = [a for a in articles if now - self._last_alert.get(a, float('-inf')) >= self.dedup_window]
+        if not due:
+            return [], []
+
+        low = []
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(due), 500):
+            chunk = due[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            low.extend(conn.execute(f'''
+            SELECT s.id_articulo, a.nombre_articulo, s.cantidad, sm.stock_minimo
+            FROM stock s
+            JOIN stock_minimo sm ON sm.id_articulo = s.id_articulo
+            JOIN articulos a ON a.id_articulo = s.id_articulo
+            WHERE s.id_articulo IN ({placeholders}) AND s.cantidad <= sm.stock_minimo
+            ''', chunk).fetchall())
+        if not low:
+            return [], []
+
+        role_placeholders = ','.join('?' * len(NOTIFICATION_ROLES))
+        recipients = [row[0] for row in conn.execute(
+            f"SELECT id_usuario FROM usuarios WHERE activo = 1 AND rol IN ({role_placeholders})",
+            NOTIFICATION_ROLES
+        )]
+        notifications = []
+        for id_articulo, nombre, cantidad, minimo in low:
+            mensaje = (f"El artículo {nombre} tiene un stock de {cantidad} unidades, "
+                       f"por debajo del mínimo de {minimo} unidades.")
+            notifications.extend(
+                (id_usuario, 'Alerta de Stock Bajo', mensaje, 'alerta') for id_usuario in recipients
+            )
+        return notifications, [row[0] for row in low]
+
@@ -0,0 +1,233 @@
+"""Per-article event timeline merged from its four sources.
+
+``vista_historial_equipo`` unions assignments, maintenance, state changes and
+stock movements for every article and sorts the whole result. For one article
+the service instead reads each source through its ``(id_articulo, fecha)``
+index, newest first and a chunk at a time, and merges the four ordered streams
+lazily with ``heapq.merge``. Pages are cut from the merged stream, so showing
+the first page of an article with 10,000 movements reads about one page per
+source.
+
+Recently viewed articles keep their partially consumed merge in an LRU cache;
+``invalidate(id_articulo)`` (wired to ``EventBus.add_listener``) drops an
+article as soon as a new event for it is published.
+"""
+import heapq
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# tipo_evento -> SELECT returning (fecha, id, persona_relacionada, detalles) for one article.
+# {after} is replaced by the keyset condition; rows must come newest first.
+SOURCES = [
+    ('Asignación', '''
+    SELECT ea.fecha_asignacion, ea.id_asignacion, ag.nombre_agente, ea.observaciones
+    FROM equipo_asignado ea
+    JOIN agentes ag ON ag.id_agente = ea.id_agente
+    WHERE ea.id_articulo = ? {after}
+    ORDER BY ea.fecha_asignacion DESC, ea.id_asignacion DESC
+    LIMIT ?
+    ''', 'ea.fecha_asignacion', 'ea.id_asignacion'),
+    ('Mantenimiento', '''
+    SELECT m.fecha_inicio, m.id_mantenimiento, m.responsable, m.descripcion
+    FROM mantenimiento m
+    WHERE m.id_articulo = ? {after}
+    ORDER BY m.fecha_inicio DESC, m.id_mantenimiento DESC
+    LIMIT ?
+    ''', 'm.fecha_inicio', 'm.id_mantenimiento'),
+    ('Cambio de Estado', '''
+    SELECT he.fecha_cambio, he.id_historial, u.nombre_usuario,
+           'Cambio de ' || he.estado_anterior || ' a ' || he.estado_nuevo
+    FROM historial_estado he
+    LEFT JOIN usuarios u ON he.usuario = u.id_usuario
+    WHERE he.id_articulo = ? {after}
+    ORDER BY he.fecha_cambio DESC, he.id_historial DESC
+    LIMIT ?
+    ''', 'he.fecha_cambio', 'he.id_historial'),
+    ('Movimiento de Stock', '''
+    SELECT m.fecha_movimiento, m.id_movimiento, u.nombre_usuario,
+           m.tipo_movimiento || ' de ' || m.cantidad || ' unidades'
+    FROM movimientos m
+    LEFT JOIN usuarios u ON m.id_usuario = u.id_usuario
+    WHERE m.id_articulo = ? {after}
+    ORDER BY m.fecha_movimiento DESC, m.id_movimiento DESC
+    LIMIT ?
+    ''', 'm.fecha_movimiento', 'm.id_movimiento'),
+]
+
+# Indexes that let every source stream one article's rows already in date order
+HISTORY_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_equipo_asignado_articulo_fecha ON equipo_asignado(id_articulo, fecha_asignacion)",
+    "CREATE INDEX IF NOT EXISTS idx_mantenimiento_articulo_fecha ON mantenimiento(id_articulo, fecha_inicio)",
+    "CREATE INDEX IF NOT EXISTS idx_articulo_estado_fecha ON historial_estado(id_articulo, fecha_cambio)",
+    "CREATE INDEX IF NOT EXISTS idx_movimientos_articulo_fecha "
+    "ON movimientos(id_articulo, fecha_movimiento, tipo_movimiento, cantidad)",
+]
+
+# The shipped view fails to prepare ("1st ORDER BY term does not match any
+# column"): a compound SELECT can only be ordered by its result column names.
+HISTORY_VIEW = '''
+CREATE VIEW vista_historial_equipo AS
+    SELECT * FROM (
+        SELECT a.id_articulo AS id_articulo, a.nombre_articulo AS nombre_articulo,
+               'Asignación' AS tipo_evento, ea.fecha_asignacion AS fecha_evento,
+               ag.nombre_agente AS persona_relacionada, ea.observaciones AS detalles
+        FROM equipo_asignado ea
+        JOIN articulos a ON ea.id_articulo = a.id_articulo
+        JOIN agentes ag ON ea.id_agente = ag.id_agente
+        UNION ALL
+        SELECT a.id_articulo, a.nombre_articulo, 'Mantenimiento', m.fecha_inicio, m.responsable, m.descripcion
+        FROM mantenimiento m
+        JOIN articulos a ON m.id_articulo = a.id_articulo
+        UNION ALL
+        SELECT a.id_articulo, a.nombre_articulo, 'Cambio de Estado', he.fecha_cambio, u.nombre_usuario,
+               'Cambio de ' || he.estado_anterior || ' a ' || he.estado_nuevo
+        FROM historial_estado he
+        JOIN articulos a ON he.id_articulo = a.id_articulo
+        LEFT JOIN usuarios u ON he.usuario = u.id_usuario
+        UNION ALL
+        SELECT a.id_articulo, a.nombre_articulo, 'Movimiento de Stock', m.fecha_movimiento, u.nombre_usuario,
+               m.tipo_movimiento || ' de ' || m.cantidad || ' unidades'
+        FROM movimientos m
+        JOIN articulos a ON m.id_articulo = a.id_articulo
+        LEFT JOIN usuarios u ON m.id_usuario = u.id_usuario
+    )
+    ORDER BY id_articulo, fecha_evento DESC
+'''
+
+
+def install(conn):
+    """Create the per-article date indexes and replace the broken history view."""
+    for sql in HISTORY_INDEXES:
+        conn.execute(sql)
+    conn.execute("DROP VIEW IF EXISTS vista_historial_equipo")
+    conn.execute(HISTORY_VIEW)
+
+
+def _sort_key(event):
+    # (fecha or '', tipo, id): NULL dates sort after every real date, as in ORDER BY ... DESC
+    return event[4]
+
+
+class _Timeline:
+    """One article's lazily merged event stream plus the events already taken from it."""
+
+    def __init__(self, db_manager, id_articulo, chunk_size):
+        self.events = []
+        self.created = time.monotonic()
+        self.exhausted = False
+        streams = [
+            self._stream(db_manager, id_articulo, tipo, sql, date_column, id_column, chunk_size)
+            for tipo, sql, date_column, id_column in SOURCES
+        ]
+        self._merged = heapq.merge(*streams, key=_sort_key, reverse=True)
+
+    @staticmethod
+    def _stream(db_manager, id_articulo, tipo, sql, date_column, id_column, chunk_size):
+        """Yield (fecha, tipo, persona, detalles, sort key) newest first, one keyset chunk at a time.
+
+        Dated rows are paged with a row-value range on the (id_articulo, fecha)
+        index; rows without a date come last, as ORDER BY ... DESC puts them.
+        """
+        after, bound = '', ()
+        undated = False
+        while True:
+            rows = db_manager.execute_query(sql.format(after=after), (id_articulo, *bound, chunk_size)) or []
+            for fecha, source_id, persona, detalles in rows:
+                yield (fecha, tipo, persona, detalles, (fecha or '', tipo, source_id))
+            if len(rows) == chunk_size:
+                fecha, source_id = rows[-1][0], rows[-1][1]
+                if fecha is None:
+                    undated = True
+                    after, bound = f"AND {date_column} IS NULL AND {id_column} < ?", (source_id,)
+                else:
+                    after, bound = f"AND ({date_column}, {id_column}) < (?, ?)", (fecha, source_id)
+            elif after and not undated:
+                # Dated rows are exhausted; the first query was the only one that included undated rows
+                undated = True
+                after, bound = f"AND {date_column} IS NULL", ()
+            else:
+                return
+
+    def ensure(self, count):
+        """Pull from the merge until ``count`` events are materialized (or the sources run out)."""
+        while len(self.events) < count and not self.exhausted:
+            try:
+                self.events.append(next(self._merged))
+            except StopIteration:
+                self.exhausted = True
+
+
+class HistoryService:
+    """Paged per-article history with an LRU cache of recently viewed articles."""
+
+    def __init__(self, db_manager, max_articles=64, chunk_size=50, max_age=300):
+        self.db_manager = db_manager
+        self.max_articles = max_articles
+        self.chunk_size = chunk_size
+        self.max_age = max_age
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    def _timeline(self, id_articulo):
+        timeline = self._cache.get(id_articulo)
+        if timeline is not None and time.monotonic() - timeline.created <= self.max_age:
+            self._cache.move_to_end(id_articulo)
+            self.hits += 1
+            return timeline
+        self.misses += 1
+        timeline = _Timeline(self.db_manager, id_articulo, self.chunk_size)
+        self._cache[id_articulo] = timeline
+        self._cache.move_to_end(id_articulo)
+        while len(self._cache) > self.max_articles:
+            self._cache.popitem(last=False)
+        return timeline
+
+    def page(self, id_articulo, page=0, page_size=50):
+        """Return ``(events, has_more)`` for one page, newest first.
+
+        Each event is ``(tipo_evento, fecha_evento, persona_relacionada, detalles)``,
+        the columns of ``vista_historial_equipo`` without the article ones.
+        """
+        start = page * page_size
+        with self._lock:
+            timeline = self._timeline(id_articulo)
+            # One extra event tells whether a next page exists
+            timeline.ensure(start + page_size + 1)
+            events = timeline.events[start:start + page_size]
+            has_more = len(timeline.events) > start + page_size
+        return [(tipo, fecha, persona, detalles) for fecha, tipo, persona, detalles, _ in events], has_more
+
+    def latest(self, id_articulo, limit=20):
+        """Shortcut for the first page."""
+        return self.page(id_articulo, 0, limit)[0]
+
+    def invalidate(self, id_articulo=None):
+        """Forget one article's cached timeline (or every article's when ``id_articulo`` is None)."""
+        with self._lock:
+            if id_articulo is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(id_articulo, None)
+
+    def sync(self, version):
+        """Forget every cached timeline if ``version`` differs from the last one seen.
+
+        The event bus only reports this process's changes; pass a counter that
+        moves on every commit (``PRAGMA data_version`` of a connection that never
+        writes) to also catch other processes' writes.
+        """
+        with self._lock:
+            if version != self._version:
+                self._cache.clear()
+                self._version = version
+
+    def attach(self, event_bus):
+        """Invalidate an article whenever an event about it is published on ``event_bus``."""
+        event_bus.add_listener(self.invalidate)
@@ -0,0 +1,598 @@
+"""Versioned schema migrations tracked in ``PRAGMA user_version``.
+
+Each migration runs in its own transaction together with the version bump, so a
+database is always exactly at one version. Migrations are written to be
+idempotent (they inspect the schema before changing it) because databases in
+the field were repaired by hand in different ways.
+
+A migration that cannot install because its tables are missing raises
+``MigrationSkipped``. The version still advances, so later migrations run, and
+the skip is recorded in ``migraciones_omitidas`` together with the database's
+``schema_version``. It does not apply to that schema, so it does not keep the
+database from being current: it is retried when the schema has changed since
+(someone created tables), or when the command-line tool runs.
+
+Usage (from the repository root):
+
+    python -m database.migrations --db gestion_empresa.db            # migrate to latest
+    python -m database.migrations --db gestion_empresa.db --status   # show version
+    python -m database.migrations --db gestion_empresa.db --backup copia.db
+"""
+import argparse
+import logging
+import os
+import sqlite3
+from datetime import datetime
+
+from database import aggregates
+from database import archive
+from database import event_bus
+from database import history_service
+from database import search
+from database import spec_index
+from database import stock_ledger
+from database.setup_database import SCHEMA
+
+logger = logging.getLogger(__name__)
+
+SKIPPED_TABLE = 'migraciones_omitidas'
+
+
+class MigrationSkipped(Exception):
+    """Raised by a migration whose tables are not there yet; it is recorded and retried."""
+
+
+def table_exists(conn, name, object_type='table'):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = ? AND name = ?", (object_type, name)
+    ).fetchone() is not None
+
+
+def column_names(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def add_column(conn, table, column, definition):
+    """ALTER TABLE ... ADD COLUMN unless the column is already there."""
+    if column not in column_names(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _without_trigger(conn, name, statement):
+    """Run ``statement`` with trigger ``name`` temporarily dropped (same transaction)."""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type='trigger' AND name=?", (name,)).fetchone()
+    if row:
+        conn.execute(f"DROP TRIGGER {name}")
+    conn.execute(statement)
+    if row:
+        conn.execute(row[0])
+
+
+def _migration_base_schema(conn):
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+
+def _migration_proveedores_nombre(conn):
+    # Replaces fix_database's drop-and-recreate: keep every column, just add 'nombre'
+    columns = column_names(conn, 'proveedores')
+    if 'nombre' not in columns:
+        conn.execute("ALTER TABLE proveedores ADD COLUMN nombre TEXT")
+        if 'nombre_proveedor' in columns:
+            conn.execute("UPDATE proveedores SET nombre = nombre_proveedor WHERE nombre IS NULL")
+
+
+def _merge_families(conn):
+    if not (table_exists(conn, 'familia') and table_exists(conn, 'familias')):
+        return
+    add_column(conn, 'familia', 'descripcion', 'TEXT')
+    for legacy in ('familias', 'familias_new'):
+        if not table_exists(conn, legacy):
+            continue
+        description = 'descripcion' if 'descripcion' in column_names(conn, legacy) else 'NULL'
+        # Keep the legacy id when it is free so existing references stay valid
+        conn.execute(f'''
+        INSERT INTO familia (id_familia, nombre_familia, descripcion)
+        SELECT l.id_familia, l.nombre_familia, {description} FROM {legacy} l
+        WHERE NOT EXISTS (SELECT 1 FROM familia f WHERE f.id_familia = l.id_familia)
+          AND NOT EXISTS (SELECT 1 FROM familia f WHERE f.nombre_familia = l.nombre_familia)
+        ''')
+        conn.execute(f'''
+        INSERT INTO familia (nombre_familia, descripcion)
+        SELECT l.nombre_familia, {description} FROM {legacy} l
+        WHERE NOT EXISTS (SELECT 1 FROM familia f WHERE f.nombre_familia = l.nombre_familia)
+        ''')
+
+    if table_exists(conn, 'subfamilias') and table_exists(conn, 'subfamilia'):
+        add_column(conn, 'subfamilia', 'descripcion', 'TEXT')
+        legacy_columns = column_names(conn, 'subfamilias')
+        description = 'descripcion' if 'descripcion' in legacy_columns else 'NULL'
+        # Legacy subfamilias point at familias ids; translate them through the family name
+        conn.execute('''
+        CREATE TEMP TABLE mapa_familias AS
+        SELECT l.id_familia AS id_legacy, f.id_familia AS id_familia
+        FROM familias l JOIN familia f ON f.nombre_familia = l.nombre_familia
+        ''')
+        conn.execute(f'''
+        INSERT INTO subfamilia (id_subfamilia, id_familia, nombre_subfamilia, descripcion)
+        SELECT s.id_subfamilia, m.id_familia, s.nombre, {description}
+        FROM subfamilias s JOIN mapa_familias m ON m.id_legacy = s.id_familia
+        WHERE NOT EXISTS (SELECT 1 FROM subfamilia x WHERE x.id_subfamilia = s.id_subfamilia)
+          AND NOT EXISTS (SELECT 1 FROM subfamilia x
+                          WHERE x.id_familia = m.id_familia AND x.nombre_subfamilia = s.nombre)
+        ''')
+        conn.execute(f'''
+        INSERT INTO subfamilia (id_familia, nombre_subfamilia, descripcion)
+        SELECT m.id_familia, s.nombre, {description}
+        FROM subfamilias s JOIN mapa_familias m ON m.id_legacy = s.id_familia
+        WHERE NOT EXISTS (SELECT 1 FROM subfamilia x
+                          WHERE x.id_familia = m.id_familia AND x.nombre_subfamilia = s.nombre)
+        ''')
+        conn.execute("DROP TABLE mapa_familias")
+        conn.execute("DROP TABLE subfamilias")
+        conn.execute('''
+        CREATE VIEW subfamilias AS
+            SELECT id_subfamilia, nombre_subfamilia AS nombre, id_familia, descripcion FROM subfamilia
+        ''')
+        # The subfamilies tab still writes through the old name
+        conn.execute('''
+        CREATE TRIGGER subfamilias_insert INSTEAD OF INSERT ON subfamilias
+        BEGIN
+            INSERT INTO subfamilia (id_subfamilia, id_familia, nombre_subfamilia, descripcion)
+            VALUES (NEW.id_subfamilia, NEW.id_familia, NEW.nombre, NEW.descripcion);
+        END
+        ''')
+        conn.execute('''
+        CREATE TRIGGER subfamilias_update INSTEAD OF UPDATE ON subfamilias
+        BEGIN
+            UPDATE subfamilia SET id_familia = NEW.id_familia, nombre_subfamilia = NEW.nombre,
+                                  descripcion = NEW.descripcion
+            WHERE id_subfamilia = OLD.id_subfamilia;
+        END
+        ''')
+        conn.execute('''
+        CREATE TRIGGER subfamilias_delete INSTEAD OF DELETE ON subfamilias
+        BEGIN
+            DELETE FROM subfamilia WHERE id_subfamilia = OLD.id_subfamilia;
+        END
+        ''')
+
+    conn.execute("DROP TABLE IF EXISTS familias_new")
+    conn.execute("DROP TABLE familias")
+    conn.execute("CREATE VIEW familias AS SELECT id_familia, nombre_familia, descripcion FROM familia")
+    conn.execute('''
+    CREATE TRIGGER familias_insert INSTEAD OF INSERT ON familias
+    BEGIN
+        INSERT INTO familia (id_familia, nombre_familia, descripcion)
+        VALUES (NEW.id_familia, NEW.nombre_familia, NEW.descripcion);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER familias_update INSTEAD OF UPDATE ON familias
+    BEGIN
+        UPDATE familia SET nombre_familia = NEW.nombre_familia, descripcion = NEW.descripcion
+        WHERE id_familia = OLD.id_familia;
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER familias_delete INSTEAD OF DELETE ON familias
+    BEGIN
+        DELETE FROM familia WHERE id_familia = OLD.id_familia;
+    END
+    ''')
+
+
+def _keep_discarded(conn, legacy, table, number_column):
+    """Copy the ``legacy`` rows the merge into ``table`` ignored into ``<legacy>_descartados``.
+
+    A row counts as merged when ``table`` holds the same article, number,
+    date and remarks; anything else clashed with a unique key and would be lost
+    with the legacy table. Returns the number of rows kept aside.
+    """
+    conn.execute(f"DROP TABLE IF EXISTS {legacy}_descartados")
+    conn.execute(f'''
+    CREATE TABLE {legacy}_descartados AS
+    SELECT l.* FROM {legacy} l
+    WHERE NOT EXISTS (
+        SELECT 1 FROM {table} t
+        WHERE t.{number_column} = l.{number_column} AND t.id_articulo = l.id_articulo
+          AND t.fecha_registro IS l.fecha_registro AND t.observaciones IS l.observaciones
+    )
+    ''')
+    discarded = conn.execute(f"SELECT COUNT(*) FROM {legacy}_descartados").fetchone()[0]
+    if discarded:
+        logger.warning(
+            f"{discarded} rows of {legacy} clash with existing {table} rows and were not merged; "
+            f"they are kept in {legacy}_descartados for review"
+        )
+    else:
+        conn.execute(f"DROP TABLE {legacy}_descartados")
+    return discarded
+
+
+def _merge_serial_and_patrimony(conn):
+    if table_exists(conn, 'numero_serie') and table_exists(conn, 'numeros_serie'):
+        conn.execute('''
+        INSERT OR IGNORE INTO numeros_serie (id_articulo, numero_serie, fecha_registro, observaciones)
+        SELECT id_articulo, numero_serie, fecha_registro, observaciones FROM numero_serie
+        ''')
+        _keep_discarded(conn, 'numero_serie', 'numeros_serie', 'numero_serie')
+        conn.execute("DROP TABLE numero_serie")
+        conn.execute('''
+        CREATE VIEW numero_serie AS
+            SELECT id_numero_serie AS id_serie, id_articulo, numero_serie, fecha_registro, observaciones
+            FROM numeros_serie
+        ''')
+    if table_exists(conn, 'numero_patrimonio') and table_exists(conn, 'numeros_patrimonio'):
+        conn.execute('''
+        INSERT OR IGNORE INTO numeros_patrimonio (id_articulo, numero_patrimonio, fecha_registro, observaciones)
+        SELECT id_articulo, numero_patrimonio, fecha_registro, observaciones FROM numero_patrimonio
+        ''')
+        _keep_discarded(conn, 'numero_patrimonio', 'numeros_patrimonio', 'numero_patrimonio')
+        conn.execute("DROP TABLE numero_patrimonio")
+        conn.execute('''
+        CREATE VIEW numero_patrimonio AS
+            SELECT id_numero_patrimonio AS id_patrimonio, id_articulo, numero_patrimonio, fecha_registro,
+                   observaciones
+            FROM numeros_patrimonio
+        ''')
+    if table_exists(conn, 'numeros_patrimonio'):
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_numeros_patrimonio_articulo ON numeros_patrimonio(id_articulo)"
+        )
+
+
+def _merge_movements(conn):
+    if not (table_exists(conn, 'movimientos') and table_exists(conn, 'movimientos_stock')):
+        return
+    add_column(conn, 'movimientos', 'observaciones', 'TEXT')
+    # These movements were already applied to stock by the code that wrote them
+    _without_trigger(conn, 'update_stock_after_movement', '''
+    INSERT INTO movimientos (id_articulo, cantidad, tipo_movimiento, fecha_movimiento, id_usuario, observaciones)
+    SELECT id_articulo, cantidad, tipo_movimiento, fecha_movimiento, id_usuario, observaciones
+    FROM movimientos_stock
+    ORDER BY id_movimiento
+    ''')
+    conn.execute("DROP TABLE movimientos_stock")
+    conn.execute('''
+    CREATE VIEW movimientos_stock AS
+        SELECT id_movimiento, id_articulo, tipo_movimiento, cantidad, fecha_movimiento, id_usuario, observaciones
+        FROM movimientos
+    ''')
+
+
+def _repoint_assignment_view(conn):
+    if not table_exists(conn, 'vista_equipos_asignados', 'view'):
+        return
+    conn.execute("DROP VIEW vista_equipos_asignados")
+    conn.execute('''
+    CREATE VIEW vista_equipos_asignados AS
+        SELECT
+            ea.id_asignacion,
+            a.id_articulo,
+            a.nombre_articulo,
+            ag.id_agente,
+            ag.nombre_agente,
+            ag.contacto,
+            ag.telefono,
+            ag.email,
+            d.nombre_departamento,
+            ea.fecha_asignacion,
+            ea.fecha_devolucion,
+            ea.estado,
+            ea.observaciones,
+            np.numero_patrimonio,
+            ns.numero_serie
+        FROM
+            equipo_asignado ea
+        JOIN articulos a ON ea.id_articulo = a.id_articulo
+        JOIN agentes ag ON ea.id_agente = ag.id_agente
+        LEFT JOIN agente_departamento ad ON ag.id_agente = ad.id_agente AND ad.es_principal = 1
+        LEFT JOIN departamentos d ON ad.id_departamento = d.id_departamento
+        LEFT JOIN numeros_patrimonio np ON a.id_articulo = np.id_articulo
+        LEFT JOIN numeros_serie ns ON a.id_articulo = ns.id_articulo
+        WHERE ea.fecha_devolucion IS NULL OR ea.estado = 'Asignado'
+    ''')
+
+
+def _migration_consolidate_legacy_tables(conn):
+    _merge_families(conn)
+    _merge_serial_and_patrimony(conn)
+    _merge_movements(conn)
+    _repoint_assignment_view(conn)
+
+
+def _migration_aggregates(conn):
+    if not aggregates.is_supported(conn):
+        raise MigrationSkipped(f"tables missing for the aggregates: {', '.join(aggregates.REQUIRED_TABLES)}")
+    aggregates.ensure_installed(conn)
+
+
+def _migration_search(conn):
+    search.ensure_installed(conn)
+    if not search.is_installed(conn):
+        raise MigrationSkipped("no searchable table")
+
+
+def _migration_asset_valuation(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS valuacion_activos (
+        id_articulo INTEGER NOT NULL,
+        fecha_valuacion DATE NOT NULL,
+        valor_libros REAL NOT NULL,
+        depreciacion_acumulada REAL NOT NULL,
+        PRIMARY KEY (fecha_valuacion, id_articulo),
+        FOREIGN KEY (id_articulo) REFERENCES articulos (id_articulo)
+    ) WITHOUT ROWID
+    ''')
+
+
+def _migration_stock_ledger(conn):
+    stock_ledger.ensure_installed(conn)
+    if not stock_ledger.is_installed(conn):
+        raise MigrationSkipped("movimientos table missing")
+
+
+def _migration_event_bus(conn):
+    # Audit rows and low-stock alerts are now written by database.event_bus.EventBus
+    # (migration 15 adds the change log for the write paths that do not publish)
+    conn.execute("DROP TRIGGER IF EXISTS auditar_asignacion_equipo")
+    conn.execute("DROP TRIGGER IF EXISTS notificar_stock_bajo")
+
+
+def _require_tables(conn, *tables):
+    missing = [table for table in tables if not table_exists(conn, table)]
+    if missing:
+        raise MigrationSkipped(f"tables missing: {', '.join(missing)}")
+
+
+def _migration_history(conn):
+    _require_tables(conn, 'equipo_asignado', 'mantenimiento', 'historial_estado', 'movimientos')
+    history_service.install(conn)
+
+
+def _migration_spec_index(conn):
+    _require_tables(conn, 'articulo_especificacion', 'especificaciones')
+    spec_index.install(conn)
+
+
+def _migration_archive(conn):
+    archive.install(conn)
+
+
+def _migration_snapshot_invalidation(conn):
+    if stock_ledger.is_installed(conn):
+        # Recreates ledger_invalidar_snapshots, which now drops whole cuts
+        stock_ledger.install(conn)
+        dropped = stock_ledger.drop_orphaned_snapshots(conn)
+        if dropped:
+            logger.info(f"Deleted {dropped} snapshot rows of invalidated cuts")
+
+
+# Before migration 14 these returned quietly when their tables were missing
+SILENTLY_SKIPPED = (4, 5, 7, 9, 10)
+
+
+def _migration_event_log(conn):
+    # Bulk import, the tabs and the CLI tools never publish to the bus: their writes go
+    # through the change log. Also undoes the withdrawn migration 13, which had put the
+    # per-row fan-out triggers back.
+    if table_exists(conn, SKIPPED_TABLE):
+        conn.execute(f"DELETE FROM {SKIPPED_TABLE} WHERE version = 13")
+    missing = set(event_bus.TRIGGERS) - set(event_bus.install(conn))
+    if missing:
+        raise MigrationSkipped(f"tables missing for {', '.join(sorted(missing))}")
+
+
+def _migration_recheck_skipped(conn):
+    # Rerun the (idempotent) installs so databases stamped past them get their skips recorded
+    recorded = set(skipped_migrations(conn))
+    for number, description, function in MIGRATIONS:
+        if number in SILENTLY_SKIPPED and number not in recorded:
+            try:
+                function(conn)
+            except MigrationSkipped as e:
+                _record_skip(conn, number, description, str(e))
+                logger.warning(f"Migration {number} was skipped ({e}); it is retried when the schema changes")
+
+
+# (version, description, function); append only, never renumber
+MIGRATIONS = [
+    (1, "Base tables", _migration_base_schema),
+    (2, "proveedores.nombre column", _migration_proveedores_nombre),
+    (3, "Consolidate legacy familias/subfamilias/numero_serie/numero_patrimonio/movimientos_stock",
+     _migration_consolidate_legacy_tables),
+    (4, "Incremental inventory aggregates", _migration_aggregates),
+    (5, "Full-text search index", _migration_search),
+    (6, "valuacion_activos table", _migration_asset_valuation),
+    (7, "Append-only movement ledger and stock snapshots", _migration_stock_ledger),
+    (8, "Move assignment audit and low-stock alerts to the event bus", _migration_event_bus),
+    (9, "Per-article history indexes and fixed vista_historial_equipo", _migration_history),
+    (10, "Change counter for the specification search index", _migration_spec_index),
+    (11, "Registry of archived date ranges", _migration_archive),
+    (12, "Back-dated movements invalidate whole snapshot cuts", _migration_snapshot_invalidation),
+    # 13 (restore the per-row audit and low-stock triggers) was withdrawn; 15 replaces it
+    (14, "Record installs skipped for missing tables so they are retried", _migration_recheck_skipped),
+    (15, "Change log for audit and low-stock events written outside the event bus", _migration_event_log),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def skipped_migrations(conn):
+    """Versions recorded as skipped because their tables are missing."""
+    if not table_exists(conn, SKIPPED_TABLE):
+        return []
+    return [row[0] for row in conn.execute(f"SELECT version FROM {SKIPPED_TABLE} ORDER BY version")]
+
+
+def retryable_migrations(conn):
+    """Skipped versions recorded under another schema, whose tables may exist now."""
+    if not table_exists(conn, SKIPPED_TABLE) or 'schema_version' not in column_names(conn, SKIPPED_TABLE):
+        return skipped_migrations(conn)
+    schema = conn.execute("PRAGMA schema_version").fetchone()[0]
+    return [row[0] for row in conn.execute(
+        f"SELECT version FROM {SKIPPED_TABLE} WHERE schema_version IS NOT ? ORDER BY version", (schema,)
+    )]
+
+
+def _record_skip(conn, number, description, reason):
+    conn.execute(f'''
+    CREATE TABLE IF NOT EXISTS {SKIPPED_TABLE} (
+        version INTEGER PRIMARY KEY,
+        descripcion TEXT NOT NULL,
+        motivo TEXT,
+        fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        schema_version INTEGER
+    )
+    ''')
+    add_column(conn, SKIPPED_TABLE, 'schema_version', 'INTEGER')
+    conn.execute(
+        f"INSERT OR REPLACE INTO {SKIPPED_TABLE} (version, descripcion, motivo) VALUES (?, ?, ?)",
+        (number, description, reason)
+    )
+
+
+def _stamp_skips(conn):
+    """Tie the recorded skips to the schema as it is after migrating."""
+    if table_exists(conn, SKIPPED_TABLE) and 'schema_version' in column_names(conn, SKIPPED_TABLE):
+        schema = conn.execute("PRAGMA schema_version").fetchone()[0]
+        conn.execute(f"UPDATE {SKIPPED_TABLE} SET schema_version = ?", (schema,))
+
+
+def is_current(conn):
+    """Return True if no migration is pending and no skip has to be retried (catalog reads only)."""
+    return current_version(conn) >= LATEST_VERSION and not retryable_migrations(conn)
+
+
+def backup_database(db_path, backup_path=None, pages=1024):
+    """Copy the database with SQLite's online backup API and return the backup path.
+
+    The copy advances ``pages`` pages per step and releases the source between
+    steps, so other connections keep reading and writing during the backup.
+    """
+    if backup_path is None:
+        backup_path = f"{db_path}.{datetime.now().strftime('%Y%m%d_%H%M%S')}.backup"
+    source = sqlite3.connect(db_path)
+    target = sqlite3.connect(backup_path)
+    try:
+        def progress(status, remaining, total):
+            logger.debug("Backup progress: %d/%d pages", total - remaining, total)
+
+        source.backup(target, pages=pages, progress=progress, sleep=0.005)
+    finally:
+        target.close()
+        source.close()
+    logger.info(f"Created database backup: {backup_path}")
+    return backup_path
+
+
+def migrate(conn, target=None, retry_skipped=False):
+    """Apply every pending migration up to ``target`` (default: latest); return the new version.
+
+    Skipped migrations up to ``target`` are retried first when the schema has
+    changed since they were skipped, or always with ``retry_skipped``.
+
+    ``conn`` must be in autocommit mode (isolation_level=None), as the
+    DatabaseManager writer is, and not inside a transaction.
+    """
+    target = LATEST_VERSION if target is None else target
+    version = current_version(conn)
+    skipped = set(skipped_migrations(conn) if retry_skipped else retryable_migrations(conn))
+    pending = [m for m in MIGRATIONS if (m[0] in skipped or version < m[0]) and m[0] <= target]
+    if not pending:
+        return version
+    applied = 0
+
+    # Table rebuilds temporarily break references; check them once at the end instead
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys=OFF")
+    try:
+        for number, description, function in pending:
+            logger.info(f"Applying migration {number}: {description}")
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                try:
+                    function(conn)
+                except MigrationSkipped as e:
+                    _record_skip(conn, number, description, str(e))
+                    if number in skipped:
+                        logger.info(f"Migration {number} still skipped ({e})")
+                    else:
+                        logger.warning(f"Migration {number} skipped ({e}); it is retried when the schema changes")
+                else:
+                    applied += 1
+                    if number in skipped:
+                        conn.execute(f"DELETE FROM {SKIPPED_TABLE} WHERE version = ?", (number,))
+                if number > version:
+                    conn.execute(f"PRAGMA user_version = {number}")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            version = max(version, number)
+        _stamp_skips(conn)
+    finally:
+        conn.execute(f"PRAGMA foreign_keys={'ON' if foreign_keys else 'OFF'}")
+
+    # Retries that were skipped again changed nothing worth checking
+    if applied:
+        violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+        if violations:
+            logger.warning(f"{len(violations)} foreign key violations after migrating (see check_db)")
+    return version
+
+
+def migrate_database(db_manager, backup=True, retry_skipped=False):
+    """Back up (if the version is behind) and migrate the database behind a DatabaseManager.
+
+    Retrying skipped migrations only adds objects, so it does not take a backup.
+    """
+    with db_manager.writer() as conn:
+        if is_current(conn) and not (retry_skipped and skipped_migrations(conn)):
+            return LATEST_VERSION
+        behind = current_version(conn) < LATEST_VERSION
+    if backup and behind and db_manager.db_path != ':memory:' and os.path.exists(db_manager.db_path):
+        backup_database(db_manager.db_path)
+    with db_manager.writer() as conn:
+        return migrate(conn, retry_skipped=retry_skipped)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument('--db', default='gestion_patrimonial.db')
+    parser.add_argument('--status', action='store_true', help="Only show the current version")
+    parser.add_argument('--backup', metavar='PATH', help="Only take an online backup to PATH")
+    parser.add_argument('--no-backup', action='store_true', help="Do not back up before migrating")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.backup:
+        backup_database(args.db, args.backup)
+        return
+
+    from database.database_manager import DatabaseManager
+    db_manager = DatabaseManager(args.db)
+    try:
+        if args.status:
+            with db_manager.reader() as conn:
+                print(f"Schema version {current_version(conn)} (latest {LATEST_VERSION})")
+                if table_exists(conn, SKIPPED_TABLE):
+                    for number, description, reason in conn.execute(
+                        f"SELECT version, descripcion, motivo FROM {SKIPPED_TABLE} ORDER BY version"
+                    ):
+                        print(f"  migration {number} skipped: {description} ({reason})")
+            return
+        # Unlike the app's startup, the tool retries every skip
+        version = migrate_database(db_manager, backup=not args.no_backup, retry_skipped=True)
+        print(f"Database at schema version {version}")
+    finally:
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Receive a whole purchase order in one transaction.
+
+Receiving used to mean one ``movimientos`` row, serial number and patrimony
+number at a time, each insert firing ``update_stock_after_movement`` (and the
+stock summary and alert triggers behind it) on its own. ``receive_order`` takes
+every pending ``detalle_orden`` line of an order and, inside a single
+``BEGIN IMMEDIATE`` transaction:
+
+* inserts one 'entrada' movement per line with ``executemany``, with the
+  per-row stock trigger suspended;
+* applies the stock change once per article, as one upsert per article, so
+  the ``stock`` triggers (family summary, ``alertas_stock_actuales``) also run
+  once per article instead of once per line;
+* allocates the patrimony numbers of every fixed-asset unit as one block after
+  the highest existing ``PAT-########`` number and inserts them, together with
+  any serial numbers supplied, with ``executemany``; their search index entries
+  are then added with one INSERT ... SELECT per FTS table rather than by the
+  per-row triggers;
+* marks the lines and the order as received.
+
+The per-article stock upsert fires ``encolar_stock_bajo`` once per article.
+The receipt's audit row is published to the event bus after the commit when a
+bus is given, and written inside the transaction otherwise.
+
+Usage (from the repository root):
+
+    python -m database.purchase_receiving --db gestion_patrimonial.db 42 --ubicacion 3 --usuario 1
+    python -m database.purchase_receiving --db gestion_patrimonial.db 42 --series series.csv
+"""
+import argparse
+import csv
+import logging
+import time
+from collections import namedtuple
+from datetime import date
+
+from database import search
+from database.database_manager import DatabaseManager
+from database.stock_ledger import suspended_triggers
+
+logger = logging.getLogger(__name__)
+
+PATRIMONY_PREFIX = 'PAT-'
+PATRIMONY_DIGITS = 8
+RECEIVED = 'Recibida'
+PATRIMONY_STATE = 'Activo'
+
+# Stock is applied per article by receive_order instead
+STOCK_TRIGGERS = ('update_stock_after_movement',)
+# entity -> table and id column of the rows indexed in bulk after the inserts
+INDEXED = {
+    'numero_serie': ('numeros_serie', 'id_numero_serie'),
+    'numero_patrimonio': ('numeros_patrimonio', 'id_numero_patrimonio'),
+}
+
+Receipt = namedtuple('Receipt', 'id_orden lines units articles series patrimony elapsed')
+Receipt.__doc__ = "Outcome of receive_order; ``patrimony`` is the (first, last) number allocated, or None."
+
+
+def _chunks(values, size=500):
+    # Stay well below SQLite's bound-parameter limit
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def allocate_patrimony_numbers(conn, count, prefix=PATRIMONY_PREFIX, digits=PATRIMONY_DIGITS):
+    """Reserve ``count`` consecutive patrimony numbers after the highest existing one.
+
+    Fixed-width numbers sort like integers, so the highest is the first match
+    of a descending scan of the UNIQUE index. Call it inside the transaction
+    that inserts the numbers, so no other writer can take the same block.
+    """
+    if count <= 0:
+        return []
+    row = conn.execute(
+        "SELECT numero_patrimonio FROM numeros_patrimonio "
+        "WHERE numero_patrimonio BETWEEN ? AND ? AND numero_patrimonio GLOB ? "
+        "ORDER BY numero_patrimonio DESC LIMIT 1",
+        (prefix + '0' * digits, prefix + '9' * digits, prefix + '[0-9]' * digits),
+    ).fetchone()
+    first = int(row[0][len(prefix):]) + 1 if row else 1
+    if first + count - 1 >= 10 ** digits:
+        raise ValueError(f"Patrimony numbers {prefix}* are exhausted")
+    return [f"{prefix}{number:0{digits}d}" for number in range(first, first + count)]
+
+
+def _pending_lines(conn, id_orden, only):
+    order = conn.execute(
+        "SELECT numero_orden, estado FROM orden_compra WHERE id_orden = ?", (id_orden,)
+    ).fetchone()
+    if order is None:
+        raise KeyError(f"Purchase order {id_orden} does not exist")
+    lines = conn.execute(
+        "SELECT id_detalle, id_articulo, cantidad, descripcion_articulo FROM detalle_orden "
+        "WHERE id_orden = ? AND NOT COALESCE(recibido, 0) ORDER BY id_detalle",
+        (id_orden,),
+    ).fetchall()
+    if only is not None:
+        wanted = set(only)
+        lines = [line for line in lines if line[0] in wanted]
+        missing = wanted - {line[0] for line in lines}
+        if missing:
+            raise ValueError(f"Lines {sorted(missing)} are not pending lines of order {id_orden}")
+    if not lines:
+        raise ValueError(f"Purchase order {order[0]} has no lines left to receive")
+    for id_detalle, id_articulo, cantidad, descripcion in lines:
+        if id_articulo is None:
+            raise ValueError(f"Line {id_detalle} ('{descripcion}') is not linked to an article")
+        if cantidad is None or cantidad <= 0:
+            raise ValueError(f"Line {id_detalle} has quantity {cantidad}")
+    return order[0], lines
+
+
+def _fixed_assets(conn, articles):
+    """``{id_articulo: es_activo_fijo}`` for ``articles``; unknown ids raise ValueError."""
+    flags = {}
+    for chunk in _chunks(articles):
+        flags.update(conn.execute(
+            f"SELECT id_articulo, COALESCE(es_activo_fijo, 0) FROM articulos "
+            f"WHERE id_articulo IN ({','.join('?' * len(chunk))})", chunk
+        ))
+    missing = [id_articulo for id_articulo in articles if id_articulo not in flags]
+    if missing:
+        raise ValueError(f"Unknown articles: {missing[:10]}")
+    return flags
+
+
+def receive_order(db_manager, id_orden, id_usuario=None, fecha=None, id_ubicacion=None,
+                  responsable_id=None, series=None, lines=None, event_bus=None):
+    """Post every pending line of purchase order ``id_orden``; returns a ``Receipt``.
+
+    ``series`` maps ``id_detalle`` to the serial numbers received on that line
+    (at most its quantity); ``lines`` limits the receipt to those line ids.
+    Raises KeyError for an unknown order and ValueError when there is nothing
+    valid to receive; a duplicate serial number raises sqlite3.IntegrityError.
+    Nothing is written unless everything is.
+    """
+    start = time.perf_counter()
+    fecha = fecha or date.today().isoformat()
+    series = series or {}
+    with db_manager.transaction() as conn:
+        numero_orden, pending = _pending_lines(conn, id_orden, lines)
+        observaciones = f"Recepción OC {numero_orden}"
+        received = {line[0] for line in pending}
+        unknown = set(series) - received
+        if unknown:
+            raise ValueError(f"Serial numbers given for lines not being received: {sorted(unknown)}")
+
+        quantities = {}
+        for _, id_articulo, cantidad, _ in pending:
+            quantities[id_articulo] = quantities.get(id_articulo, 0) + cantidad
+        fixed = _fixed_assets(conn, list(quantities))
+
+        serial_rows = []
+        for id_detalle, id_articulo, cantidad, _ in pending:
+            numbers = series.get(id_detalle, ())
+            if len(numbers) > cantidad:
+                raise ValueError(f"Line {id_detalle} received {cantidad} units but {len(numbers)} serial numbers")
+            serial_rows.extend((id_articulo, str(numero), observaciones) for numero in numbers)
+
+        units = [id_articulo for _, id_articulo, cantidad, _ in pending if fixed[id_articulo]
+                 for _ in range(cantidad)]
+        numbers = allocate_patrimony_numbers(conn, len(units))
+        ubicacion = None
+        if id_ubicacion is not None:
+            row = conn.execute("SELECT nombre_ubicacion FROM ubicacion WHERE id_ubicacion = ?",
+                               (id_ubicacion,)).fetchone()
+            ubicacion = row[0] if row else None
+
+        with suspended_triggers(conn, STOCK_TRIGGERS):
+            conn.executemany('''
+            INSERT INTO movimientos (id_articulo, cantidad, tipo_movimiento, fecha_movimiento,
+                                     id_usuario, id_ubicacion, observaciones)
+            VALUES (?, ?, 'entrada', ?, ?, ?, ?)
+            ''', [(id_articulo, cantidad, fecha, id_usuario, id_ubicacion, observaciones)
+                  for _, id_articulo, cantidad, _ in pending])
+        # What update_stock_after_movement did per line, once per article
+        conn.executemany('''
+        INSERT INTO stock (id_articulo, cantidad, fecha_ultimo_movimiento) VALUES (?, ?, ?)
+        ON CONFLICT (id_articulo) DO UPDATE SET
+            cantidad = cantidad + excluded.cantidad,
+            fecha_ultimo_movimiento = excluded.fecha_ultimo_movimiento
+        ''', [(id_articulo, cantidad, fecha) for id_articulo, cantidad in quantities.items()])
+
+        first_ids = {
+            entity: conn.execute(f"SELECT COALESCE(MAX({id_column}), 0) + 1 FROM {table}").fetchone()[0]
+            for entity, (table, id_column) in INDEXED.items()
+        }
+        with suspended_triggers(conn, [search.insert_trigger(entity) for entity in INDEXED]):
+            if serial_rows:
+                conn.executemany(
+                    "INSERT INTO numeros_serie (id_articulo, numero_serie, observaciones) VALUES (?, ?, ?)",
+                    serial_rows
+                )
+            if numbers:
+                conn.executemany('''
+                INSERT INTO numeros_patrimonio (id_articulo, numero_patrimonio, ubicacion, responsable_id,
+                                                estado, observaciones)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ''', [(id_articulo, numero, ubicacion, responsable_id, PATRIMONY_STATE, observaciones)
+                      for id_articulo, numero in zip(units, numbers)])
+        if search.is_installed(conn):
+            for entity, first_id in first_ids.items():
+                search.index_from(conn, entity, first_id)
+
+        conn.executemany(
+            "UPDATE detalle_orden SET recibido = 1, fecha_recepcion = ? WHERE id_detalle = ?",
+            [(fecha, id_detalle) for id_detalle in sorted(received)]
+        )
+        still_pending = conn.execute(
+            "SELECT COUNT(*) FROM detalle_orden WHERE id_orden = ? AND NOT COALESCE(recibido, 0)", (id_orden,)
+        ).fetchone()[0]
+        if not still_pending:
+            conn.execute("UPDATE orden_compra SET estado = ?, fecha_recepcion = ? WHERE id_orden = ?",
+                         (RECEIVED, fecha, id_orden))
+
+        audit = ('Recepción de Orden de Compra', 'orden_compra', id_orden, id_usuario,
+                 f"Líneas: {len(pending)}, Unidades: {sum(quantities.values())}, "
+                 f"Patrimonio: {numbers[0] + '..' + numbers[-1] if numbers else '-'}")
+        if event_bus is None:
+            conn.execute('''
+            INSERT INTO auditoria (accion, tabla_afectada, id_registro, id_usuario, datos_nuevos, fecha_hora)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', audit)
+
+    if event_bus is not None:
+        for id_articulo in quantities:
+            event_bus.publish_stock_change(id_articulo)
+        event_bus.publish_audit(*audit[:4], datos_nuevos=audit[4])
+    receipt = Receipt(
+        id_orden, len(pending), sum(quantities.values()), len(quantities), len(serial_rows),
+        (numbers[0], numbers[-1]) if numbers else None, time.perf_counter() - start,
+    )
+    logger.info(f"Received order {numero_orden}: {receipt.lines} lines, {receipt.units} units of "
+                f"{receipt.articles} articles, {len(numbers)} patrimony numbers in {receipt.elapsed:.2f} s")
+    return receipt
+
+
+def read_series(path):
+    """``{id_detalle: [numero_serie, ...]}`` from a CSV with ``id_detalle,numero_serie`` columns."""
+    series = {}
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            series.setdefault(int(row['id_detalle']), []).append(row['numero_serie'].strip())
+    return series
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Receive a purchase order: stock, serials and patrimony at once")
+    parser.add_argument('--db', default='gestion_patrimonial.db')
+    parser.add_argument('id_orden', type=int)
+    parser.add_argument('--fecha', help="reception date (YYYY-MM-DD), today by default")
+    parser.add_argument('--ubicacion', type=int, help="id_ubicacion the goods are received into")
+    parser.add_argument('--usuario', type=int, help="id_usuario receiving")
+    parser.add_argument('--responsable', type=int, help="id_agente responsible for the new patrimony")
+    parser.add_argument('--series', help="CSV with id_detalle,numero_serie columns")
+    parser.add_argument('--linea', type=int, action='append', help="receive only this id_detalle (repeatable)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db_manager = DatabaseManager(args.db)
+    try:
+        receipt = receive_order(
+            db_manager, args.id_orden, args.usuario, args.fecha, args.ubicacion, args.responsable,
+            read_series(args.series) if args.series else None, args.linea,
+        )
+        print(f"{receipt.lines} lines, {receipt.units} units, {receipt.series} serial numbers, "
+              f"patrimony {'..'.join(receipt.patrimony) if receipt.patrimony else '-'}")
+    finally:
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import CancelledError, Future, InvalidStateError, ThreadPoolExecutor
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncQueryExecutor:
+    """Run read queries off the Tk thread and deliver results back on it.
+
+    Each worker thread owns a dedicated read-only SQLite connection. ``submit``
+    returns a ``concurrent.futures.Future``; callbacks are queued and executed
+    from the Tk mainloop by a ``root.after`` poller, so they may touch widgets.
+
+    Identical in-flight queries (same SQL and parameters) share one execution,
+    and queries submitted with a ``tag`` replace any earlier query with the same
+    tag: the stale one is cancelled if it has not started, or interrupted if it
+    is running and nobody else is waiting for it.
+    """
+
+    def __init__(self, db_path, root=None, max_workers=2, poll_interval=25):
+        self.db_path = db_path
+        self.root = root
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._tagged = {}
+        self._results = queue.SimpleQueue()
+        self._hooks = []
+        self._closed = False
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db-query')
+        if root is not None:
+            self._poll_id = root.after(poll_interval, self._poll)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                f"file:{quote(os.path.abspath(self.db_path))}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+                cached_statements=512,
+            )
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def add_query_hook(self, hook):
+        """Call ``hook(query, params, elapsed, error)`` on the worker thread after each query."""
+        self._hooks.append(hook)
+
+    def remove_query_hook(self, hook):
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+
+    def _run(self, job):
+        conn = self._connection()
+        # job['conn'] is only set while this job's statement runs; _abort reads it
+        # under the same lock, so it never interrupts the worker's next query
+        with job['lock']:
+            job['conn'] = conn
+        start = time.perf_counter()
+        error = None
+        try:
+            return conn.execute(job['query'], job['params']).fetchall()
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            with job['lock']:
+                job['conn'] = None
+            for hook in self._hooks:
+                try:
+                    hook(job['query'], job['params'], time.perf_counter() - start, error)
+                except Exception as e:
+                    logger.error(f"Query hook failed: {str(e)}")
+
+    def submit(self, query, params=None, callback=None, error_callback=None, tag=None):
+        """Schedule a SELECT and return a Future with its rows.
+
+        ``callback(rows)`` / ``error_callback(exception)`` run on the Tk thread.
+        """
+        if self._closed:
+            raise RuntimeError("AsyncQueryExecutor is closed")
+        params = tuple(params or ())
+        key = (query, params)
+
+        # Future.cancel() and add_done_callback() may run callbacks synchronously,
+        # and _forget takes the lock: only touch futures once it is released.
+        stale = None
+        with self._lock:
+            if tag is not None:
+                stale = self._cancel_tagged(tag, key)
+
+            job = self._inflight.get(key)
+            created = job is None
+            if created:
+                job = {'query': query, 'params': params, 'conn': None, 'lock': threading.Lock(), 'waiters': 0}
+                job['future'] = self._pool.submit(self._run, job)
+                self._inflight[key] = job
+            job['waiters'] += 1
+            outer = Future()
+            if tag is not None:
+                self._tagged[tag] = (key, job, outer)
+
+        if stale is not None:
+            self._abort(*stale)
+        if created:
+            job['future'].add_done_callback(lambda _, key=key, job=job: self._forget(key, job))
+        job['future'].add_done_callback(
+            lambda inner: self._deliver(inner, outer, callback, error_callback)
+        )
+        return outer
+
+    def _cancel_tagged(self, tag, new_key):
+        """Detach the query previously submitted under ``tag``; called with the lock held.
+
+        Returns ``(outer, job, abandoned)`` for ``_abort`` to act on once the lock
+        is released, or None when there is nothing to cancel.
+        """
+        previous = self._tagged.pop(tag, None)
+        if previous is None:
+            return None
+        key, job, outer = previous
+        if key == new_key:
+            return None
+        job['waiters'] -= 1
+        abandoned = job['waiters'] == 0 and not job['future'].done()
+        if abandoned and self._inflight.get(key) is job:
+            # Nobody may join a query that is about to be cancelled
+            del self._inflight[key]
+        return outer, job, abandoned
+
+    def _abort(self, outer, job, abandoned):
+        # The superseded caller must never see its callback fire
+        outer.cancel()
+        if abandoned and not job['future'].cancel():
+            # Already running on a worker: abort the statement on its connection
+            with job['lock']:
+                if job['conn'] is not None:
+                    job['conn'].interrupt()
+
+    def _forget(self, key, job):
+        with self._lock:
+            if self._inflight.get(key) is job:
+                del self._inflight[key]
+
+    def _deliver(self, inner, outer, callback, error_callback):
+        if inner.cancelled():
+            outer.cancel()
+            return
+        error = inner.exception()
+        try:
+            if error is None:
+                outer.set_result(inner.result())
+            elif isinstance(error, sqlite3.OperationalError) and 'interrupted' in str(error):
+                outer.cancel()
+                return
+            else:
+                outer.set_exception(error)
+        except InvalidStateError:
+            # Cancelled by a newer query with the same tag
+            return
+        if callback or error_callback:
+            self._results.put((outer, callback, error_callback))
+            if self.root is None:
+                self._drain()
+
+    def _drain(self):
+        while True:
+            try:
+                future, callback, error_callback = self._results.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                if future.cancelled():
+                    continue
+                error = future.exception()
+                if error is None:
+                    if callback:
+                        callback(future.result())
+                elif error_callback:
+                    error_callback(error)
+                else:
+                    logger.error(f"Background query failed: {str(error)}")
+            except CancelledError:
+                continue
+            except Exception as e:
+                logger.error(f"Error in query callback: {str(e)}", exc_info=True)
+
+    def _poll(self):
+        self._drain()
+        if not self._closed:
+            self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def close(self):
+        """Stop the workers, cancel pending queries and close their connections."""
+        self._closed = True
+        if self.root is not None:
+            try:
+                self.root.after_cancel(self._poll_id)
+            except Exception:
+                pass
+        with self._lock:
+            for conn in self._connections:
+                conn.interrupt()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
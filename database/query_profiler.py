@@ -0,0 +1,217 @@
+"""Per-statement latency profiling for DatabaseManager and AsyncQueryExecutor.
+
+A ``QueryProfiler`` is registered as a query hook. Statements are grouped by
+normalized SQL (literals replaced by ``?``, whitespace collapsed), and each group
+keeps a log-scale latency histogram. The first time a statement runs slower than
+``explain_threshold`` its ``EXPLAIN QUERY PLAN`` is captured on a separate
+read-only connection, and full table scans in the plan are flagged. The EXPLAIN
+runs on a background thread, so the hook never adds to the slow query's caller.
+
+Usage:
+
+    profiler = QueryProfiler(db_path)
+    profiler.attach(db_manager)
+    ...
+    profiler.export_json('perfil_consultas.json')
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets, in milliseconds (the last bucket is open)
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+# Plan steps that read every row of a table (or of a whole index)
+_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(?!\(subquery)(\w+)")
+
+
+@lru_cache(maxsize=4096)
+def normalize_sql(query):
+    """Group key for a statement: literals become ``?`` and IN lists collapse to ``(?...)``."""
+    text = _COMMENT.sub(' ', query)
+    text = _STRING.sub('?', text)
+    text = _NUMBER.sub('?', text)
+    text = _IN_LIST.sub('(?...)', text)
+    return _SPACE.sub(' ', text).strip()
+
+
+def full_scans(plan):
+    """Return the plan lines that scan a whole table or index."""
+    return [detail for detail in plan if _SCAN.match(detail)]
+
+
+class StatementStats:
+    """Counters and latency histogram for one normalized statement."""
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.sample_query = None
+        self.sample_params = None
+        self.plan = None
+        self.scans = []
+        self.last_error = None
+
+    def add(self, elapsed_ms, error):
+        self.count += 1
+        self.total += elapsed_ms
+        self.max = max(self.max, elapsed_ms)
+        self.min = elapsed_ms if self.min is None else min(self.min, elapsed_ms)
+        self.buckets[bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+        if error is not None:
+            self.errors += 1
+            self.last_error = str(error)
+
+    def percentile(self, fraction):
+        """Upper bucket bound containing the given fraction of calls (max for the open bucket)."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= target:
+                return BUCKETS_MS[index] if index < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {
+            'sql': self.sql,
+            'count': self.count,
+            'errors': self.errors,
+            'total_ms': round(self.total, 3),
+            'mean_ms': round(self.total / self.count, 3) if self.count else 0.0,
+            'min_ms': round(self.min or 0.0, 3),
+            'max_ms': round(self.max, 3),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'histogram': dict(zip([f"<={bound}" for bound in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"], self.buckets)),
+            'sample_query': self.sample_query,
+            'sample_params': repr(self.sample_params) if self.sample_params else None,
+            'plan': self.plan,
+            'full_scans': self.scans,
+            'last_error': self.last_error,
+        }
+
+
+class QueryProfiler:
+    """Query hook that aggregates timings per normalized statement."""
+
+    def __init__(self, db_path, explain_threshold=0.05, max_statements=2000):
+        self.db_path = db_path
+        self.explain_threshold = explain_threshold
+        self.max_statements = max_statements
+        self.started = time.time()
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._explain_pool = None
+        self._explain_conn = None  # only used from the explain thread
+        self._targets = []
+
+    def attach(self, *targets):
+        """Register as query hook on DatabaseManager / AsyncQueryExecutor instances."""
+        for target in targets:
+            target.add_query_hook(self)
+            self._targets.append(target)
+
+    def detach(self):
+        for target in self._targets:
+            target.remove_query_hook(self)
+        self._targets = []
+        with self._lock:
+            pool, self._explain_pool = self._explain_pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        if self._explain_conn is not None:
+            self._explain_conn.close()
+            self._explain_conn = None
+
+    def __call__(self, query, params, elapsed, error):
+        sql = normalize_sql(query)
+        with self._lock:
+            stats = self._stats.get(sql)
+            if stats is None:
+                if len(self._stats) >= self.max_statements:
+                    return
+                stats = self._stats[sql] = StatementStats(sql)
+                stats.sample_query = query
+            stats.add(elapsed * 1000, error)
+            needs_plan = stats.plan is None and error is None and elapsed >= self.explain_threshold
+            if needs_plan:
+                # The caller may reuse its params list once the hook returns
+                params = tuple(params) if isinstance(params, list) else params
+                stats.plan = []  # claimed; later slow calls don't explain again
+                stats.sample_query = query
+                stats.sample_params = params
+                if self._explain_pool is None:
+                    self._explain_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='query-explain')
+                self._explain_pool.submit(self._explain, stats, query, params)
+
+    def _explain(self, stats, query, params):
+        keyword = query.lstrip().split(None, 1)[0].upper() if query.strip() else ''
+        if keyword in ('PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK', 'EXPLAIN', 'VACUUM', 'ATTACH', 'DETACH'):
+            return
+        try:
+            if self._explain_conn is None:
+                self._explain_conn = sqlite3.connect(
+                    f"file:{quote(os.path.abspath(self.db_path))}?mode=ro", uri=True, check_same_thread=False
+                )
+            rows = self._explain_conn.execute(f"EXPLAIN QUERY PLAN {query}", params or ()).fetchall()
+            plan = [row[3] for row in rows]
+        except sqlite3.Error as e:
+            plan = [f"EXPLAIN failed: {str(e)}"]
+        scans = full_scans(plan)
+        with self._lock:
+            stats.plan = plan
+            stats.scans = scans
+        if scans:
+            logger.warning(f"Slow query ({stats.max:.1f} ms) scans {'; '.join(scans)}: {stats.sql}")
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+        self.started = time.time()
+
+    def report(self, order_by='total_ms', limit=None):
+        """Return per-statement dicts, most expensive first."""
+        with self._lock:
+            rows = [stats.as_dict() for stats in self._stats.values()]
+        rows.sort(key=lambda row: row[order_by], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def export_json(self, path):
+        """Write the full report to ``path``; returns the number of statements exported."""
+        rows = self.report()
+        data = {
+            'database': self.db_path,
+            'since': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'exported': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'explain_threshold_ms': self.explain_threshold * 1000,
+            'statements': rows,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        logger.info(f"Exported {len(rows)} statement profiles to {path}")
+        return len(rows)
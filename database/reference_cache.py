@@ -0,0 +1,178 @@
+"""Process-wide cache of the small reference tables.
+
+Families, subfamilies, brands, suppliers, article states and departments are
+read by every tab to fill comboboxes and to turn ids into names. The cache
+keeps each table as an id -> name and a name -> id dictionary (plus a parent ->
+children index for subfamilies), so rendering a page of rows is a dictionary
+lookup per cell instead of a join or a query per row.
+
+Tables are reloaded lazily, and only after something may have changed them:
+
+* writes made through ``DatabaseManager.execute_query`` are seen by a query
+  hook (``attach``) that marks just the tables the statement names as stale;
+* any other commit (another process, ``transaction()`` blocks, the event bus)
+  moves ``PRAGMA data_version`` on the cache's own probe connection, checked
+  at most once per ``check_interval`` seconds, which marks every table stale.
+
+Usage:
+
+    cache = ReferenceCache(db_path)
+    cache.attach(db_manager)
+    combo['values'] = cache.choices('marca')
+    id_marca = cache.id_for('marca', combo.get())
+    subfamilias = cache.children('subfamilia', id_familia)
+"""
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+# kind -> (table, id column, name column, parent id column)
+TABLES = {
+    'familia': ('familia', 'id_familia', 'nombre_familia', None),
+    'subfamilia': ('subfamilia', 'id_subfamilia', 'nombre_subfamilia', 'id_familia'),
+    'marca': ('marcas', 'id_marca', 'nombre_marca', None),
+    'proveedor': ('proveedores', 'id_proveedor', 'nombre_proveedor', None),
+    'estado': ('estados_articulo', 'id_estado', 'nombre_estado', None),
+    'departamento': ('departamentos', 'id_departamento', 'nombre_departamento', None),
+}
+
+_TABLE_KINDS = {table: kind for kind, (table, _, _, _) in TABLES.items()}
+_WRITE = re.compile(r'^\s*(INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+_WRITTEN_TABLE = re.compile(
+    r'\b(?:INTO|UPDATE|FROM)\s+(' + '|'.join(_TABLE_KINDS) + r')\b', re.IGNORECASE
+)
+
+
+class _Table:
+    """One loaded reference table."""
+
+    def __init__(self, rows, has_parent):
+        self.names = {}
+        self.ids = {}
+        self.children = {}
+        self.parents = {}
+        for row in rows:
+            row_id, name = row[0], row[1]
+            self.names[row_id] = name
+            if name is not None:
+                # First id wins for duplicated names, like an ORDER BY id lookup would
+                self.ids.setdefault(str(name).strip().lower(), row_id)
+            if has_parent:
+                self.parents[row_id] = row[2]
+                self.children.setdefault(row[2], []).append((row_id, name))
+        self.choices = sorted((name for name in self.names.values() if name is not None), key=str.lower)
+
+
+class ReferenceCache:
+    """id <-> name dictionaries for the reference tables, reloaded only when stale."""
+
+    def __init__(self, db_path, check_interval=0.5):
+        self.db_path = db_path
+        self.check_interval = check_interval
+        # data_version only moves for commits made by *other* connections, so the
+        # probe must be a connection that never writes
+        self._conn = sqlite3.connect(f"file:{quote(os.path.abspath(db_path))}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._tables = {}
+        self._data_version = None
+        self._checked = 0.0
+        self._attached = []
+        self.loads = 0
+
+    def close(self):
+        self.detach()
+        with self._lock:
+            self._conn.close()
+
+    def attach(self, *db_managers):
+        """Invalidate tables as soon as a write to them goes through ``execute_query``."""
+        for db_manager in db_managers:
+            db_manager.add_query_hook(self._on_query)
+            self._attached.append(db_manager)
+
+    def detach(self):
+        for db_manager in self._attached:
+            db_manager.remove_query_hook(self._on_query)
+        self._attached = []
+
+    def _on_query(self, query, params, elapsed, error):
+        if error is None and _WRITE.match(query):
+            for table in _WRITTEN_TABLE.findall(query):
+                self.invalidate(_TABLE_KINDS[table.lower()])
+
+    def invalidate(self, kind=None):
+        """Drop one table (or all of them when ``kind`` is None); it is reloaded on next use."""
+        with self._lock:
+            if kind is None:
+                self._tables.clear()
+            else:
+                self._tables.pop(kind, None)
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            if self._data_version is not None:
+                logger.debug("Reference cache: data_version changed, marking all tables stale")
+            self._data_version = version
+            self._tables.clear()
+
+    def _table(self, kind):
+        if kind not in TABLES:
+            raise KeyError(f"Unknown reference table: {kind}")
+        with self._lock:
+            self._check_version()
+            table = self._tables.get(kind)
+            if table is None:
+                name, id_column, name_column, parent_column = TABLES[kind]
+                columns = f"{id_column}, {name_column}" + (f", {parent_column}" if parent_column else '')
+                rows = self._conn.execute(f"SELECT {columns} FROM {name} ORDER BY {id_column}").fetchall()
+                table = self._tables[kind] = _Table(rows, parent_column is not None)
+                self.loads += 1
+            return table
+
+    def names(self, kind):
+        """The id -> name dictionary of ``kind`` (shared; do not modify it)."""
+        return self._table(kind).names
+
+    def name(self, kind, row_id, default=''):
+        return self._table(kind).names.get(row_id, default)
+
+    def id_for(self, kind, name):
+        """Id for a name (case and surrounding spaces ignored), or None."""
+        if name is None:
+            return None
+        return self._table(kind).ids.get(str(name).strip().lower())
+
+    def choices(self, kind):
+        """Names sorted for a combobox (shared; do not modify it)."""
+        return self._table(kind).choices
+
+    def children(self, kind, parent_id):
+        """``(id, name)`` rows of ``kind`` whose parent is ``parent_id``, e.g. a family's subfamilies."""
+        return list(self._table(kind).children.get(parent_id, ()))
+
+    def parents(self, kind):
+        """The id -> parent id dictionary of ``kind``, e.g. subfamily -> family (shared; do not modify it)."""
+        return self._table(kind).parents
+
+    def add_names(self, rows, columns):
+        """Fill name columns of dict rows in place from their id columns.
+
+        ``columns`` maps an id column to ``(kind, name column)``. Each table is
+        fetched once for the whole batch, not once per row.
+        """
+        lookups = [(id_column, name_column, self.names(kind)) for id_column, (kind, name_column) in columns.items()]
+        for row in rows:
+            for id_column, name_column, names in lookups:
+                row[name_column] = names.get(row.get(id_column))
+        return rows
@@ -0,0 +1,369 @@
+"""Headless execution of the report definitions stored in ``reportes``.
+
+Each report's ``consulta_sql`` runs on a read-only connection with its
+``parametros`` bound by name (``:param``). Rows are streamed with ``fetchmany``
+straight into a CSV, JSON-lines or XLSX writer, so memory use does not depend
+on the size of the result.
+
+``parametros`` is JSON: either an object of defaults (``{"desde": "2024-01-01"}``)
+or a list of names or of ``{"nombre", "tipo", "defecto"}`` objects.
+
+Usage (from the repository root):
+
+    python -m database.report_runner list --db gestion_empresa.db
+    python -m database.report_runner run 3 --param desde=2024-01-01 --format csv -o stock.csv
+    python -m database.report_runner run 3 --every 60      # re-run every hour
+
+A one-shot ``run`` always executes the query; finished exports are only reused
+by a long-lived runner (``--every``), as long as the data has not changed.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+FETCH_SIZE = 1000
+
+EXTENSIONS = {'csv': 'csv', 'jsonl': 'jsonl', 'json': 'jsonl', 'xlsx': 'xlsx'}
+
+
+def output_path(output_dir, nombre_reporte, fmt):
+    """Timestamped export path; the report name is reduced to characters safe in a file name."""
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    name = re.sub(r'[^\w.-]+', '_', nombre_reporte).strip('._') or 'reporte'
+    return os.path.join(output_dir, f"{name}_{stamp}.{fmt}")
+
+
+def stream_rows(cursor, size=FETCH_SIZE):
+    """Yield rows from a cursor ``size`` at a time without materializing the result."""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+def write_csv(path, columns, rows):
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_jsonl(path, columns, rows):
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str))
+            f.write('\n')
+            count += 1
+    return count
+
+
+def write_xlsx(path, columns, rows):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise RuntimeError("openpyxl is required to export .xlsx reports")
+    # write_only workbooks stream rows to disk instead of keeping cells in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(columns)
+    count = 0
+    for row in rows:
+        sheet.append(list(row))
+        count += 1
+    workbook.save(path)
+    return count
+
+
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl, 'xlsx': write_xlsx}
+
+
+def normalize_format(formato):
+    fmt = (formato or 'csv').strip().lower().lstrip('.')
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unsupported report format: {formato}")
+    return EXTENSIONS[fmt]
+
+
+def parse_parameters(definition):
+    """Return ``{name: (type, default)}`` from a ``parametros`` JSON definition."""
+    if not definition:
+        return {}
+    spec = json.loads(definition)
+    if isinstance(spec, dict):
+        return {name: (None, default) for name, default in spec.items()}
+    parameters = {}
+    for item in spec:
+        if isinstance(item, str):
+            parameters[item] = (None, None)
+        else:
+            name = item.get('nombre') or item.get('name')
+            parameters[name] = (item.get('tipo') or item.get('type'), item.get('defecto', item.get('default')))
+    return parameters
+
+
+def _coerce(value, kind):
+    if value is None or kind is None:
+        return value
+    kind = kind.lower()
+    if kind in ('int', 'integer', 'entero'):
+        return int(value)
+    if kind in ('float', 'real', 'decimal', 'numero'):
+        return float(value)
+    if kind in ('bool', 'boolean', 'booleano'):
+        return 1 if str(value).lower() in ('1', 'true', 'si', 'sí', 'yes') else 0
+    return str(value)
+
+
+def bind_parameters(definition, values):
+    """Merge caller values with defaults, check nothing is missing and coerce types."""
+    values = dict(values or {})
+    bound = {}
+    for name, (kind, default) in parse_parameters(definition).items():
+        if name in values:
+            value = values.pop(name)
+        elif default is not None:
+            value = default
+        else:
+            raise ValueError(f"Missing report parameter: {name}")
+        bound[name] = _coerce(value, kind)
+    if values:
+        raise ValueError(f"Unknown report parameters: {', '.join(sorted(values))}")
+    return bound
+
+
+class ReportRunner:
+    """Run stored reports against one database, caching finished exports in memory.
+
+    The runner keeps one long-lived read-only connection. ``PRAGMA data_version``
+    on that connection changes whenever any other connection commits, so a cached
+    export stays valid exactly as long as the value it was produced under. The
+    value means nothing to another process, so the cache lives and dies with the
+    runner. ``data_version`` never goes back, so entries produced under an older
+    value are deleted, files included, whenever a new export is cached.
+    """
+
+    def __init__(self, db_path, cache_dir='reports/.cache'):
+        self.db_path = db_path
+        self.cache_dir = cache_dir
+        self.conn = self._connect()
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def _connect(self):
+        conn = sqlite3.connect(f"file:{quote(os.path.abspath(self.db_path))}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only=1")
+        return conn
+
+    def close(self):
+        with self._lock:
+            self._prune(None)
+        self.conn.close()
+
+    def _prune(self, version):
+        """Forget the cached exports not produced under ``version`` and delete their files."""
+        for key, (entry_version, cache_path, _) in list(self._cache.items()):
+            if entry_version != version:
+                del self._cache[key]
+                try:
+                    os.remove(cache_path)
+                except OSError:
+                    pass
+
+    def data_version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def list_reports(self):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT id_reporte, nombre_reporte, formato_salida, parametros, descripcion "
+                "FROM reportes WHERE activo = 1 ORDER BY id_reporte"
+            ).fetchall()
+
+    def get_report(self, id_reporte):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT id_reporte, nombre_reporte, consulta_sql, parametros, formato_salida "
+                "FROM reportes WHERE id_reporte = ? AND activo = 1",
+                (id_reporte,),
+            ).fetchone()
+        if row is None:
+            raise ValueError(f"Report {id_reporte} does not exist or is inactive")
+        keys = ('id_reporte', 'nombre_reporte', 'consulta_sql', 'parametros', 'formato_salida')
+        return dict(zip(keys, row))
+
+    def iter_rows(self, id_reporte, params=None):
+        """Return ``(columns, row generator)`` for a report.
+
+        The rows are read lazily, so they come from a connection of their own
+        rather than the shared one; it is closed when the generator is exhausted
+        or closed.
+        """
+        report = self.get_report(id_reporte)
+        bound = bind_parameters(report['parametros'], params)
+        conn = self._connect()
+        try:
+            cursor = conn.execute(report['consulta_sql'], bound)
+        except Exception:
+            conn.close()
+            raise
+        columns = [description[0] for description in cursor.description or ()]
+        return columns, self._stream_and_close(conn, cursor)
+
+    @staticmethod
+    def _stream_and_close(conn, cursor):
+        try:
+            yield from stream_rows(cursor)
+        finally:
+            conn.close()
+
+    def _cache_key(self, report, bound, fmt):
+        source = json.dumps(
+            [report['id_reporte'], report['consulta_sql'], bound, fmt], sort_keys=True, default=str
+        )
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+    def run(self, id_reporte, params=None, output=None, formato=None, use_cache=True):
+        """Execute a report into ``output`` and return ``(path, row count, from_cache)``."""
+        report = self.get_report(id_reporte)
+        fmt = normalize_format(formato or report['formato_salida'])
+        bound = bind_parameters(report['parametros'], params)
+        if output is None:
+            output = output_path('reports', report['nombre_reporte'], fmt)
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+        key = self._cache_key(report, bound, fmt)
+        with self._lock:
+            version = self.data_version()
+            cached = self._cache.get(key)
+            if use_cache and cached and cached[0] == version and os.path.exists(cached[1]):
+                if os.path.abspath(cached[1]) != os.path.abspath(output):
+                    shutil.copyfile(cached[1], output)
+                logger.info(f"Report {id_reporte} served from cache ({cached[2]} rows)")
+                return output, cached[2], True
+
+            start = time.perf_counter()
+            cursor = self.conn.cursor()
+            cursor.execute(report['consulta_sql'], bound)
+            columns = [description[0] for description in cursor.description or ()]
+            count = WRITERS[fmt](output, columns, stream_rows(cursor))
+            logger.info(
+                f"Report {id_reporte} ({report['nombre_reporte']}): {count} rows to {output} "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+
+            if use_cache:
+                self._prune(version)
+                os.makedirs(self.cache_dir, exist_ok=True)
+                cache_path = os.path.join(self.cache_dir, f"{key}.{fmt}")
+                shutil.copyfile(output, cache_path)
+                self._cache[key] = (version, cache_path, count)
+        return output, count, False
+
+
+class ReportScheduler:
+    """Run reports periodically on a background thread."""
+
+    def __init__(self, runner):
+        self.runner = runner
+        self.jobs = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, id_reporte, interval_seconds, params=None, output_dir='reports', formato=None):
+        self.jobs.append({
+            'id_reporte': id_reporte,
+            'interval': interval_seconds,
+            'params': params,
+            'output_dir': output_dir,
+            'formato': formato,
+            'next_run': time.monotonic(),
+        })
+
+    def run_pending(self):
+        now = time.monotonic()
+        for job in self.jobs:
+            if job['next_run'] > now:
+                continue
+            job['next_run'] = now + job['interval']
+            try:
+                report = self.runner.get_report(job['id_reporte'])
+                fmt = normalize_format(job['formato'] or report['formato_salida'])
+                output = output_path(job['output_dir'], report['nombre_reporte'], fmt)
+                self.runner.run(job['id_reporte'], job['params'], output, fmt)
+            except Exception as e:
+                logger.error(f"Scheduled report {job['id_reporte']} failed: {str(e)}")
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            self.run_pending()
+            next_run = min((job['next_run'] for job in self.jobs), default=time.monotonic() + 60)
+            self._stop.wait(max(0.0, next_run - time.monotonic()))
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run_forever, name='report-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the reports stored in the reportes table")
+    parser.add_argument('--db', default='gestion_patrimonial.db')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help="List active reports")
+    run_parser = subparsers.add_parser('run', help="Run a report")
+    run_parser.add_argument('id_reporte', type=int)
+    run_parser.add_argument('--param', action='append', default=[], metavar='NAME=VALUE')
+    run_parser.add_argument('--format', choices=sorted(EXTENSIONS), help="Override formato_salida")
+    run_parser.add_argument('-o', '--output', help="Output file (default: reports/<name>_<timestamp>.<ext>)")
+    run_parser.add_argument('--every', type=float, metavar='MINUTES', help="Keep running on this interval")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    runner = ReportRunner(args.db)
+    try:
+        if args.command == 'list':
+            for id_reporte, nombre, formato, parametros, descripcion in runner.list_reports():
+                print(f"{id_reporte:>4}  {nombre:<30} {formato:<6} {parametros or ''}  {descripcion or ''}")
+            return
+
+        params = dict(item.split('=', 1) for item in args.param)
+        if args.every:
+            scheduler = ReportScheduler(runner)
+            scheduler.add(args.id_reporte, args.every * 60, params, formato=args.format)
+            try:
+                scheduler.run_forever()
+            except KeyboardInterrupt:
+                pass
+            return
+
+        # A fresh runner has nothing cached, and its data_version would not outlive it
+        path, count, _ = runner.run(args.id_reporte, params, args.output, args.format, use_cache=False)
+        print(f"{count} rows written to {path}")
+    finally:
+        runner.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""FTS5 search index over articles, agents, suppliers, serial and patrimony numbers.
+
+Two FTS5 tables are kept in sync by triggers on the source tables:
+
+* ``busqueda_global`` (unicode61, diacritics removed, prefix indexes) for names
+  and free text, queried with prefix terms and ranked with bm25.
+* ``busqueda_codigos`` (trigram) for serial and patrimony numbers, so a fragment
+  from the middle of a code matches too.
+
+The FTS rowid encodes the source row as ``id * 8 + entity code`` so triggers
+replace index entries by rowid instead of scanning for them.
+
+Usage (from the repository root):
+
+    python -m database.search rebuild --db gestion_empresa.db
+    python -m database.search query "notebook hp" --db gestion_empresa.db
+"""
+import argparse
+import logging
+import re
+
+from database.database_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# FTS rowid = id * ENTITY_SLOTS + entity code, so codes must stay below it
+ENTITY_SLOTS = 8
+
+# entity -> (code, table, id column, article id expression, title expression, detail columns, code column)
+ENTITIES = {
+    'articulo': (1, 'articulos', 'id_articulo', 'id_articulo', 'nombre_articulo',
+                 ['modelo', 'descripcion'], None),
+    'agente': (2, 'agentes', 'id_agente', 'NULL', 'nombre_agente',
+               ['cargo', 'email', 'cuit', 'contacto'], None),
+    'proveedor': (3, 'proveedores', 'id_proveedor', 'NULL', 'nombre_proveedor',
+                  ['contacto', 'email'], None),
+    'numero_serie': (4, 'numeros_serie', 'id_numero_serie', 'id_articulo', 'numero_serie',
+                     ['observaciones'], 'numero_serie'),
+    'numero_patrimonio': (5, 'numeros_patrimonio', 'id_numero_patrimonio', 'id_articulo', 'numero_patrimonio',
+                          ['ubicacion', 'observaciones'], 'numero_patrimonio'),
+}
+
+FTS_TABLES = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS busqueda_global USING fts5(
+        entidad UNINDEXED,
+        id_registro UNINDEXED,
+        id_articulo UNINDEXED,
+        titulo,
+        detalle,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    ''',
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS busqueda_codigos USING fts5(
+        entidad UNINDEXED,
+        id_registro UNINDEXED,
+        id_articulo UNINDEXED,
+        codigo,
+        tokenize = 'trigram'
+    )
+    ''',
+]
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _available_entities(conn):
+    """Yield the entities whose source table exists with the expected columns."""
+    for entity, (code, table, id_column, article, title, details, code_column) in ENTITIES.items():
+        columns = _columns(conn, table)
+        needed = {id_column, title} | ({article} if article != 'NULL' else set())
+        if not needed <= columns:
+            continue
+        present_details = [col for col in details if col in columns]
+        yield entity, code, table, id_column, article, title, present_details, code_column
+
+
+def _detail_expression(prefix, details):
+    if not details:
+        return "''"
+    return " || ' ' || ".join(f"COALESCE({prefix}{col}, '')" for col in details)
+
+
+def _index_statements(entity, code, id_column, article, title, details, code_column, prefix):
+    article_expr = article if article == 'NULL' else f"{prefix}{article}"
+    rowid = f"{prefix}{id_column} * {ENTITY_SLOTS} + {code}"
+    statements = [
+        f"INSERT INTO busqueda_global (rowid, entidad, id_registro, id_articulo, titulo, detalle) "
+        f"VALUES ({rowid}, '{entity}', {prefix}{id_column}, {article_expr}, {prefix}{title}, "
+        f"{_detail_expression(prefix, details)});"
+    ]
+    if code_column:
+        statements.append(
+            f"INSERT INTO busqueda_codigos (rowid, entidad, id_registro, id_articulo, codigo) "
+            f"VALUES ({rowid}, '{entity}', {prefix}{id_column}, {article_expr}, {prefix}{code_column});"
+        )
+    return statements
+
+
+def _unindex_statements(code, id_column, code_column):
+    rowid = f"OLD.{id_column} * {ENTITY_SLOTS} + {code}"
+    statements = [f"DELETE FROM busqueda_global WHERE rowid = {rowid};"]
+    if code_column:
+        statements.append(f"DELETE FROM busqueda_codigos WHERE rowid = {rowid};")
+    return statements
+
+
+def is_installed(conn):
+    """Return True if the search tables exist."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'busqueda_global'"
+    ).fetchone() is not None
+
+
+def install(conn):
+    """Create the FTS tables and the sync triggers, then index existing rows."""
+    for sql in FTS_TABLES:
+        conn.execute(sql)
+    for entity, code, table, id_column, article, title, details, code_column in _available_entities(conn):
+        insert = _index_statements(entity, code, id_column, article, title, details, code_column, 'NEW.')
+        delete = _unindex_statements(code, id_column, code_column)
+        triggers = {
+            insert_trigger(entity): (f"AFTER INSERT ON {table}", insert),
+            f"busqueda_{entity}_update": (f"AFTER UPDATE ON {table}", delete + insert),
+            f"busqueda_{entity}_delete": (f"AFTER DELETE ON {table}", delete),
+        }
+        for name, (event, statements) in triggers.items():
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute(f"CREATE TRIGGER {name} {event} BEGIN {' '.join(statements)} END")
+    rebuild(conn)
+    logger.info("Search index installed")
+
+
+def ensure_installed(conn):
+    """Install the search index once; databases without any searchable table are left alone."""
+    if not is_installed(conn) and any(True for _ in _available_entities(conn)):
+        install(conn)
+
+
+def _bulk_index_statements(entity, code, table, id_column, article, title, details, code_column, where=''):
+    statements = [
+        f"INSERT INTO busqueda_global (rowid, entidad, id_registro, id_articulo, titulo, detalle) "
+        f"SELECT {id_column} * {ENTITY_SLOTS} + {code}, '{entity}', {id_column}, {article}, {title}, "
+        f"{_detail_expression('', details)} FROM {table}{where}"
+    ]
+    if code_column:
+        statements.append(
+            f"INSERT INTO busqueda_codigos (rowid, entidad, id_registro, id_articulo, codigo) "
+            f"SELECT {id_column} * {ENTITY_SLOTS} + {code}, '{entity}', {id_column}, {article}, "
+            f"{code_column} FROM {table}{where}"
+        )
+    return statements
+
+
+def insert_trigger(entity):
+    """Name of the trigger that indexes new rows of ``entity``."""
+    return f"busqueda_{entity}_insert"
+
+
+def index_from(conn, entity, first_id):
+    """Index the rows of ``entity`` whose id is ``first_id`` or higher.
+
+    For bulk loaders that suspend ``insert_trigger(entity)``: inside a trigger
+    every row flushes FTS5's pending terms on its own, while one INSERT ...
+    SELECT per FTS table indexes the whole batch at once.
+    """
+    for available in _available_entities(conn):
+        if available[0] == entity:
+            for sql in _bulk_index_statements(*available, where=f" WHERE {available[3]} >= ?"):
+                conn.execute(sql, (first_id,))
+
+
+def rebuild(conn):
+    """Re-index every searchable row with one INSERT ... SELECT per entity."""
+    conn.execute("DELETE FROM busqueda_global")
+    conn.execute("DELETE FROM busqueda_codigos")
+    for available in _available_entities(conn):
+        for sql in _bulk_index_statements(*available):
+            conn.execute(sql)
+    conn.execute("INSERT INTO busqueda_global (busqueda_global) VALUES ('optimize')")
+    conn.execute("INSERT INTO busqueda_codigos (busqueda_codigos) VALUES ('optimize')")
+
+
+def build_search_query(text, limit=20, candidates=1000):
+    """Return ``(sql, params)`` for a ranked search, or ``(None, None)`` for empty input.
+
+    Every word becomes a prefix term (``"word"*``), all of which must match. Inputs
+    of three characters or more are also looked up as substrings of codes; code
+    hits come first when the input contains a digit. Only the ``candidates`` best
+    matches of each table are kept: ``ORDER BY rank LIMIT`` lets FTS5 rank with a
+    bounded heap instead of sorting every match, which keeps type-ahead latency
+    flat when a short prefix matches a large share of the rows.
+    """
+    tokens = _TOKEN.findall(text)
+    if not tokens:
+        return None, None
+    match = ' AND '.join(f'"{token}"*' for token in tokens)
+    code = text.strip()
+    codes_first = any(ch.isdigit() for ch in code)
+    sql = '''
+    SELECT * FROM (
+        SELECT entidad, id_registro, id_articulo, titulo, detalle, ? AS prioridad, rank
+        FROM busqueda_global WHERE busqueda_global MATCH ? AND rank MATCH 'bm25(0, 0, 0, 10.0, 1.0)'
+        ORDER BY rank LIMIT ?
+    )
+    '''
+    params = [1 if codes_first else 0, match, candidates]
+    if len(code) >= 3:
+        sql += '''
+    UNION ALL
+    SELECT * FROM (
+        SELECT entidad, id_registro, id_articulo, codigo AS titulo, '' AS detalle, ? AS prioridad, rank
+        FROM busqueda_codigos WHERE busqueda_codigos MATCH ?
+        ORDER BY rank LIMIT ?
+    )
+    '''
+        params += [0 if codes_first else 1, '"' + code.replace('"', '""') + '"', candidates]
+    sql = (
+        f"SELECT entidad, id_registro, id_articulo, titulo, detalle, rank FROM ({sql}) "
+        f"ORDER BY prioridad, rank LIMIT ?"
+    )
+    params.append(limit)
+    return sql, tuple(params)
+
+
+def merge_results(rows):
+    """Drop duplicates (a code can match both tables), keeping the best-ranked hit."""
+    seen = set()
+    results = []
+    for row in rows:
+        key = (row[0], row[1])
+        if key not in seen:
+            seen.add(key)
+            results.append(row)
+    return results
+
+
+def search(conn, text, limit=20):
+    """Run a ranked search and return ``(entidad, id_registro, id_articulo, titulo, detalle, rank)`` rows."""
+    sql, params = build_search_query(text, limit)
+    if sql is None:
+        return []
+    return merge_results(conn.execute(sql, params).fetchall())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage and query the full-text search index")
+    parser.add_argument('command', choices=['install', 'rebuild', 'query'])
+    parser.add_argument('text', nargs='?', default='')
+    parser.add_argument('--db', default='gestion_patrimonial.db')
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db_manager = DatabaseManager(args.db)
+    try:
+        if args.command == 'query':
+            with db_manager.reader() as conn:
+                for row in search(conn, args.text, args.limit):
+                    print(row)
+        else:
+            with db_manager.transaction() as conn:
+                install(conn) if args.command == 'install' else rebuild(conn)
+    finally:
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,470 @@
+"""Column-oriented, read-only snapshot of the inventory for offline analysis.
+
+Dashboards and ad-hoc analysis used to aggregate ``vista_inventario_completo``,
+``vista_movimientos_stock`` and the assignment views on the live database,
+competing with the UI for it. ``export_snapshot`` writes the same data,
+denormalized, to a directory of NumPy ``.npy`` files, one per column:
+
+* ids are ``int64`` (NULL = -1), quantities and amounts ``float64`` (NULL =
+  NaN), dates ``datetime64[D]`` (NULL = NaT);
+* strings are dictionary-encoded: an ``int32`` code column (NULL = -1) plus the
+  list of distinct values, so grouping by family or department is a
+  ``bincount`` over small integers.
+
+Append-only tables (``movimientos``, ``historial_estado``) are refreshed
+incrementally: only rows above the id watermark of the previous export are
+read, written as a new segment, and new strings are appended to the
+dictionaries so existing codes keep their meaning. If rows below the watermark
+were deleted (archived), the dataset is exported again in full. Segments are merged when
+there are more than ``max_segments``. Mutable tables (articles and stock,
+assignments) are re-exported whole, which is cheap at their size. Every
+dataset is read inside one read transaction, so a snapshot is consistent, and
+``manifest.json`` is replaced atomically after the files it names are written.
+
+``Snapshot`` memory-maps the files, so aggregations read the page cache
+directly and never open the database.
+
+Usage (from the repository root):
+
+    python -m database.snapshot_export --db gestion_patrimonial.db export snapshot/
+    python -m database.snapshot_export --db gestion_patrimonial.db export snapshot/ --full
+    python -m database.snapshot_export summary snapshot/
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from database.database_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+FETCH_SIZE = 50000
+
+# kind -> numpy dtype of the stored column
+KINDS = {
+    'id': 'int64',
+    'num': 'float64',
+    'date': 'datetime64[D]',
+    'text': 'int32',
+}
+
+# name -> query, (column, kind) pairs in query order, and for incremental
+# datasets the source table and its watermark column (the query takes the
+# watermark as its only parameter)
+DATASETS = {
+    'inventario': {
+        'query': '''
+        SELECT id_articulo, nombre_articulo, nombre_familia, nombre_subfamilia, nombre_marca, nombre_proveedor,
+               estado, stock_actual, stock_minimo, precio_compra, precio_venta, fecha_ultimo_movimiento
+        FROM vista_inventario_completo
+        ''',
+        'columns': [
+            ('id_articulo', 'id'), ('nombre_articulo', 'text'), ('nombre_familia', 'text'),
+            ('nombre_subfamilia', 'text'), ('nombre_marca', 'text'), ('nombre_proveedor', 'text'),
+            ('estado', 'text'), ('stock_actual', 'num'), ('stock_minimo', 'num'), ('precio_compra', 'num'),
+            ('precio_venta', 'num'), ('fecha_ultimo_movimiento', 'date'),
+        ],
+        'watermark': None,
+    },
+    # vista_movimientos_stock plus the family and location, in id order
+    'movimientos': {
+        'query': '''
+        SELECT m.id_movimiento, m.id_articulo, f.nombre_familia, m.cantidad, m.tipo_movimiento,
+               m.fecha_movimiento, m.id_ubicacion, c.nombre_cliente, u.nombre_usuario
+        FROM movimientos m
+        JOIN articulos a ON m.id_articulo = a.id_articulo
+        LEFT JOIN subfamilia sf ON a.id_subfamilia = sf.id_subfamilia
+        LEFT JOIN familia f ON sf.id_familia = f.id_familia
+        LEFT JOIN clientes c ON m.id_cliente = c.id_cliente
+        LEFT JOIN usuarios u ON m.id_usuario = u.id_usuario
+        WHERE m.id_movimiento > ?
+        ORDER BY m.id_movimiento
+        ''',
+        'columns': [
+            ('id_movimiento', 'id'), ('id_articulo', 'id'), ('nombre_familia', 'text'), ('cantidad', 'num'),
+            ('tipo_movimiento', 'text'), ('fecha_movimiento', 'date'), ('id_ubicacion', 'id'),
+            ('nombre_cliente', 'text'), ('usuario_registro', 'text'),
+        ],
+        'table': 'movimientos',
+        'watermark': 'id_movimiento',
+    },
+    # vista_equipos_asignados without the serial and patrimony joins that repeat each assignment
+    'asignaciones': {
+        'query': '''
+        SELECT ea.id_asignacion, ea.id_articulo, f.nombre_familia, ea.id_agente, ag.nombre_agente,
+               d.nombre_departamento, ea.fecha_asignacion, ea.fecha_devolucion, ea.estado
+        FROM equipo_asignado ea
+        JOIN articulos a ON ea.id_articulo = a.id_articulo
+        LEFT JOIN subfamilia sf ON a.id_subfamilia = sf.id_subfamilia
+        LEFT JOIN familia f ON sf.id_familia = f.id_familia
+        JOIN agentes ag ON ea.id_agente = ag.id_agente
+        LEFT JOIN agente_departamento ad ON ag.id_agente = ad.id_agente AND ad.es_principal = 1
+        LEFT JOIN departamentos d ON ad.id_departamento = d.id_departamento
+        ''',
+        'columns': [
+            ('id_asignacion', 'id'), ('id_articulo', 'id'), ('nombre_familia', 'text'), ('id_agente', 'id'),
+            ('nombre_agente', 'text'), ('nombre_departamento', 'text'), ('fecha_asignacion', 'date'),
+            ('fecha_devolucion', 'date'), ('estado', 'text'),
+        ],
+        'watermark': None,
+    },
+    'historial_estado': {
+        'query': '''
+        SELECT id_historial, id_articulo, estado_anterior, estado_nuevo, fecha_cambio
+        FROM historial_estado
+        WHERE id_historial > ?
+        ORDER BY id_historial
+        ''',
+        'columns': [
+            ('id_historial', 'id'), ('id_articulo', 'id'), ('estado_anterior', 'text'),
+            ('estado_nuevo', 'text'), ('fecha_cambio', 'date'),
+        ],
+        'table': 'historial_estado',
+        'watermark': 'id_historial',
+    },
+}
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("numpy is required for snapshot export (pip install numpy)")
+
+
+def _date(value):
+    if value is None:
+        return 'NaT'
+    # fecha_* columns hold both plain dates and timestamps
+    text = str(value)[:10]
+    try:
+        np.datetime64(text, 'D')
+    except ValueError:
+        return 'NaT'
+    return text
+
+
+def _encode(kind, values, dictionary):
+    """One chunk of a column as a numpy array; ``dictionary`` maps text to codes and grows in place."""
+    if kind == 'id':
+        return np.fromiter((-1 if value is None else value for value in values), np.int64, len(values))
+    if kind == 'num':
+        return np.array(values, dtype=np.float64)
+    if kind == 'date':
+        try:
+            return np.array(['NaT' if value is None else str(value)[:10] for value in values], dtype='datetime64[D]')
+        except ValueError:
+            # Some value is not a date; check them one by one
+            return np.array([_date(value) for value in values], dtype='datetime64[D]')
+    for value in set(values):
+        if value is not None and value not in dictionary:
+            dictionary[value] = len(dictionary)
+    get = dictionary.get
+    return np.fromiter((get(value, -1) for value in values), np.int32, len(values))
+
+
+def _read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {'format': FORMAT_VERSION, 'refresh': 0, 'datasets': {}}
+    if manifest.get('format') != FORMAT_VERSION:
+        raise ValueError(f"{path} holds a snapshot in format {manifest.get('format')}, expected {FORMAT_VERSION}")
+    return manifest
+
+
+def _unchanged_below(conn, spec, entry):
+    """True if the rows up to the watermark are still the ones exported.
+
+    Incremental datasets are append-only, but archiving deletes old rows (and
+    replaces movements with balance rows), which appending would double count.
+    """
+    live = conn.execute(
+        f"SELECT COUNT(*) FROM {spec['table']} WHERE {spec['watermark']} <= ?", (entry['watermark'],)
+    ).fetchone()[0]
+    return live == entry['rows']
+
+
+def _export_dataset(conn, path, name, spec, previous, refresh, full, max_segments):
+    """Write one dataset's new segment (and dictionaries); returns ``(manifest entry, rows read)``."""
+    columns = spec['columns']
+    incremental = spec['watermark'] is not None and previous is not None and not full
+    if incremental and not _unchanged_below(conn, spec, previous):
+        logger.info(f"Rows of {spec['table']} were deleted since the last export; exporting {name} again")
+        incremental = False
+    if incremental:
+        entry = copy.deepcopy(previous)
+        dictionaries = {}
+        for column, kind in columns:
+            if kind == 'text':
+                with open(os.path.join(path, name, entry['columns'][column]['values']), encoding='utf-8') as f:
+                    dictionaries[column] = {value: code for code, value in enumerate(json.load(f))}
+    else:
+        entry = {'rows': 0, 'segments': [], 'watermark': 0 if spec['watermark'] else None,
+                 'columns': {column: {'kind': kind} for column, kind in columns}}
+        dictionaries = {column: {} for column, kind in columns if kind == 'text'}
+    sizes = {column: len(dictionary) for column, dictionary in dictionaries.items()}
+
+    cursor = conn.execute(spec['query'], (entry['watermark'],) if spec['watermark'] else ())
+    chunks = {column: [] for column, _ in columns}
+    rows = 0
+    while True:
+        batch = cursor.fetchmany(FETCH_SIZE)
+        if not batch:
+            break
+        rows += len(batch)
+        for (column, kind), values in zip(columns, zip(*batch)):
+            chunks[column].append(_encode(kind, values, dictionaries.get(column)))
+
+    os.makedirs(os.path.join(path, name), exist_ok=True)
+    if rows:
+        segment = {'rows': rows, 'files': {}}
+        for column, kind in columns:
+            filename = f"{column}.{refresh}.npy"
+            np.save(os.path.join(path, name, filename), np.concatenate(chunks[column]).astype(KINDS[kind]))
+            segment['files'][column] = filename
+        entry['segments'].append(segment)
+        entry['rows'] += rows
+        if spec['watermark']:
+            # Rows come in watermark order
+            entry['watermark'] = int(chunks[spec['watermark']][-1][-1])
+    for column, dictionary in dictionaries.items():
+        if len(dictionary) != sizes[column] or 'values' not in entry['columns'][column]:
+            filename = f"{column}.{refresh}.values.json"
+            with open(os.path.join(path, name, filename), 'w', encoding='utf-8') as f:
+                json.dump(list(dictionary), f, ensure_ascii=False)
+            entry['columns'][column]['values'] = filename
+    if len(entry['segments']) > max_segments:
+        _merge_segments(path, name, entry, refresh)
+    return entry, rows
+
+
+def _merge_segments(path, name, entry, refresh):
+    merged = {'rows': entry['rows'], 'files': {}}
+    for column in entry['columns']:
+        parts = [np.load(os.path.join(path, name, segment['files'][column]), mmap_mode='r')
+                 for segment in entry['segments']]
+        filename = f"{column}.{refresh}m.npy"
+        np.save(os.path.join(path, name, filename), np.concatenate(parts))
+        merged['files'][column] = filename
+    entry['segments'] = [merged]
+
+
+def _remove_unreferenced(path, manifest):
+    """Delete files no dataset of ``manifest`` names any more."""
+    for name, entry in manifest['datasets'].items():
+        referenced = {filename for segment in entry['segments'] for filename in segment['files'].values()}
+        referenced.update(column['values'] for column in entry['columns'].values() if 'values' in column)
+        for filename in os.listdir(os.path.join(path, name)):
+            if filename not in referenced:
+                try:
+                    os.remove(os.path.join(path, name, filename))
+                except OSError:
+                    # Still memory-mapped by a reader on Windows; the next export retries
+                    pass
+
+
+def export_snapshot(db_manager, path, datasets=None, full=False, max_segments=8):
+    """Export (or incrementally refresh) the snapshot in directory ``path``; returns rows read per dataset."""
+    _require_numpy()
+    start = time.perf_counter()
+    os.makedirs(path, exist_ok=True)
+    manifest = _read_manifest(path)
+    refresh = manifest['refresh'] + 1
+    exported = {}
+    with db_manager.reader() as conn:
+        # One read transaction: every dataset sees the same database state
+        conn.execute("BEGIN")
+        try:
+            for name in datasets or DATASETS:
+                entry, rows = _export_dataset(
+                    conn, path, name, DATASETS[name], manifest['datasets'].get(name), refresh, full, max_segments
+                )
+                manifest['datasets'][name] = entry
+                exported[name] = rows
+        finally:
+            conn.execute("COMMIT")
+    manifest['refresh'] = refresh
+    manifest['exported_at'] = datetime.now().isoformat(timespec='seconds')
+    temporary = os.path.join(path, MANIFEST + '.tmp')
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(temporary, os.path.join(path, MANIFEST))
+    _remove_unreferenced(path, manifest)
+    logger.info(f"Snapshot {path} refresh {refresh}: " +
+                ', '.join(f"{name} +{rows}" for name, rows in exported.items()) +
+                f" in {time.perf_counter() - start:.2f} s")
+    return exported
+
+
+class Snapshot:
+    """Memory-mapped, read-only view of an exported snapshot."""
+
+    def __init__(self, path):
+        _require_numpy()
+        self.path = path
+        self.manifest = _read_manifest(path)
+        if not self.manifest['datasets']:
+            raise FileNotFoundError(f"No snapshot in {path}")
+        self._values = {}
+
+    @property
+    def exported_at(self):
+        return self.manifest.get('exported_at')
+
+    def rows(self, dataset):
+        return self.manifest['datasets'][dataset]['rows']
+
+    def segments(self, dataset, column):
+        """The column's segments as read-only memory maps (no copy)."""
+        entry = self.manifest['datasets'][dataset]
+        return [np.load(os.path.join(self.path, dataset, segment['files'][column]), mmap_mode='r')
+                for segment in entry['segments']]
+
+    def column(self, dataset, column):
+        """The whole column; a memory map when it is a single segment, otherwise concatenated."""
+        parts = self.segments(dataset, column)
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return np.empty(0, dtype=KINDS[self.manifest['datasets'][dataset]['columns'][column]['kind']])
+        return np.concatenate(parts)
+
+    def values(self, dataset, column):
+        """Distinct strings of a dictionary-encoded column, indexed by code."""
+        key = (dataset, column)
+        if key not in self._values:
+            filename = self.manifest['datasets'][dataset]['columns'][column]['values']
+            with open(os.path.join(self.path, dataset, filename), encoding='utf-8') as f:
+                self._values[key] = json.load(f)
+        return self._values[key]
+
+    def code(self, dataset, column, value):
+        """Code of ``value`` in a text column, or -1 if it never occurs."""
+        try:
+            return self.values(dataset, column).index(value)
+        except ValueError:
+            return -1
+
+    def group_sum(self, dataset, key, weights=None, where=None):
+        """``{value of key: total}`` summing ``weights`` (or counting rows), segment by segment.
+
+        ``key`` is a text column; ``where`` maps text columns to the value
+        they must equal. NULL keys and NaN weights are left out.
+        """
+        labels = self.values(dataset, key)
+        totals = np.zeros(len(labels) + 1, dtype=np.float64)
+        columns = [key] + ([weights] if weights else []) + list(where or ())
+        for parts in zip(*(self.segments(dataset, column) for column in columns)):
+            segment = dict(zip(columns, parts))
+            mask = np.ones(len(parts[0]), dtype=bool)
+            for column, value in (where or {}).items():
+                mask &= segment[column] == self.code(dataset, column, value)
+            if weights:
+                w = segment[weights]
+                mask &= ~np.isnan(w)
+                w = w[mask]
+            else:
+                w = None
+            # Code -1 (NULL) lands in the last bucket
+            totals += _bincount(segment[key][mask], w, len(labels))
+        return {label: totals[code] for code, label in enumerate(labels) if totals[code]}
+
+
+def _bincount(codes, weights, size):
+    # Shift by one so NULL (-1) becomes bucket 0, then move it to the end
+    counts = np.bincount(codes + 1, weights=weights, minlength=size + 1)
+    return np.concatenate([counts[1:], counts[:1]])
+
+
+def monthly_totals(snapshot, dataset, date_column, weights=None, where=None):
+    """``{'YYYY-MM': total}`` of ``weights`` (or row counts) by the month of ``date_column``."""
+    totals = {}
+    columns = [date_column] + ([weights] if weights else []) + list(where or ())
+    for parts in zip(*(snapshot.segments(dataset, column) for column in columns)):
+        segment = dict(zip(columns, parts))
+        months = segment[date_column].astype('datetime64[M]')
+        mask = ~np.isnat(months)
+        for column, value in (where or {}).items():
+            mask &= segment[column] == snapshot.code(dataset, column, value)
+        # Months since 1970 as small offsets, so grouping is a bincount rather than a sort
+        months = months[mask].astype(np.int64)
+        if not len(months):
+            continue
+        first = months.min()
+        sums = np.bincount(months - first, weights=segment[weights][mask] if weights else None)
+        for offset in np.flatnonzero(sums):
+            key = str(np.datetime64(int(first + offset), 'M'))
+            totals[key] = totals.get(key, 0) + sums[offset]
+    return dict(sorted(totals.items()))
+
+
+def dashboard(snapshot):
+    """The figures the inventory dashboard shows, computed from the snapshot alone."""
+    stock = snapshot.column('inventario', 'stock_actual')
+    price = snapshot.column('inventario', 'precio_compra')
+    families = snapshot.column('inventario', 'nombre_familia')
+    value = np.nan_to_num(stock) * np.nan_to_num(price)
+    labels = snapshot.values('inventario', 'nombre_familia')
+    value_by_family = _bincount(families, value, len(labels))
+    minimum = snapshot.column('inventario', 'stock_minimo')
+    return {
+        'stock_por_familia': snapshot.group_sum('inventario', 'nombre_familia', 'stock_actual'),
+        'valor_por_familia': {label: value_by_family[code] for code, label in enumerate(labels)
+                              if value_by_family[code]},
+        'bajo_minimo': int(np.count_nonzero(stock <= minimum)),
+        'entradas_por_mes': monthly_totals(snapshot, 'movimientos', 'fecha_movimiento', 'cantidad',
+                                           {'tipo_movimiento': 'entrada'}),
+        'salidas_por_mes': monthly_totals(snapshot, 'movimientos', 'fecha_movimiento', 'cantidad',
+                                          {'tipo_movimiento': 'salida'}),
+        'asignados_por_departamento': snapshot.group_sum('asignaciones', 'nombre_departamento',
+                                                         where={'estado': 'Asignado'}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a column-oriented snapshot of the inventory")
+    parser.add_argument('--db', default='gestion_patrimonial.db')
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help="create or incrementally refresh a snapshot")
+    export_parser.add_argument('path')
+    export_parser.add_argument('--full', action='store_true', help="re-export every dataset from scratch")
+    export_parser.add_argument('--dataset', action='append', choices=list(DATASETS))
+    export_parser.add_argument('--max-segments', type=int, default=8)
+    summary_parser = commands.add_parser('summary', help="dashboard figures from a snapshot (no database access)")
+    summary_parser.add_argument('path')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == 'export':
+        db_manager = DatabaseManager(args.db)
+        try:
+            for name, rows in export_snapshot(db_manager, args.path, args.dataset, args.full,
+                                              args.max_segments).items():
+                print(f"{name}: {rows} rows exported")
+        finally:
+            db_manager.close()
+    else:
+        snapshot = Snapshot(args.path)
+        print(f"Snapshot of {snapshot.exported_at}")
+        for figure, value in dashboard(snapshot).items():
+            if isinstance(value, dict):
+                print(f"{figure}:")
+                for label, total in list(value.items())[-12:] if figure.endswith('_mes') else value.items():
+                    print(f"  {label}: {total:,.2f}")
+            else:
+                print(f"{figure}: {value}")
+
+
+if __name__ == "__main__":
+    main()
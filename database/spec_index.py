@@ -0,0 +1,346 @@
+"""Faceted search over article specifications.
+
+``articulo_especificacion`` stores one row per (article, specification), so a
+filter on N specifications is an N-way self-join, and the values are TEXT even
+for numeric specifications. ``SpecIndex`` instead loads the table once into
+per-specification value indexes:
+
+* every distinct value has a bitmap (a Python int, bit ``n`` = article ``n``)
+  of the articles that carry it, so equality and "any of" filters are one
+  lookup or a few ORs;
+* numeric specifications (``tipo_dato = 'numero'``) also keep their distinct
+  values sorted as floats, and a range filter is a ``bisect`` plus an OR of the
+  bitmaps in range.
+
+A multi-attribute filter is the AND of one bitmap per attribute, and facet
+counts are ``bit_count()`` of each value's bitmap ANDed with the other
+filters, so the UI can show how many articles each alternative would leave.
+
+``SpecSearch`` holds the current index and rebuilds it when the trigger-kept
+counter in ``especificaciones_version`` shows the specification tables changed.
+
+Usage (from the repository root):
+
+    python -m database.spec_index --db gestion_patrimonial.db "Memoria RAM (GB)>=16" "Procesador=Intel Core i7"
+"""
+import argparse
+import bisect
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+NUMERIC_TYPES = ('numero',)
+
+VERSION_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS especificaciones_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    ''',
+    "INSERT OR IGNORE INTO especificaciones_version (id, version) VALUES (1, 0)",
+]
+VERSION_TRIGGER = '''
+CREATE TRIGGER IF NOT EXISTS especificaciones_version_{table}_{event}
+AFTER {event} ON {table}
+BEGIN
+    UPDATE especificaciones_version SET version = version + 1 WHERE id = 1;
+END
+'''
+
+Range = namedtuple('Range', 'minimum maximum', defaults=(None, None))
+Range.__doc__ = "Inclusive numeric range filter; either bound may be None."
+
+# Positions of the set bits of every byte value, for turning bitmaps back into ids
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def install(conn):
+    """Create the change counter and the triggers that bump it."""
+    for sql in VERSION_SCHEMA:
+        conn.execute(sql)
+    for table in ('articulo_especificacion', 'especificaciones'):
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(VERSION_TRIGGER.format(table=table, event=event))
+
+
+def data_version(conn):
+    """Current value of the specification change counter (None before install)."""
+    try:
+        row = conn.execute("SELECT version FROM especificaciones_version WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def bitmap_from_ids(ids):
+    """Build an article bitmap from an iterable of ids."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    bits = bytearray(max(ids) // 8 + 1)
+    for id_articulo in ids:
+        bits[id_articulo >> 3] |= 1 << (id_articulo & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def ids_from_bitmap(bitmap, limit=None):
+    """Ids set in ``bitmap`` in ascending order (at most ``limit`` of them)."""
+    ids = []
+    if bitmap <= 0:
+        return ids
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    for offset, value in enumerate(data):
+        if value:
+            base = offset << 3
+            ids.extend(base + bit for bit in _BYTE_BITS[value])
+            if limit is not None and len(ids) >= limit:
+                return ids[:limit]
+    return ids
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class _Specification:
+    """Value index of one specification."""
+
+    def __init__(self, id_especificacion, nombre, tipo_dato):
+        self.id = id_especificacion
+        self.nombre = nombre
+        self.numeric = tipo_dato in NUMERIC_TYPES
+        # value -> bitmap; numeric values are keyed by their float
+        self.bitmaps = {}
+        self.keys = []
+        self.all = 0
+
+    def finish(self, postings):
+        """Turn raw ``valor -> [id_articulo]`` postings into bitmaps keyed by normalized value."""
+        self.bitmaps = {}
+        for valor, ids in postings.items():
+            # '16' and '16.0' are the same number
+            key = self.key(valor)
+            self.bitmaps[key] = self.bitmaps.get(key, 0) | bitmap_from_ids(ids)
+        self.all = 0
+        for bitmap in self.bitmaps.values():
+            self.all |= bitmap
+        if self.numeric:
+            self.keys = sorted(value for value in self.bitmaps if isinstance(value, float))
+
+    def key(self, value):
+        """Normalize a filter value the way stored values were."""
+        if self.numeric:
+            number = _number(value)
+            if number is not None:
+                return number
+        return str(value).strip()
+
+    def match(self, condition):
+        """Bitmap of the articles satisfying ``condition`` for this specification."""
+        if isinstance(condition, Range):
+            if not self.numeric:
+                raise ValueError(f"'{self.nombre}' is not numeric; ranges need tipo_dato 'numero'")
+            start = 0 if condition.minimum is None else bisect.bisect_left(self.keys, float(condition.minimum))
+            stop = len(self.keys) if condition.maximum is None else bisect.bisect_right(self.keys, float(condition.maximum))
+            values = self.keys[start:stop]
+        elif isinstance(condition, (list, tuple, set, frozenset)):
+            values = [self.key(value) for value in condition]
+        else:
+            values = [self.key(condition)]
+        bitmap = 0
+        for value in values:
+            bitmap |= self.bitmaps.get(value, 0)
+        return bitmap
+
+    def order(self, item):
+        """Facet sort key: numbers ascending (unparseable values after them), text by descending count."""
+        value, count = item
+        if self.numeric:
+            return (0, value, '') if isinstance(value, float) else (1, 0, value)
+        return (-count, value)
+
+    def label(self, value):
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+
+
+class SpecIndex:
+    """Immutable in-memory index of ``articulo_especificacion``; build it with ``SpecIndex.build``."""
+
+    def __init__(self, specifications, version=None):
+        self.specifications = specifications
+        self.by_name = {spec.nombre: spec for spec in specifications.values()}
+        self.version = version
+        self.universe = 0
+        for spec in specifications.values():
+            self.universe |= spec.all
+
+    @classmethod
+    def build(cls, conn):
+        """Read both specification tables once and index every value."""
+        start = time.perf_counter()
+        version = data_version(conn)
+        specifications = {
+            row[0]: _Specification(*row)
+            for row in conn.execute("SELECT id_especificacion, nombre_especificacion, tipo_dato FROM especificaciones")
+        }
+        postings = {id_especificacion: {} for id_especificacion in specifications}
+        rows = 0
+        for id_articulo, id_especificacion, valor in conn.execute(
+            "SELECT id_articulo, id_especificacion, valor FROM articulo_especificacion"
+        ):
+            spec = specifications.get(id_especificacion)
+            if spec is None:
+                continue
+            postings[id_especificacion].setdefault(valor, []).append(id_articulo)
+            rows += 1
+        for id_especificacion, spec in specifications.items():
+            spec.finish(postings[id_especificacion])
+        index = cls(specifications, version)
+        logger.info(f"Indexed {rows} specification values of {index.universe.bit_count()} articles "
+                    f"in {time.perf_counter() - start:.2f} s")
+        return index
+
+    def _spec(self, name):
+        spec = self.by_name.get(name)
+        if spec is None and isinstance(name, int):
+            spec = self.specifications.get(name)
+        if spec is None:
+            raise KeyError(f"Unknown specification: {name}")
+        return spec
+
+    def _bitmaps(self, filters):
+        bitmaps = {}
+        for name, condition in filters.items():
+            spec = self._spec(name)
+            bitmaps[spec.id] = spec.match(condition)
+        return bitmaps
+
+    def bitmap(self, filters):
+        """Bitmap of the articles matching every filter.
+
+        ``filters`` maps a specification name (or id) to a value, a list of
+        accepted values, or a ``Range``.
+        """
+        result = self.universe
+        # Smallest first, so the running AND shrinks as early as possible
+        for bitmap in sorted(self._bitmaps(filters).values(), key=int.bit_count):
+            result &= bitmap
+            if not result:
+                break
+        return result
+
+    def search(self, filters, limit=None):
+        """Ids of the matching articles, ascending."""
+        return ids_from_bitmap(self.bitmap(filters), limit)
+
+    def count(self, filters):
+        return self.bitmap(filters).bit_count()
+
+    def facets(self, filters, names=None, max_values=50):
+        """Per-value counts for each specification, given the current filters.
+
+        A specification's own filter is left out of its counts, so the UI can
+        show what choosing another value would return. Returns
+        ``{nombre: [(valor, count), ...]}`` with non-zero counts, numeric values
+        in ascending order and the rest by descending count.
+        """
+        bitmaps = self._bitmaps(filters)
+        specs = [self._spec(name) for name in names] if names else list(self.specifications.values())
+        result = {}
+        for spec in specs:
+            base = self.universe
+            for id_especificacion, bitmap in bitmaps.items():
+                if id_especificacion != spec.id:
+                    base &= bitmap
+            counts = []
+            for value, bitmap in spec.bitmaps.items():
+                count = (bitmap & base).bit_count()
+                if count:
+                    counts.append((value, count))
+            counts.sort(key=spec.order)
+            result[spec.nombre] = [(spec.label(value), count) for value, count in counts[:max_values]]
+        return result
+
+
+class SpecSearch:
+    """The current SpecIndex of a database, rebuilt when the specification tables change."""
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self._index = None
+        self._lock = threading.Lock()
+
+    def index(self):
+        with self.db_manager.reader() as conn:
+            version = data_version(conn)
+            with self._lock:
+                # Without the counter (schema not migrated) there is no way to tell; build once
+                if self._index is None or (version is not None and version != self._index.version):
+                    self._index = SpecIndex.build(conn)
+                return self._index
+
+    def search(self, filters, limit=None):
+        return self.index().search(filters, limit)
+
+    def count(self, filters):
+        return self.index().count(filters)
+
+    def facets(self, filters, names=None, max_values=50):
+        return self.index().facets(filters, names, max_values)
+
+
+_CONDITION = re.compile(r'^(?P<name>.+?)\s*(?P<op>>=|<=|=)\s*(?P<value>.+)$')
+
+
+def parse_condition(text):
+    """Parse ``name=value``, ``name=a|b``, ``name>=n`` or ``name<=n`` into a filter entry."""
+    match = _CONDITION.match(text)
+    if not match:
+        raise ValueError(f"Cannot parse filter: {text}")
+    name, op, value = match.group('name').strip(), match.group('op'), match.group('value').strip()
+    if op == '>=':
+        return name, Range(minimum=value)
+    if op == '<=':
+        return name, Range(maximum=value)
+    return name, value.split('|') if '|' in value else value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faceted search over article specifications")
+    parser.add_argument('filters', nargs='*', help="e.g. 'Memoria RAM (GB)>=16' 'Procesador=Intel Core i7'")
+    parser.add_argument('--db', default='gestion_patrimonial.db')
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    filters = {}
+    for text in args.filters:
+        name, condition = parse_condition(text)
+        if isinstance(condition, Range) and name in filters and isinstance(filters[name], Range):
+            previous = filters[name]
+            condition = Range(condition.minimum or previous.minimum, condition.maximum or previous.maximum)
+        filters[name] = condition
+
+    conn = sqlite3.connect(args.db)
+    try:
+        index = SpecIndex.build(conn)
+        print(f"{index.count(filters)} matching articles; first ids: {index.search(filters, args.limit)}")
+        for nombre, counts in index.facets(filters).items():
+            print(f"{nombre}: " + ', '.join(f"{value} ({count})" for value, count in counts))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
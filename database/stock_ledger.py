@@ -0,0 +1,450 @@
+"""Point-in-time stock from the ``movimientos`` ledger plus periodic snapshots.
+
+``movimientos`` is append-only: corrections are new compensating movements, and
+UPDATE/DELETE are rejected by triggers. A snapshot job compacts the ledger into
+``stock_snapshot`` rows (quantity per article and location at the end of a cut
+date), built incrementally from the previous cut. A point-in-time query reads
+the latest snapshot at or before the date and adds the movements after it, both
+through indexes, so the cost depends on the movements since the last cut and not
+on the size of the ledger.
+
+Snapshot rows use ``id_ubicacion = 0`` for movements without a location and
+``id_ubicacion = -1`` for the article total over every location. A movement
+back-dated before an existing cut deletes every later cut, rows and registry
+entry, so stale snapshots are never read.
+
+Archiving (``database.archive``) replaces the movements before
+``archivo_limites.hasta`` with carry-forward balances dated the day before it.
+From that day on the live ledger still adds up exactly, and cuts older than it
+are not used. Earlier dates raise ValueError: those movements are only in the
+archives (``archive.query_range``).
+
+Usage (from the repository root):
+
+    python -m database.stock_ledger --db gestion_empresa.db snapshot --date 2025-06-30
+    python -m database.stock_ledger --db gestion_empresa.db at 42 2025-03-15 --ubicacion 3
+    python -m database.stock_ledger --db gestion_empresa.db reconcile
+"""
+import argparse
+import logging
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from database.database_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+SIN_UBICACION = 0
+TODAS_LAS_UBICACIONES = -1
+
+DELTA_SQL = "CASE tipo_movimiento WHEN 'entrada' THEN cantidad WHEN 'salida' THEN -cantidad ELSE 0 END"
+
+LEDGER_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS stock_snapshot (
+        id_articulo INTEGER NOT NULL,
+        id_ubicacion INTEGER NOT NULL,
+        fecha_corte DATE NOT NULL,
+        cantidad INTEGER NOT NULL,
+        PRIMARY KEY (id_articulo, id_ubicacion, fecha_corte)
+    ) WITHOUT ROWID
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_stock_snapshot_corte ON stock_snapshot(fecha_corte, id_ubicacion)",
+    '''
+    CREATE TABLE IF NOT EXISTS stock_snapshot_cortes (
+        fecha_corte DATE PRIMARY KEY,
+        fecha_generacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        filas INTEGER
+    )
+    ''',
+    # Covering indexes: a delta sum never touches the table rows
+    '''
+    CREATE INDEX IF NOT EXISTS idx_movimientos_articulo_ubicacion_fecha
+        ON movimientos(id_articulo, id_ubicacion, fecha_movimiento, tipo_movimiento, cantidad)
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_movimientos_articulo_fecha
+        ON movimientos(id_articulo, fecha_movimiento, tipo_movimiento, cantidad)
+    ''',
+]
+
+LEDGER_TRIGGERS = {
+    'ledger_movimientos_sin_update': '''
+    BEFORE UPDATE OF id_articulo, cantidad, tipo_movimiento, fecha_movimiento, id_ubicacion ON movimientos
+    BEGIN
+        SELECT RAISE(ABORT, 'Los movimientos no se modifican: registre un movimiento de ajuste');
+    END
+    ''',
+    'ledger_movimientos_sin_delete': '''
+    BEFORE DELETE ON movimientos
+    BEGIN
+        SELECT RAISE(ABORT, 'Los movimientos no se eliminan: registre un movimiento de ajuste');
+    END
+    ''',
+    'ledger_invalidar_snapshots': '''
+    AFTER INSERT ON movimientos
+    WHEN NEW.fecha_movimiento < (SELECT date(MAX(fecha_corte), '+1 day') FROM stock_snapshot_cortes)
+    BEGIN
+        DELETE FROM stock_snapshot WHERE fecha_corte >= date(NEW.fecha_movimiento);
+        DELETE FROM stock_snapshot_cortes WHERE fecha_corte >= date(NEW.fecha_movimiento);
+    END
+    ''',
+}
+
+
+def _day(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _end_of_day(value):
+    """Exclusive upper bound for movements up to the end of ``value``.
+
+    ``fecha_movimiento`` holds both plain dates and timestamps, so "on or before
+    D" is written as "before D + 1 day" to include timestamps taken on D.
+    """
+    return (_day(value) + timedelta(days=1)).isoformat()
+
+
+def _location_key(id_ubicacion):
+    return SIN_UBICACION if id_ubicacion is None else id_ubicacion
+
+
+def is_installed(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stock_snapshot'"
+    ).fetchone() is not None
+
+
+def install(conn):
+    """Add ``movimientos.id_ubicacion``, the snapshot tables, ledger indexes and triggers."""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(movimientos)")]
+    if 'id_ubicacion' not in columns:
+        conn.execute("ALTER TABLE movimientos ADD COLUMN id_ubicacion INTEGER REFERENCES ubicacion(id_ubicacion)")
+    for sql in LEDGER_SCHEMA:
+        conn.execute(sql)
+    for name, body in LEDGER_TRIGGERS.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {body}")
+    logger.info("Stock ledger installed")
+
+
+@contextmanager
+def suspended_triggers(conn, names):
+    """Drop the named triggers for the body of the ``with`` block, then recreate them.
+
+    Use it inside a transaction: other connections never see the triggers
+    missing, and if the block raises, the rollback brings them back.
+    """
+    saved = [
+        row for row in (
+            conn.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger' AND name=?", (name,)).fetchone()
+            for name in names
+        ) if row
+    ]
+    for name, _ in saved:
+        conn.execute(f"DROP TRIGGER {name}")
+    yield
+    for _, sql in saved:
+        conn.execute(sql)
+
+
+def drop_orphaned_snapshots(conn):
+    """Delete snapshot rows whose cut is no longer registered; return the rows deleted.
+
+    Older versions of the invalidation trigger only dropped the moving article's
+    rows, leaving the other articles' rows of an invalidated cut behind.
+    """
+    conn.execute('''
+    DELETE FROM stock_snapshot
+    WHERE fecha_corte NOT IN (SELECT fecha_corte FROM stock_snapshot_cortes)
+    ''')
+    return conn.execute("SELECT changes()").fetchone()[0]
+
+
+def ensure_installed(conn):
+    """Install the ledger objects once on databases that have ``movimientos``."""
+    has_movements = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'movimientos'"
+    ).fetchone() is not None
+    if has_movements and not is_installed(conn):
+        install(conn)
+
+
+def archived_floor(conn):
+    """Earliest date the live ledger still gives exact stock for (ISO date), or None if nothing is archived."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'archivo_limites'").fetchone() is None:
+        return None
+    row = conn.execute("SELECT hasta FROM archivo_limites WHERE tabla = 'movimientos'").fetchone()
+    return (_day(row[0]) - timedelta(days=1)).isoformat() if row else None
+
+
+def _live_floor(conn, fecha):
+    """``archived_floor``, after checking ``fecha`` is not before it."""
+    floor = archived_floor(conn)
+    if floor and _day(fecha).isoformat() < floor:
+        raise ValueError(
+            f"Movements before {_end_of_day(floor)} are archived: the live ledger gives stock from {floor} on, "
+            f"not for {_day(fecha).isoformat()} (read the archived movements with archive.query_range)"
+        )
+    return floor
+
+
+def last_cut(conn, before=None):
+    """Return the latest complete cut date (optionally on or before ``before``), or None."""
+    if before is None:
+        row = conn.execute("SELECT MAX(fecha_corte) FROM stock_snapshot_cortes").fetchone()
+    else:
+        row = conn.execute(
+            "SELECT MAX(fecha_corte) FROM stock_snapshot_cortes WHERE fecha_corte <= ?",
+            (_day(before).isoformat(),)
+        ).fetchone()
+    return row[0]
+
+
+def build_snapshot(conn, fecha_corte=None):
+    """Compact the ledger into snapshot rows at the end of ``fecha_corte`` (default today).
+
+    Starts from the previous complete cut and only reads the movements after it.
+    Must run inside a transaction. Returns the number of snapshot rows written.
+    """
+    corte = _day(fecha_corte or date.today()).isoformat()
+    floor = _live_floor(conn, corte)
+    previous = conn.execute(
+        "SELECT MAX(fecha_corte) FROM stock_snapshot_cortes WHERE fecha_corte < ? AND fecha_corte >= ?",
+        (corte, floor or '')
+    ).fetchone()[0]
+    lower = _end_of_day(previous) if previous else ''
+
+    conn.execute("DELETE FROM stock_snapshot WHERE fecha_corte = ?", (corte,))
+    conn.execute(f'''
+    INSERT INTO stock_snapshot (id_articulo, id_ubicacion, fecha_corte, cantidad)
+    SELECT id_articulo, id_ubicacion, :corte, SUM(delta)
+    FROM (
+        SELECT id_articulo, id_ubicacion, cantidad AS delta
+        FROM stock_snapshot WHERE fecha_corte = :previo
+        UNION ALL
+        SELECT id_articulo, COALESCE(id_ubicacion, {SIN_UBICACION}), {DELTA_SQL}
+        FROM movimientos WHERE fecha_movimiento >= :desde AND fecha_movimiento < :hasta
+        UNION ALL
+        SELECT id_articulo, {TODAS_LAS_UBICACIONES}, {DELTA_SQL}
+        FROM movimientos WHERE fecha_movimiento >= :desde AND fecha_movimiento < :hasta
+    )
+    GROUP BY id_articulo, id_ubicacion
+    ''', {'corte': corte, 'previo': previous, 'desde': lower, 'hasta': _end_of_day(corte)})
+    rows = conn.execute("SELECT changes()").fetchone()[0]
+    conn.execute(
+        "INSERT OR REPLACE INTO stock_snapshot_cortes (fecha_corte, filas) VALUES (?, ?)", (corte, rows)
+    )
+    logger.info(f"Stock snapshot {corte}: {rows} rows (from {'cut ' + previous if previous else 'full ledger'})")
+    return rows
+
+
+def prune_snapshots(conn, keep=12):
+    """Delete all but the ``keep`` most recent cuts."""
+    conn.execute('''
+    DELETE FROM stock_snapshot WHERE fecha_corte < (
+        SELECT MIN(fecha_corte) FROM (
+            SELECT fecha_corte FROM stock_snapshot_cortes ORDER BY fecha_corte DESC LIMIT ?
+        )
+    )
+    ''', (keep,))
+    conn.execute('''
+    DELETE FROM stock_snapshot_cortes WHERE fecha_corte NOT IN (
+        SELECT fecha_corte FROM stock_snapshot_cortes ORDER BY fecha_corte DESC LIMIT ?
+    )
+    ''', (keep,))
+
+
+def _movement_filter(id_ubicacion):
+    """WHERE fragment and params selecting one article's movements at one location (or all)."""
+    if id_ubicacion == TODAS_LAS_UBICACIONES:
+        return "id_articulo = ?", ()
+    if id_ubicacion == SIN_UBICACION:
+        return "id_articulo = ? AND id_ubicacion IS NULL", ()
+    return "id_articulo = ? AND id_ubicacion = ?", (id_ubicacion,)
+
+
+def _opening(conn, id_articulo, id_ubicacion, fecha, floor=None):
+    """Latest complete snapshot at or before ``fecha`` and not before ``floor``: (cut date or None, quantity).
+
+    A cut older than the archive floor predates the carry-forward balances,
+    which already hold the movements it summed.
+    """
+    row = conn.execute('''
+    SELECT s.fecha_corte, s.cantidad FROM stock_snapshot s
+    JOIN stock_snapshot_cortes c ON c.fecha_corte = s.fecha_corte
+    WHERE s.id_articulo = ? AND s.id_ubicacion = ? AND s.fecha_corte <= ? AND s.fecha_corte >= ?
+    ORDER BY s.fecha_corte DESC LIMIT 1
+    ''', (id_articulo, id_ubicacion, _day(fecha).isoformat(), floor or '')).fetchone()
+    return (row[0], row[1]) if row else (None, 0)
+
+
+def stock_at(conn, id_articulo, fecha, id_ubicacion=TODAS_LAS_UBICACIONES):
+    """Quantity of an article on hand at the end of ``fecha``.
+
+    ``id_ubicacion`` is a location id, ``None`` for movements without location,
+    or ``TODAS_LAS_UBICACIONES`` (default) for the total. Raises ValueError for
+    a date before ``archived_floor``.
+    """
+    location = _location_key(id_ubicacion)
+    corte, quantity = _opening(conn, id_articulo, location, fecha, _live_floor(conn, fecha))
+    where, params = _movement_filter(location)
+    delta = conn.execute(f'''
+    SELECT COALESCE(SUM({DELTA_SQL}), 0) FROM movimientos
+    WHERE {where} AND fecha_movimiento >= ? AND fecha_movimiento < ?
+    ''', (id_articulo, *params, _end_of_day(corte) if corte else '', _end_of_day(fecha))).fetchone()[0]
+    return quantity + delta
+
+
+def stock_series(conn, id_articulo, desde, hasta, id_ubicacion=TODAS_LAS_UBICACIONES):
+    """Closing quantity for every day from ``desde`` to ``hasta``: list of (ISO date, quantity)."""
+    start, end = _day(desde), _day(hasta)
+    if end < start:
+        return []
+    location = _location_key(id_ubicacion)
+    if start.isoformat() == _live_floor(conn, start):
+        # The carry-forward balances dated on the floor hold everything before it
+        quantity = 0
+    else:
+        quantity = stock_at(conn, id_articulo, start - timedelta(days=1), location)
+    where, params = _movement_filter(location)
+    daily = dict(conn.execute(f'''
+    SELECT substr(fecha_movimiento, 1, 10), SUM({DELTA_SQL}) FROM movimientos
+    WHERE {where} AND fecha_movimiento >= ? AND fecha_movimiento < ?
+    GROUP BY 1
+    ''', (id_articulo, *params, start.isoformat(), _end_of_day(end))))
+
+    series = []
+    day = start
+    while day <= end:
+        key = day.isoformat()
+        quantity += daily.get(key, 0)
+        series.append((key, quantity))
+        day += timedelta(days=1)
+    return series
+
+
+def stock_at_location(conn, id_ubicacion, fecha):
+    """Quantity of every article at one location at the end of ``fecha``: {id_articulo: quantity}.
+
+    Uses the latest complete cut at or before ``fecha`` plus the movements after it.
+    """
+    location = _location_key(id_ubicacion)
+    floor = _live_floor(conn, fecha)
+    corte = last_cut(conn, fecha)
+    if corte and floor and corte < floor:
+        corte = None
+    quantities = {}
+    if corte:
+        for id_articulo, quantity in conn.execute(
+            "SELECT id_articulo, cantidad FROM stock_snapshot WHERE fecha_corte = ? AND id_ubicacion = ?",
+            (corte, location)
+        ):
+            quantities[id_articulo] = quantity
+    location_sql = "id_ubicacion IS NULL" if location == SIN_UBICACION else "id_ubicacion = ?"
+    params = () if location == SIN_UBICACION else (location,)
+    for id_articulo, delta in conn.execute(f'''
+    SELECT id_articulo, SUM({DELTA_SQL}) FROM movimientos
+    WHERE fecha_movimiento >= ? AND fecha_movimiento < ? AND {location_sql}
+    GROUP BY id_articulo
+    ''', (_end_of_day(corte) if corte else '', _end_of_day(fecha), *params)):
+        quantities[id_articulo] = quantities.get(id_articulo, 0) + delta
+    return {id_articulo: quantity for id_articulo, quantity in quantities.items() if quantity}
+
+
+def reconcile(conn, full=False):
+    """Compare the ledger total per article with ``stock.cantidad``.
+
+    Uses the latest complete cut plus later movements (and undated ones) unless
+    ``full`` is set, in which case the whole ledger is summed, which also checks
+    the snapshots themselves. Returns a list of
+    ``(id_articulo, ledger quantity, stock quantity)`` for every mismatch.
+    """
+    corte = None if full else last_cut(conn)
+    floor = archived_floor(conn)
+    if corte and floor and corte < floor:
+        corte = None
+    conn.execute("DROP TABLE IF EXISTS temp.conciliacion_libro")
+    conn.execute("CREATE TEMP TABLE conciliacion_libro (id_articulo INTEGER PRIMARY KEY, cantidad INTEGER)")
+    conn.execute(f'''
+    INSERT INTO temp.conciliacion_libro (id_articulo, cantidad)
+    SELECT id_articulo, SUM(delta) FROM (
+        SELECT id_articulo, cantidad AS delta FROM stock_snapshot
+        WHERE fecha_corte = :corte AND id_ubicacion = {TODAS_LAS_UBICACIONES}
+        UNION ALL
+        SELECT id_articulo, {DELTA_SQL} FROM movimientos
+        WHERE :corte IS NULL OR fecha_movimiento >= :desde OR fecha_movimiento IS NULL
+    )
+    GROUP BY id_articulo
+    ''', {'corte': corte, 'desde': _end_of_day(corte) if corte else ''})
+    drift = conn.execute('''
+    SELECT l.id_articulo, l.cantidad, COALESCE(s.cantidad, 0)
+    FROM temp.conciliacion_libro l
+    LEFT JOIN stock s ON s.id_articulo = l.id_articulo
+    WHERE l.cantidad != COALESCE(s.cantidad, 0)
+    UNION ALL
+    SELECT s.id_articulo, 0, s.cantidad
+    FROM stock s
+    WHERE s.cantidad != 0
+      AND NOT EXISTS (SELECT 1 FROM temp.conciliacion_libro l WHERE l.id_articulo = s.id_articulo)
+    ORDER BY 1
+    ''').fetchall()
+    conn.execute("DROP TABLE temp.conciliacion_libro")
+    if drift:
+        logger.warning(f"Stock reconciliation: {len(drift)} articles differ from the movement ledger")
+    else:
+        logger.info("Stock reconciliation: stock matches the movement ledger")
+    return drift
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stock ledger snapshots, point-in-time queries and reconciliation")
+    parser.add_argument('--db', default='gestion_patrimonial.db')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    snapshot = commands.add_parser('snapshot', help="compact the ledger into a snapshot")
+    snapshot.add_argument('--date', default=None, help="cut date (YYYY-MM-DD, default today)")
+    snapshot.add_argument('--keep', type=int, default=None, help="keep only the N most recent cuts")
+
+    at = commands.add_parser('at', help="stock of one article at a date")
+    at.add_argument('articulo', type=int)
+    at.add_argument('date')
+    at.add_argument('--ubicacion', type=int, default=TODAS_LAS_UBICACIONES)
+    at.add_argument('--until', default=None, help="print a daily series up to this date")
+
+    check = commands.add_parser('reconcile', help="compare the ledger with the stock table")
+    check.add_argument('--full', action='store_true', help="sum the whole ledger instead of using snapshots")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db_manager = DatabaseManager(args.db)
+    try:
+        if args.command == 'snapshot':
+            with db_manager.transaction() as conn:
+                ensure_installed(conn)
+                build_snapshot(conn, args.date)
+                if args.keep:
+                    prune_snapshots(conn, args.keep)
+        elif args.command == 'at':
+            with db_manager.reader() as conn:
+                if args.until:
+                    for day, quantity in stock_series(conn, args.articulo, args.date, args.until, args.ubicacion):
+                        print(f"{day}\t{quantity}")
+                else:
+                    print(stock_at(conn, args.articulo, args.date, args.ubicacion))
+        else:
+            with db_manager.writer() as conn:
+                drift = reconcile(conn, full=args.full)
+            for id_articulo, ledger, stock in drift:
+                print(f"articulo {id_articulo}: ledger {ledger}, stock {stock}, difference {stock - ledger}")
+            print("Stock matches the ledger" if not drift else f"{len(drift)} articles differ")
+    finally:
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
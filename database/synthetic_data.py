@@ -0,0 +1,459 @@
+"""Seeded generator of production-scale synthetic data.
+
+Builds a new database from the shipped schema (``gestion_empresa.db`` by
+default, migrated to the latest version) and fills it with reproducible data:
+at ``--scale 1`` that is 1M articles, 5M stock movements, 200k equipment
+assignments, 100k maintenance records and 100k transfers, plus the reference
+data, serial/patrimony numbers, specifications and depreciation they need.
+
+Triggers and secondary indexes of the filled tables are dropped while loading
+and recreated afterwards; stock, the inventory aggregates and the search index
+are then rebuilt in bulk, so the result is consistent with what the triggers
+would have produced.
+
+Usage (from the repository root):
+
+    python -m database.synthetic_data --db datos_prueba.db --scale 0.05 --seed 42
+"""
+import argparse
+import logging
+import os
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+from database import aggregates
+from database import migrations
+from database import search
+
+logger = logging.getLogger(__name__)
+
+VOLUMES = {
+    'articulos': 1000000,
+    'movimientos': 5000000,
+    'asignaciones': 200000,
+    'mantenimientos': 100000,
+    'transferencias': 100000,
+    'cambios_estado': 100000,
+    'agentes': 20000,
+    'proveedores': 2000,
+    'clientes': 5000,
+}
+
+FAMILIES = {
+    'Informática': ['Notebooks', 'Computadoras de escritorio', 'Monitores', 'Impresoras', 'Servidores'],
+    'Redes': ['Switches', 'Routers', 'Access points'],
+    'Telefonía': ['Teléfonos IP', 'Celulares'],
+    'Mobiliario': ['Escritorios', 'Sillas', 'Armarios'],
+    'Insumos': ['Tóner', 'Papel', 'Cables', 'Memorias USB'],
+}
+
+# Consumables move a lot and are not fixed assets
+CONSUMABLE_FAMILIES = {'Insumos'}
+
+BRANDS = ['HP', 'Dell', 'Lenovo', 'Samsung', 'LG', 'Cisco', 'TP-Link', 'Epson', 'Brother', 'Logitech',
+          'Kingston', 'Motorola', 'Asus', 'Acer', 'Ubiquiti', 'Mikrotik', 'Xerox', 'Philips', 'AOC', 'Genérica']
+
+SPECIFICATIONS = [
+    ('Memoria RAM (GB)', 'numero', [4, 8, 16, 32, 64]),
+    ('Almacenamiento (GB)', 'numero', [128, 256, 512, 1000, 2000]),
+    ('Procesador', 'texto', ['Intel Core i3', 'Intel Core i5', 'Intel Core i7', 'AMD Ryzen 5', 'AMD Ryzen 7']),
+    ('Pantalla (pulgadas)', 'numero', [13.3, 14, 15.6, 21.5, 24, 27]),
+]
+
+FIRST_NAMES = ['Ana', 'Juan', 'María', 'Carlos', 'Lucía', 'Diego', 'Sofía', 'Martín', 'Valeria', 'Pablo',
+               'Camila', 'Jorge', 'Florencia', 'Andrés', 'Julieta', 'Ricardo', 'Paula', 'Hernán']
+LAST_NAMES = ['González', 'Rodríguez', 'Gómez', 'Fernández', 'López', 'Díaz', 'Martínez', 'Pérez',
+              'García', 'Sánchez', 'Romero', 'Sosa', 'Torres', 'Álvarez', 'Ruiz', 'Ramírez']
+ROLES = ['Administrador', 'Gestor de Inventario', 'Consulta', 'Técnico']
+
+# Tables whose triggers and secondary indexes are dropped while loading
+BULK_TABLES = (
+    'articulos', 'movimientos', 'stock', 'stock_minimo', 'numeros_serie', 'numeros_patrimonio',
+    'equipo_asignado', 'mantenimiento', 'transferencias', 'historial_estado', 'depreciacion',
+    'articulo_especificacion', 'agentes', 'proveedores', 'agente_departamento',
+)
+
+FIRST_DAY = date(2018, 1, 1)
+LAST_DAY = date(2025, 12, 31)
+
+
+def scaled_volumes(scale):
+    return {name: max(1, int(count * scale)) for name, count in VOLUMES.items()}
+
+
+class SyntheticDataGenerator:
+    """Fill an already migrated database with reproducible synthetic data."""
+
+    def __init__(self, conn, scale=1.0, seed=42, batch_size=50000):
+        self.conn = conn
+        self.volumes = scaled_volumes(scale)
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.counts = {}
+        days = (LAST_DAY - FIRST_DAY).days + 1
+        self.days = [(FIRST_DAY + timedelta(days=offset)).isoformat() for offset in range(days)]
+
+    # -- helpers ---------------------------------------------------------
+
+    def _next_id(self, table, column):
+        return (self.conn.execute(f"SELECT COALESCE(MAX({column}), 0) FROM {table}").fetchone()[0]) + 1
+
+    def _insert(self, table, columns, rows):
+        """executemany ``rows`` (any iterable) in committed batches; returns the row count."""
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        total = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._flush(sql, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            self._flush(sql, batch)
+            total += len(batch)
+        self.counts[table] = self.counts.get(table, 0) + total
+        logger.info(f"{table}: {total} rows")
+        return total
+
+    def _flush(self, sql, batch):
+        self.conn.execute("BEGIN")
+        self.conn.executemany(sql, batch)
+        self.conn.execute("COMMIT")
+
+    def _random_day(self):
+        return self.rng.choice(self.days)
+
+    def _person(self):
+        return f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+
+    def _drop_bulk_ddl(self):
+        placeholders = ', '.join('?' * len(BULK_TABLES))
+        ddl = self.conn.execute(
+            f"SELECT type, name, sql FROM sqlite_master WHERE type IN ('index', 'trigger') "
+            f"AND sql IS NOT NULL AND tbl_name IN ({placeholders})",
+            BULK_TABLES,
+        ).fetchall()
+        self.conn.execute("BEGIN")
+        for object_type, name, _ in ddl:
+            self.conn.execute(f"DROP {object_type.upper()} IF EXISTS {name}")
+        self.conn.execute("COMMIT")
+        logger.info(f"Dropped {len(ddl)} indexes/triggers for loading")
+        return ddl
+
+    def _restore_ddl(self, ddl):
+        start = time.perf_counter()
+        self.conn.execute("BEGIN")
+        # Indexes first so the triggers' lookups are never planned against missing indexes
+        for object_type, name, sql in sorted(ddl, key=lambda item: item[0] != 'index'):
+            self.conn.execute(sql)
+        self.conn.execute("COMMIT")
+        logger.info(f"Recreated {len(ddl)} indexes/triggers in {time.perf_counter() - start:.1f} s")
+
+    # -- reference data --------------------------------------------------
+
+    def reference_data(self):
+        rng = self.rng
+        self.conn.execute("BEGIN")
+        self.subfamilies = []  # (id_subfamilia, family name, subfamily name)
+        for family, subfamilies in FAMILIES.items():
+            family_id = self.conn.execute(
+                "INSERT INTO familia (nombre_familia) VALUES (?)", (family,)
+            ).lastrowid
+            for subfamily in subfamilies:
+                subfamily_id = self.conn.execute(
+                    "INSERT INTO subfamilia (id_familia, nombre_subfamilia) VALUES (?, ?)",
+                    (family_id, subfamily),
+                ).lastrowid
+                self.subfamilies.append((subfamily_id, family, subfamily))
+        self.brands = [
+            self.conn.execute("INSERT INTO marcas (nombre_marca) VALUES (?)", (brand,)).lastrowid
+            for brand in BRANDS
+        ]
+        self.departments = [
+            self.conn.execute(
+                "INSERT INTO departamentos (nombre_departamento, responsable) VALUES (?, ?)",
+                (f"Departamento {number:02d}", self._person()),
+            ).lastrowid
+            for number in range(1, 41)
+        ]
+        self.locations = [
+            self.conn.execute(
+                "INSERT INTO ubicacion (nombre_ubicacion, edificio, piso, area) VALUES (?, ?, ?, ?)",
+                (f"Depósito {number:03d}", f"Edificio {number % 5 + 1}", str(number % 8), f"Área {number % 12}"),
+            ).lastrowid
+            for number in range(1, 101)
+        ]
+        self.users = [
+            self.conn.execute(
+                "INSERT INTO usuarios (nombre_usuario, nombre_completo, email, password_hash, rol, fecha_creacion) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (f"sintetico{number:03d}", self._person(), f"usuario{number}@example.com", 'x',
+                 ROLES[number % len(ROLES)], self.days[0]),
+            ).lastrowid
+            for number in range(1, 51)
+        ]
+        self.specifications = [
+            (self.conn.execute(
+                "INSERT INTO especificaciones (nombre_especificacion, tipo_dato) VALUES (?, ?)", (name, kind)
+            ).lastrowid, values)
+            for name, kind, values in SPECIFICATIONS
+        ]
+        self.states = dict(self.conn.execute("SELECT nombre_estado, id_estado FROM estados_articulo"))
+        self.conn.execute("COMMIT")
+
+        first = self._next_id('proveedores', 'id_proveedor')
+        self._insert('proveedores', ('id_proveedor', 'nombre_proveedor', 'contacto', 'telefono', 'email'), (
+            (first + n, f"Proveedor {n + 1:05d} S.A.", self._person(), f"11-{rng.randint(4000, 6999)}-{n % 10000:04d}",
+             f"ventas{n + 1}@proveedor.example.com")
+            for n in range(self.volumes['proveedores'])
+        ))
+        self.suppliers = range(first, first + self.volumes['proveedores'])
+
+        first = self._next_id('clientes', 'id_cliente')
+        self._insert('clientes', ('id_cliente', 'nombre_cliente'), (
+            (first + n, f"Cliente {n + 1:05d}") for n in range(self.volumes['clientes'])
+        ))
+        self.clients = range(first, first + self.volumes['clientes'])
+
+        first = self._next_id('agentes', 'id_agente')
+        count = self.volumes['agentes']
+        self._insert('agentes', ('id_agente', 'nombre_agente', 'email', 'cuit', 'cargo', 'fecha_ingreso'), (
+            (first + n, self._person(), f"agente{n + 1}@example.com", f"20-{30000000 + n}-{n % 10}",
+             rng.choice(['Analista', 'Técnico', 'Administrativo', 'Jefe de área', 'Director']), self._random_day())
+            for n in range(count)
+        ))
+        self.agents = range(first, first + count)
+        self._insert('agente_departamento', ('id_agente', 'id_departamento', 'fecha_asignacion', 'es_principal'), (
+            (agent, rng.choice(self.departments), self._random_day(), 1) for agent in self.agents
+        ))
+
+    # -- articles and their codes ----------------------------------------
+
+    def articles(self):
+        rng = self.rng
+        count = self.volumes['articulos']
+        first = self._next_id('articulos', 'id_articulo')
+        self.article_ids = range(first, first + count)
+        self.fixed_assets = []
+        self.consumables = []
+        states = [self.states.get(name) for name in ('Nuevo', 'En uso', 'En uso', 'En uso', 'Obsoleto')]
+
+        def rows():
+            for n in range(count):
+                id_articulo = first + n
+                subfamily_id, family, subfamily = rng.choice(self.subfamilies)
+                fixed = family not in CONSUMABLE_FAMILIES
+                (self.fixed_assets if fixed else self.consumables).append(id_articulo)
+                price = round(rng.uniform(5, 80) if not fixed else rng.lognormvariate(6.5, 1.0), 2)
+                yield (
+                    id_articulo, subfamily_id, rng.choice(self.brands), rng.choice(self.suppliers),
+                    f"{subfamily[:-1] if subfamily.endswith('s') else subfamily} modelo {rng.randint(100, 9999)}",
+                    f"{family} / {subfamily}", price, round(price * 1.3, 2),
+                    rng.choice(states), f"M-{rng.randint(1000, 99999)}", rng.randint(2012, 2025),
+                    rng.choice([0, 12, 24, 36]), self._random_day(), 1 if fixed else 0,
+                )
+
+        self._insert('articulos', (
+            'id_articulo', 'id_subfamilia', 'id_marca', 'id_proveedor', 'nombre_articulo', 'descripcion',
+            'precio_compra', 'precio_venta', 'id_estado', 'modelo', 'anio_fabricacion', 'garantia_meses',
+            'fecha_compra', 'es_activo_fijo',
+        ), rows())
+
+        self._insert('numeros_serie', ('id_articulo', 'numero_serie'), (
+            (id_articulo, f"SN{id_articulo:09d}{rng.choice('ABCDEFGHJK')}") for id_articulo in self.fixed_assets
+        ))
+        first_patrimony = self._next_id('numeros_patrimonio', 'id_numero_patrimonio')
+        self._insert('numeros_patrimonio', ('id_articulo', 'numero_patrimonio', 'ubicacion', 'estado'), (
+            (id_articulo, f"PAT-{first_patrimony + n:08d}", f"Depósito {rng.randint(1, 100):03d}", 'Activo')
+            for n, id_articulo in enumerate(self.fixed_assets)
+        ))
+        self._insert('depreciacion', (
+            'id_articulo', 'valor_inicial', 'metodo_depreciacion', 'vida_util', 'fecha_inicio', 'valor_residual',
+        ), (
+            (id_articulo, round(rng.lognormvariate(6.5, 1.0), 2), rng.choice(['lineal', 'saldo decreciente']),
+             rng.choice([3, 5, 10]), self._random_day(), 0)
+            for id_articulo in self.fixed_assets
+        ))
+
+        computers = {subfamily_id for subfamily_id, family, _ in self.subfamilies if family == 'Informática'}
+        computer_articles = [row[0] for row in self.conn.execute(
+            f"SELECT id_articulo FROM articulos WHERE id_articulo >= ? "
+            f"AND id_subfamilia IN ({', '.join(str(s) for s in computers)})", (first,)
+        )]
+        self._insert('articulo_especificacion', ('id_articulo', 'id_especificacion', 'valor', 'fecha_registro'), (
+            (id_articulo, spec_id, str(rng.choice(values)), self.days[-1])
+            for id_articulo in computer_articles
+            for spec_id, values in self.specifications
+        ))
+
+    # -- ledger ----------------------------------------------------------
+
+    def movements(self):
+        """Movements in date order; an exit never takes an article below zero."""
+        rng = self.rng
+        count = self.volumes['movimientos']
+        first_article = self.article_ids[0]
+        balances = [0] * len(self.article_ids)
+        # Most traffic goes to consumables and to a hot fifth of the catalogue
+        hot = self.consumables or list(self.article_ids)
+        hot = hot[:max(1, len(hot) // 5)] if len(hot) > 5 else hot
+        all_articles = self.article_ids
+        days = self.days
+        locations = self.locations
+        users = self.users
+        clients = self.clients
+
+        def rows():
+            for n in range(count):
+                id_articulo = rng.choice(hot) if rng.random() < 0.8 else rng.choice(all_articles)
+                index = id_articulo - first_article
+                balance = balances[index]
+                if balance == 0 or rng.random() < 0.55:
+                    quantity = rng.randint(1, 50)
+                    balances[index] = balance + quantity
+                    kind, client = 'entrada', None
+                else:
+                    quantity = rng.randint(1, min(balance, 10))
+                    balances[index] = balance - quantity
+                    kind, client = 'salida', rng.choice(clients)
+                yield (id_articulo, client, quantity, kind, days[n * len(days) // count],
+                       rng.choice(users), rng.choice(locations))
+
+        self._insert('movimientos', (
+            'id_articulo', 'id_cliente', 'cantidad', 'tipo_movimiento', 'fecha_movimiento', 'id_usuario', 'id_ubicacion',
+        ), rows())
+
+        # Same result as update_stock_after_movement applied row by row
+        self.conn.execute("BEGIN")
+        self.conn.execute("DELETE FROM stock WHERE id_articulo >= ?", (first_article,))
+        self.conn.execute('''
+        INSERT INTO stock (id_articulo, cantidad, fecha_ultimo_movimiento)
+        SELECT id_articulo,
+               SUM(CASE tipo_movimiento WHEN 'entrada' THEN cantidad WHEN 'salida' THEN -cantidad ELSE 0 END),
+               MAX(fecha_movimiento)
+        FROM movimientos WHERE id_articulo >= ?
+        GROUP BY id_articulo
+        ''', (first_article,))
+        self.conn.execute("COMMIT")
+        self._insert('stock_minimo', ('id_articulo', 'stock_minimo'), (
+            (id_articulo, rng.randint(5, 40)) for id_articulo in self.consumables[::3]
+        ))
+
+    # -- equipment history -----------------------------------------------
+
+    def equipment(self):
+        rng = self.rng
+        assets = self.fixed_assets or list(self.article_ids)
+        self._insert('equipo_asignado', (
+            'id_articulo', 'id_agente', 'fecha_asignacion', 'fecha_devolucion', 'estado', 'observaciones',
+            'id_usuario_asignacion',
+        ), (
+            (rng.choice(assets), rng.choice(self.agents), day, returned, 'Devuelto' if returned else 'Asignado',
+             rng.choice([None, 'Entrega con cargador', 'Reasignación', 'Alta de puesto']), rng.choice(self.users))
+            for day, returned in (
+                (self._random_day(), self._random_day() if rng.random() < 0.4 else None)
+                for _ in range(self.volumes['asignaciones'])
+            )
+        ))
+        self._insert('mantenimiento', (
+            'id_articulo', 'fecha_inicio', 'fecha_fin', 'tipo_mantenimiento', 'descripcion', 'costo', 'responsable',
+            'estado', 'id_usuario_registro',
+        ), (
+            (rng.choice(assets), day, None if in_progress else day,
+             rng.choice(['Preventivo', 'Correctivo']), rng.choice(['Limpieza', 'Cambio de disco', 'Reparación de fuente',
+                                                                 'Actualización de firmware', 'Cambio de batería']),
+             round(rng.uniform(0, 500), 2), self._person(), 'En Proceso' if in_progress else 'Completado',
+             rng.choice(self.users))
+            for day, in_progress in (
+                (self._random_day(), rng.random() < 0.05) for _ in range(self.volumes['mantenimientos'])
+            )
+        ))
+        self._insert('transferencias', (
+            'id_articulo', 'agente_origen', 'agente_destino', 'departamento_origen', 'departamento_destino',
+            'fecha_transferencia', 'motivo', 'autorizado_por', 'estado_transferencia',
+        ), (
+            (rng.choice(assets), rng.choice(self.agents), rng.choice(self.agents), rng.choice(self.departments),
+             rng.choice(self.departments), self._random_day(), rng.choice(['Reasignación', 'Mudanza', 'Préstamo']),
+             rng.choice(self.users), rng.choice(['Completada', 'Completada', 'Pendiente']))
+            for _ in range(self.volumes['transferencias'])
+        ))
+        state_names = list(self.states)
+        self._insert('historial_estado', ('id_articulo', 'estado_anterior', 'estado_nuevo', 'fecha_cambio', 'usuario'), (
+            (rng.choice(assets), previous, rng.choice([s for s in state_names if s != previous]),
+             self._random_day(), str(rng.choice(self.users)))
+            for previous in (rng.choice(state_names) for _ in range(self.volumes['cambios_estado']))
+        ))
+
+    def generate(self):
+        """Generate everything; returns ``{table: rows inserted}``."""
+        start = time.perf_counter()
+        ddl = self._drop_bulk_ddl()
+        try:
+            self.reference_data()
+            self.articles()
+            self.movements()
+            self.equipment()
+        finally:
+            self._restore_ddl(ddl)
+
+        self.conn.execute("BEGIN")
+        if aggregates.is_installed(self.conn):
+            aggregates.rebuild(self.conn)
+        if search.is_installed(self.conn):
+            search.rebuild(self.conn)
+        self.conn.execute("COMMIT")
+        self.conn.execute("ANALYZE")
+        logger.info(f"Synthetic data generated in {time.perf_counter() - start:.1f} s")
+        return self.counts
+
+
+def create_database(db_path, template='gestion_empresa.db', scale=1.0, seed=42, overwrite=False):
+    """Create ``db_path`` from ``template``'s schema, migrate it and fill it; returns the row counts."""
+    if os.path.exists(db_path):
+        if not overwrite:
+            raise FileExistsError(f"{db_path} already exists")
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    source = sqlite3.connect(template)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        source.backup(conn)
+    finally:
+        source.close()
+
+    try:
+        conn.execute("PRAGMA foreign_keys=OFF")
+        migrations.migrate(conn)
+        # A throwaway database: durability while loading buys nothing
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA cache_size=-262144")
+        counts = SyntheticDataGenerator(conn, scale=scale, seed=seed).generate()
+        conn.execute("PRAGMA journal_mode=WAL")
+        return counts
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic production-scale database")
+    parser.add_argument('--db', default='datos_sinteticos.db', help="database to create")
+    parser.add_argument('--template', default='gestion_empresa.db', help="database whose schema is copied")
+    parser.add_argument('--scale', type=float, default=1.0, help="1.0 = 1M articles, 5M movements")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help="overwrite --db if it exists")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    counts = create_database(args.db, args.template, args.scale, args.seed, args.force)
+    for table, count in counts.items():
+        print(f"{table:<28} {count:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,49 @@
 import os
+import sys
+import time
+import importlib
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
 import logging
-from datetime import datetime
-import sqlite3
 
 # Import database modules
-from database.setup_database import setup_database
+from database import migrations
 from database.database_manager import DatabaseManager
+from database.data_source import KeysetDataSource
+from database.event_bus import EventBus
+from database.history_service import HistoryService
+from database.query_executor import AsyncQueryExecutor
+from database.query_profiler import QueryProfiler
+from database.archive import MaintenanceScheduler
+from database.reference_cache import ReferenceCache
+from database.spec_index import SpecSearch
+from app_logging import QueryLogSampler, setup_logging
 
 # Import UI modules
-from ui.categories_tab import create_categories_tab
-from ui.families_tab import create_families_tab
-from ui.subfamilies_tab import create_subfamilies_tab
-from ui.articles_tab import create_articles_tab
-from ui.patrimony_tab import create_patrimony_tab
-from ui.agents_tab import create_agents_tab
-from ui.brands_tab import create_brands_tab
-from ui.suppliers_tab import create_suppliers_tab
-from ui.stock_tab import create_stock_tab
-from ui.serial_numbers_tab import create_serial_numbers_tab
+from ui.lazy_treeview import LazyTreeview
+from ui.global_search import create_global_search
+
+# Tab modules are imported the first time their tab is shown:
+# (module, builder function, tab label)
+TAB_BUILDERS = [
+    ("ui.categories_tab", "create_categories_tab", "Categorías"),
+    ("ui.families_tab", "create_families_tab", "Familias"),
+    ("ui.subfamilies_tab", "create_subfamilies_tab", "Subfamilias"),
+    ("ui.articles_tab", "create_articles_tab", "Artículos"),
+    ("ui.patrimony_tab", "create_patrimony_tab", "Patrimonio"),
+    ("ui.agents_tab", "create_agents_tab", "Agentes"),
+    ("ui.brands_tab", "create_brands_tab", "Marcas"),
+    ("ui.suppliers_tab", "create_suppliers_tab", "Proveedores"),
+    ("ui.stock_tab", "create_stock_tab", "Stock"),
+    ("ui.serial_numbers_tab", "create_serial_numbers_tab", "Números de Serie"),
+    ("ui.diagnostics_tab", "create_diagnostics_tab", "Diagnóstico"),
+]
 
 class GestionPatrimonialApp:
-    def __init__(self, root):
+    def __init__(self, root, diagnostics=False, lazy_tabs=True):
+        self.diagnostics = diagnostics
+        self.lazy_tabs = lazy_tabs
         self.root = root
         self.root.title("Sistema de Gestión Patrimonial")
         self.root.geometry("1200x700")
@@ -30,26 +51,61 @@ class GestionPatrimonialApp:
         # Set up logging with more detailed configuration
         self.setup_logging()
         
-        # Setup database tables if they don't exist
+        # Initialize the connection pool (one writer, several WAL readers)
         db_path = 'gestion_patrimonial.db'  # Changed from 'gestion_empresa.db'
-        try:
-            setup_database(db_path)
-            self.logger.info("Database setup completed")
-        except Exception as e:
-            self.logger.error(f"Error setting up database: {str(e)}")
-            messagebox.showerror("Error", f"Error al configurar la base de datos: {str(e)}")
-        
-        # Initialize database connection
         self.db_manager = DatabaseManager(db_path)
         
         # Share the logger with the database manager
         self.db_manager.logger = self.logger
         
+        # Bring the schema up to date; when PRAGMA user_version is current this is one header read
+        try:
+            version = migrations.migrate_database(self.db_manager)
+            self.logger.info(f"Database schema at version {version}")
+        except Exception as e:
+            self.logger.error(f"Error setting up database: {str(e)}")
+            messagebox.showerror("Error", f"Error al configurar la base de datos: {str(e)}")
+        
         # Add enhanced debugging to DatabaseManager
         self.enhance_database_manager()
         
-        # Log database structure for debugging
-        self.log_database_structure(db_path)
+        # Background executor so slow reads never block the Tk mainloop
+        self.query_executor = AsyncQueryExecutor(db_path, self.root)
+        
+        # Per-statement latency histograms and slow-query plans for the Diagnostics tab
+        self.query_profiler = QueryProfiler(db_path)
+        self.query_profiler.attach(self.db_manager, self.query_executor)
+        
+        # Audit rows and low-stock alerts (published or change-logged) are batched by a background writer
+        self.event_bus = EventBus(self.db_manager)
+        
+        # Paged per-article timelines; cached articles are dropped when the bus reports new events
+        self.history_service = HistoryService(self.db_manager)
+        self.history_service.attach(self.event_bus)
+        
+        # Id <-> name dictionaries for comboboxes and for rendering names without joins
+        self.reference_cache = ReferenceCache(db_path)
+        self.reference_cache.attach(self.db_manager)
+        
+        # Faceted specification filters; the index is built on first use and when specs change
+        self.spec_search = SpecSearch(self.db_manager)
+        
+        # Hourly incremental vacuum, so space freed by archiving goes back to the OS
+        self.maintenance = MaintenanceScheduler(self.db_manager).start()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Log database structure for debugging (off the Tk thread, only when asked for)
+        if self.diagnostics:
+            threading.Thread(target=self.log_database_structure, args=(db_path,), daemon=True).start()
+        
+        # Menu bar
+        self.menu_bar = tk.Menu(self.root)
+        file_menu = tk.Menu(self.menu_bar, tearoff=0)
+        file_menu.add_command(label="Importar datos...", command=self.open_import_dialog)
+        file_menu.add_separator()
+        file_menu.add_command(label="Salir", command=self.on_close)
+        self.menu_bar.add_cascade(label="Archivo", menu=file_menu)
+        self.root.config(menu=self.menu_bar)
         
         # Create main frame
         self.main_frame = tk.Frame(self.root)
@@ -61,102 +117,91 @@ class GestionPatrimonialApp:
         self.status_bar = tk.Label(self.root, textvariable=self.status_var, bd=1, relief=tk.SUNKEN, anchor=tk.W)
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
         
+        # Global search box above the tabs
+        create_global_search(self, self.main_frame)
+        
         # Create notebook (tabs)
         self.notebook = ttk.Notebook(self.main_frame)
         self.notebook.pack(fill=tk.BOTH, expand=True)
         
-        # Create tabs with enhanced error handling
-        try:
-            self.logger.info("Creating categories tab")
-            create_categories_tab(self)
-            
-            self.logger.info("Creating families tab")
-            create_families_tab(self)
-            
-            self.logger.info("Creating subfamilies tab")
-            create_subfamilies_tab(self)
-            
-            self.logger.info("Creating articles tab")
-            create_articles_tab(self)
-            
-            self.logger.info("Creating patrimony tab")
-            create_patrimony_tab(self)
-            
-            self.logger.info("Creating agents tab")
-            create_agents_tab(self)
-            
-            self.logger.info("Creating brands tab")
-            create_brands_tab(self)
-            
-            self.logger.info("Creating suppliers tab")
-            create_suppliers_tab(self)
-            
-            self.logger.info("Creating stock tab")
-            create_stock_tab(self)
-            
-            self.logger.info("Creating serial numbers tab")
-            create_serial_numbers_tab(self)
-            
-        except Exception as e:
-            self.logger.error(f"Error creating tabs: {str(e)}", exc_info=True)
-            messagebox.showerror("Error", f"Error al crear pestañas: {str(e)}")
+        # Lazy treeviews registered by the tabs, keyed by tree attribute name
+        self.lazy_views = {}
         
-        # In the __init__ method, after creating all tabs:
+        # Create tabs: placeholders now, real content when first selected
+        self.pending_tabs = {}
+        self.create_tabs()
         
         # Debug treeviews after 1 second
-        self.root.after(1000, self.debug_treeviews)
+        if self.diagnostics:
+            self.root.after(1000, self.debug_treeviews)
         
         self.logger.info("Application started")
     
+    def create_tabs(self):
+        """Add one tab per TAB_BUILDERS entry, building it now or on first selection."""
+        for module_name, builder_name, label in TAB_BUILDERS:
+            if self.lazy_tabs:
+                placeholder = ttk.Frame(self.notebook)
+                self.notebook.add(placeholder, text=label)
+                self.pending_tabs[str(placeholder)] = (placeholder, module_name, builder_name, label)
+            else:
+                self.build_tab(module_name, builder_name, label)
+        if self.lazy_tabs:
+            self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+            # The first tab was selected while it was added, possibly before the binding
+            self.root.after_idle(self.on_tab_changed)
+    
+    def on_tab_changed(self, event=None):
+        """Build the selected tab the first time it is shown."""
+        pending = self.pending_tabs.pop(self.notebook.select(), None)
+        if pending:
+            placeholder, module_name, builder_name, label = pending
+            self.status_var.set(f"Cargando {label}...")
+            # Let the tab header paint before the builder runs
+            self.root.after_idle(lambda: self.build_tab(module_name, builder_name, label, placeholder))
+    
+    def build_tab(self, module_name, builder_name, label, placeholder=None):
+        """Import and run a tab builder; the new tab takes the placeholder's position."""
+        try:
+            self.logger.info(f"Creating {label} tab")
+            start = time.perf_counter()
+            builder = getattr(importlib.import_module(module_name), builder_name)
+            existing_tabs = set(self.notebook.tabs())
+            builder(self)
+            new_tabs = [tab for tab in self.notebook.tabs() if tab not in existing_tabs]
+            if placeholder is not None and new_tabs:
+                self.notebook.insert(self.notebook.index(placeholder), new_tabs[0])
+                self.notebook.forget(placeholder)
+                placeholder.destroy()
+                self.notebook.select(new_tabs[0])
+            self.logger.info(f"{label} tab built in {(time.perf_counter() - start) * 1000:.0f} ms")
+            self.status_var.set("Listo")
+        except Exception as e:
+            self.logger.error(f"Error creating tabs: {str(e)}", exc_info=True)
+            messagebox.showerror("Error", f"Error al crear pestañas: {str(e)}")
+    
+    def open_import_dialog(self):
+        """Open the bulk import dialog (imported on first use)."""
+        from ui.import_dialog import open_import_dialog
+        open_import_dialog(self)
+    
     def setup_logging(self):
-        """Set up logging configuration with more detailed settings."""
-        # Create logs directory if it doesn't exist
-        if not os.path.exists('logs'):
-            os.makedirs('logs')
-        
-        # Set up logger
+        """Send all logging through the queued, rotating pipeline in app_logging."""
+        # INFO by default, DEBUG in diagnostics mode; GESTION_LOG_LEVEL overrides both
+        default_level = 'DEBUG' if self.diagnostics else 'INFO'
+        level = getattr(logging, os.environ.get("GESTION_LOG_LEVEL", default_level).upper(), logging.INFO)
+        self.log_listener = setup_logging(
+            log_dir='logs',
+            level=level,
+            json_lines=os.environ.get("GESTION_LOG_JSON") == "1",
+        )
         self.logger = logging.getLogger('gestion_patrimonial')
-        self.logger.setLevel(logging.DEBUG)  # Changed to DEBUG for more detailed logs
-        
-        # Create file handler
-        log_file = f"logs/app_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setLevel(logging.DEBUG)  # Changed to DEBUG
-        
-        # Create formatter with more details
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s')
-        file_handler.setFormatter(formatter)
-        
-        # Add handler to logger
-        self.logger.addHandler(file_handler)
-        
-        # Add console handler for immediate feedback
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.DEBUG)
-        console_handler.setFormatter(formatter)
-        self.logger.addHandler(console_handler)
     
     def enhance_database_manager(self):
         """Add enhanced debugging to DatabaseManager."""
-        original_execute_query = self.db_manager.execute_query
-        
-        def enhanced_execute_query(self, query, params=None, is_select=True):
-            """Enhanced execute_query with better error reporting."""
-            try:
-                self.logger.debug(f"Executing query: {query}")
-                if params:
-                    self.logger.debug(f"With parameters: {params}")
-                result = original_execute_query(query, params, is_select)
-                if result is None and is_select:
-                    self.logger.warning("Query returned None result")
-                return result
-            except Exception as e:
-                self.logger.error(f"Error in execute_query: {str(e)}", exc_info=True)
-                raise
-        
-        # Replace the method
-        import types
-        self.db_manager.execute_query = types.MethodType(enhanced_execute_query, self.db_manager)
+        # Errors and slow queries are always reported (rate-limited); other queries are sampled at DEBUG
+        self.query_log = QueryLogSampler(self.logger.getChild('sql'))
+        self.db_manager.add_query_hook(self.query_log)
     
     def add_delete_record_method(self):
         """Add delete_record method to DatabaseManager if it doesn't exist."""
@@ -175,74 +220,105 @@ class GestionPatrimonialApp:
             import types
             self.db_manager.delete_record = types.MethodType(delete_record, self.db_manager)
     
+    def attach_lazy_treeview(self, name, tree, table, key_column, columns, where=None, params=()):
+        """Back a tab's treeview with keyset-paginated windows instead of a full-table load."""
+        data_source = KeysetDataSource(self.db_manager, table, key_column, columns, where, params)
+        lazy_view = LazyTreeview(
+            tree,
+            data_source,
+            on_count=lambda count: self.status_var.set(f"{count} registros"),
+        )
+        self.lazy_views[name] = lazy_view
+        lazy_view.reload()
+        return lazy_view
+    
     def log_database_structure(self, db_path):
         """Log the structure of all database tables for debugging."""
         try:
-            conn = sqlite3.connect(db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            # Get list of all tables
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = cursor.fetchall()
-            
-            if not tables:
-                self.logger.error("No tables found in the database!")
-            
-            for table in tables:
-                table_name = table[0]
-                cursor.execute(f"PRAGMA table_info({table_name})")
-                columns = cursor.fetchall()
-                column_names = [col[1] for col in columns]
-                self.logger.info(f"Table: {table_name}, Columns: {column_names}")
+            with self.db_manager.reader() as conn:
+                cursor = conn.cursor()
                 
-                # Count records in each table
-                cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-                count = cursor.fetchone()[0]
-                self.logger.info(f"Table {table_name} has {count} records")
-            
-            conn.close()
+                # Get list of all tables
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+                tables = cursor.fetchall()
+                
+                if not tables:
+                    self.logger.error("No tables found in the database!")
+                
+                for table in tables:
+                    table_name = table[0]
+                    cursor.execute(f"PRAGMA table_info({table_name})")
+                    columns = cursor.fetchall()
+                    column_names = [col[1] for col in columns]
+                    self.logger.info("Table: %s, Columns: %s", table_name, column_names)
+                    
+                    # Count records in each table
+                    cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+                    count = cursor.fetchone()[0]
+                    self.logger.info("Table %s has %d records", table_name, count)
         except Exception as e:
             self.logger.error(f"Error logging database structure: {str(e)}")
 
+    def report_empty_treeview(self, label, table):
+        """Count a table in the background and log an error if an empty treeview hides rows."""
+        def check_count(rows):
+            if rows and rows[0][0] > 0:
+                self.logger.error(f"Database has {rows[0][0]} {label} but treeview is empty!")
+        
+        self.query_executor.submit(f"SELECT COUNT(*) FROM {table}", callback=check_count)
+    
+    def on_close(self):
+        """Stop background queries and close pooled connections before exiting."""
+        try:
+            self.query_profiler.detach()
+            self.query_executor.close()
+            self.event_bus.close()
+            self.reference_cache.close()
+            self.maintenance.stop()
+            self.db_manager.close()
+        except Exception as e:
+            self.logger.error(f"Error closing database connections: {str(e)}")
+        self.log_listener.stop()
+        self.root.destroy()
+    
     def debug_treeviews(self):
         """Debug function to check the content of all treeviews."""
         try:
             self.logger.debug("Checking all treeviews...")
             
+            # Lazy treeviews only hold a window of rows; report it against the cached total
+            for name, lazy_view in self.lazy_views.items():
+                self.logger.debug(
+                    f"{name} shows {lazy_view.loaded_count()} of {lazy_view.total_count()} rows"
+                )
+            
             # Check categories treeview
             if hasattr(self, 'categories_tree'):
                 items = self.categories_tree.get_children()
-                self.logger.debug(f"Categories treeview has {len(items)} items")
+                self.logger.debug("Categories treeview has %d items", len(items))
                 if len(items) == 0:
                     self.logger.warning("Categories treeview is empty - checking database")
-                    categories = self.db_manager.execute_query("SELECT COUNT(*) FROM categorias")
-                    if categories and categories[0][0] > 0:
-                        self.logger.error(f"Database has {categories[0][0]} categories but treeview is empty!")
+                    self.report_empty_treeview("categories", "categorias")
             else:
                 self.logger.warning("Categories treeview not found")
             
             # Check families treeview
             if hasattr(self, 'families_tree'):
                 items = self.families_tree.get_children()
-                self.logger.debug(f"Families treeview has {len(items)} items")
+                self.logger.debug("Families treeview has %d items", len(items))
                 if len(items) == 0:
                     self.logger.warning("Families treeview is empty - checking database")
-                    families = self.db_manager.execute_query("SELECT COUNT(*) FROM familias")
-                    if families and families[0][0] > 0:
-                        self.logger.error(f"Database has {families[0][0]} families but treeview is empty!")
+                    self.report_empty_treeview("families", "familias")
             else:
                 self.logger.warning("Families treeview not found")
             
             # Check subfamilies treeview
             if hasattr(self, 'subfamilies_tree'):
                 items = self.subfamilies_tree.get_children()
-                self.logger.debug(f"Subfamilies treeview has {len(items)} items")
+                self.logger.debug("Subfamilies treeview has %d items", len(items))
                 if len(items) == 0:
                     self.logger.warning("Subfamilies treeview is empty - checking database")
-                    subfamilies = self.db_manager.execute_query("SELECT COUNT(*) FROM subfamilias")
-                    if subfamilies and subfamilies[0][0] > 0:
-                        self.logger.error(f"Database has {subfamilies[0][0]} subfamilies but treeview is empty!")
+                    self.report_empty_treeview("subfamilies", "subfamilias")
             else:
                 self.logger.warning("Subfamilies treeview not found")
             
@@ -250,30 +326,29 @@ class GestionPatrimonialApp:
                 if items:
                     self.logger.debug("Subfamilies treeview items:")
                     for item in items:
-                        values = self.subfamilies_tree.item(item, 'values')
-                        self.logger.debug(f"  Item: {values}")
+                        self.logger.debug("  Item: %s", self.subfamilies_tree.item(item, 'values'))
                 else:
                     self.logger.debug("Subfamilies treeview is empty")
             
             # Check articles treeview
             if hasattr(self, 'articles_tree'):
                 items = self.articles_tree.get_children()
-                self.logger.debug(f"Articles treeview has {len(items)} items")
+                self.logger.debug("Articles treeview has %d items", len(items))
             
             # Check brands treeview
             if hasattr(self, 'brands_tree'):
                 items = self.brands_tree.get_children()
-                self.logger.debug(f"Brands treeview has {len(items)} items")
+                self.logger.debug("Brands treeview has %d items", len(items))
             
             # Check suppliers treeview
             if hasattr(self, 'suppliers_tree'):
                 items = self.suppliers_tree.get_children()
-                self.logger.debug(f"Suppliers treeview has {len(items)} items")
+                self.logger.debug("Suppliers treeview has %d items", len(items))
             
             # Check agents treeview
             if hasattr(self, 'agents_tree'):
                 items = self.agents_tree.get_children()
-                self.logger.debug(f"Agents treeview has {len(items)} items")
+                self.logger.debug("Agents treeview has %d items", len(items))
             
         except Exception as e:
             self.logger.error(f"Error in debug_treeviews: {str(e)}", exc_info=True)
@@ -281,5 +356,6 @@ class GestionPatrimonialApp:
 # Main execution
 if __name__ == "__main__":
     root = tk.Tk()
-    app = GestionPatrimonialApp(root)
+    diagnostics = "--diagnostics" in sys.argv or os.environ.get("GESTION_DIAGNOSTICS") == "1"
+    app = GestionPatrimonialApp(root, diagnostics=diagnostics)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,82 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from database.bulk_import import BulkImporter
+from database.database_manager import DatabaseManager
+
+TABLES = (
+    "CREATE TABLE subfamilia (id_subfamilia INTEGER PRIMARY KEY, nombre_subfamilia TEXT)",
+    "CREATE TABLE marcas (id_marca INTEGER PRIMARY KEY, nombre_marca TEXT)",
+    "CREATE TABLE proveedores (id_proveedor INTEGER PRIMARY KEY, nombre_proveedor TEXT)",
+    "CREATE TABLE estados_articulo (id_estado INTEGER PRIMARY KEY, nombre_estado TEXT)",
+    '''CREATE TABLE articulos (
+        id_articulo INTEGER PRIMARY KEY,
+        id_subfamilia INTEGER REFERENCES subfamilia (id_subfamilia),
+        id_marca INTEGER REFERENCES marcas (id_marca),
+        id_proveedor INTEGER REFERENCES proveedores (id_proveedor),
+        id_estado INTEGER REFERENCES estados_articulo (id_estado),
+        nombre_articulo TEXT, descripcion TEXT, modelo TEXT, precio_compra REAL, precio_venta REAL,
+        anio_fabricacion INTEGER, garantia_meses INTEGER, fecha_compra DATE, es_activo_fijo INTEGER
+    )''',
+    "CREATE INDEX idx_articulos_nombre ON articulos (nombre_articulo)",
+    "CREATE TRIGGER articulos_sin_nombre BEFORE INSERT ON articulos WHEN NEW.nombre_articulo = '' "
+    "BEGIN SELECT RAISE(ABORT, 'nombre'); END",
+)
+
+
+class BulkImportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db_manager = DatabaseManager(os.path.join(self.tmp, 'import.db'))
+        with self.db_manager.transaction() as conn:
+            conn.execute("PRAGMA foreign_keys=ON")
+            for statement in TABLES:
+                conn.execute(statement)
+            conn.execute("INSERT INTO subfamilia VALUES (1, 'Monitores')")
+            conn.execute("INSERT INTO marcas VALUES (1, 'Acme')")
+            conn.execute("INSERT INTO proveedores VALUES (1, 'Proveedor')")
+        self.path = os.path.join(self.tmp, 'articulos.csv')
+        with open(self.path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['id_subfamilia', 'id_marca', 'id_proveedor', 'nombre_articulo'])
+            writer.writerow([1, 1, 1, 'Monitor 24'])
+            writer.writerow([999, 1, 1, 'Monitor 27'])
+
+    def tearDown(self):
+        self.db_manager.close()
+        shutil.rmtree(self.tmp)
+
+    def schema(self):
+        return sorted(row[0] for row in self.db_manager.execute_query(
+            "SELECT name FROM sqlite_master WHERE tbl_name = 'articulos' AND sql IS NOT NULL AND type != 'table'"
+        ))
+
+    def test_unknown_numeric_id_is_rejected(self):
+        stats = BulkImporter(self.db_manager, 'articulos').run(self.path)
+        self.assertEqual((stats.inserted, stats.rejected), (1, 1))
+        with open(os.path.join(self.tmp, 'articulos.rechazos.csv'), encoding='utf-8') as f:
+            self.assertEqual([row['motivo_rechazo'] for row in csv.DictReader(f)], ["Unknown id_subfamilia: 999"])
+
+    def test_resume_with_other_deferrals_keeps_dropped_indexes(self):
+        # An interrupted run that deferred the indexes; the resumed one defers the triggers
+        importer = BulkImporter(self.db_manager, 'articulos', defer_indexes=True)
+        with self.db_manager.transaction() as conn:
+            deferred = importer._deferrable_ddl(conn)
+            conn.execute("CREATE TABLE IF NOT EXISTS importaciones_progreso (clave_importacion TEXT PRIMARY KEY, "
+                         "tabla TEXT NOT NULL, archivo TEXT NOT NULL, filas_procesadas INTEGER NOT NULL DEFAULT 0, "
+                         "ddl_diferido TEXT, completada BOOLEAN NOT NULL DEFAULT 0, "
+                         "fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+            conn.execute("INSERT INTO importaciones_progreso (clave_importacion, tabla, archivo, ddl_diferido) "
+                         "VALUES (?, 'articulos', ?, ?)", (importer._job_key(self.path), self.path, json.dumps(deferred)))
+            conn.execute("DROP INDEX idx_articulos_nombre")
+        BulkImporter(self.db_manager, 'articulos', defer_triggers=True).run(self.path)
+        self.assertEqual(self.schema(), ['articulos_sin_nombre', 'idx_articulos_nombre'])
+
+
+if __name__ == '__main__':
+    unittest.main()
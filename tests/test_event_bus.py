@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from database import event_bus
+from database.database_manager import DatabaseManager
+from database.event_bus import EventBus
+
+TABLES = (
+    "CREATE TABLE articulos (id_articulo INTEGER PRIMARY KEY, nombre_articulo TEXT)",
+    "CREATE TABLE stock (id_articulo INTEGER PRIMARY KEY, cantidad INTEGER)",
+    "CREATE TABLE stock_minimo (id_articulo INTEGER PRIMARY KEY, stock_minimo INTEGER)",
+    "CREATE TABLE usuarios (id_usuario INTEGER PRIMARY KEY, rol TEXT, activo INTEGER)",
+    "CREATE TABLE notificaciones (id_notificacion INTEGER PRIMARY KEY, id_usuario INTEGER, "
+    "titulo TEXT, mensaje TEXT, tipo TEXT)",
+    "CREATE TABLE auditoria (id_auditoria INTEGER PRIMARY KEY, id_usuario INTEGER, accion TEXT, "
+    "tabla_afectada TEXT, id_registro INTEGER, datos_anteriores TEXT, datos_nuevos TEXT, "
+    "fecha_hora TIMESTAMP, ip_address TEXT)",
+    "CREATE TABLE equipo_asignado (id_asignacion INTEGER PRIMARY KEY, id_articulo INTEGER, "
+    "id_agente INTEGER, id_usuario_asignacion INTEGER)",
+)
+
+
+class ChangeLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db_manager = DatabaseManager(os.path.join(self.tmp, 'bus.db'))
+        with self.db_manager.transaction() as conn:
+            for statement in TABLES:
+                conn.execute(statement)
+            conn.execute("INSERT INTO articulos VALUES (1, 'Monitor')")
+            conn.execute("INSERT INTO stock VALUES (1, 10)")
+            conn.execute("INSERT INTO stock_minimo VALUES (1, 5)")
+            conn.executemany("INSERT INTO usuarios VALUES (?, ?, ?)", [
+                (1, 'Administrador', 1), (2, 'Gestor de Inventario', 1), (3, 'Gestor de Inventario', 0), (4, 'Agente', 1),
+            ])
+            self.assertEqual(sorted(event_bus.install(conn)), sorted(event_bus.TRIGGERS))
+        # Idle drains only after a minute: anything written before flush() came from the change log
+        self.bus = EventBus(self.db_manager, flush_interval=60)
+
+    def tearDown(self):
+        self.bus.close()
+        self.db_manager.close()
+        shutil.rmtree(self.tmp)
+
+    def count(self, table):
+        return self.db_manager.execute_query(f"SELECT COUNT(*) FROM {table}")[0][0]
+
+    def test_low_stock_is_logged_and_notified_once(self):
+        for cantidad in (4, 3, 2):
+            self.db_manager.execute_query("UPDATE stock SET cantidad = ? WHERE id_articulo = 1", (cantidad,), False)
+        self.assertEqual(self.count('notificaciones'), 0)
+        self.assertEqual(self.count(event_bus.LOG_TABLE), 3)
+        self.assertTrue(self.bus.flush(timeout=10))
+        self.assertEqual(sorted(row[0] for row in self.db_manager.execute_query(
+            "SELECT id_usuario FROM notificaciones")), [1, 2])
+        self.assertEqual(self.count(event_bus.LOG_TABLE), 0)
+
+    def test_assignment_audit_comes_from_the_log(self):
+        self.db_manager.execute_query("INSERT INTO equipo_asignado VALUES (7, 1, 3, 2)", is_select=False)
+        self.bus.publish_assignment(7, 1, 3, 2)
+        self.assertTrue(self.bus.flush(timeout=10))
+        self.assertEqual(self.db_manager.execute_query(
+            "SELECT id_usuario, accion, id_registro, datos_nuevos FROM auditoria"
+        ), [(2, 'Asignación de Equipo', 7, 'Artículo: 1, Agente: 3')])
+
+
+if __name__ == '__main__':
+    unittest.main()
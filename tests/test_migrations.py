@@ -0,0 +1,30 @@
+import unittest
+
+from database.database_manager import DatabaseManager
+from database import migrations
+
+
+class SkippedMigrationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db_manager = DatabaseManager(':memory:', readers=0)
+        migrations.migrate_database(self.db_manager)
+
+    def tearDown(self):
+        self.db_manager.close()
+
+    def test_skips_for_missing_tables_do_not_block_startup(self):
+        with self.db_manager.writer() as conn:
+            self.assertIn(9, migrations.skipped_migrations(conn))
+            self.assertTrue(migrations.is_current(conn))
+
+    def test_schema_change_makes_skips_retryable(self):
+        with self.db_manager.writer() as conn:
+            conn.execute("CREATE TABLE otra_tabla (x)")
+            self.assertFalse(migrations.is_current(conn))
+            migrations.migrate(conn)
+            self.assertTrue(migrations.is_current(conn))
+
+
+if __name__ == '__main__':
+    unittest.main()
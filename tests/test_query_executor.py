@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from database.query_executor import AsyncQueryExecutor
+
+SLOW_QUERY = '''
+WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000)
+SELECT COUNT(*) FROM c
+'''
+
+
+class AsyncQueryExecutorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'test.db')
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.executemany("INSERT INTO t VALUES (?)", ((n,) for n in range(10)))
+        conn.commit()
+        conn.close()
+        self.executor = AsyncQueryExecutor(self.db_path, max_workers=1)
+        self.deadlocked = False
+        self.slow_jobs = []
+
+    def tearDown(self):
+        if self.deadlocked:
+            # close() would block on the held lock; just free the worker
+            for job in self.slow_jobs:
+                job['conn'].interrupt()
+        else:
+            self.executor.close()
+        self.tmp.cleanup()
+
+    def start_slow_query(self, tag=None):
+        """Occupy the only worker; returns the future and the job so the test can interrupt it."""
+        future = self.executor.submit(SLOW_QUERY, tag=tag)
+        job = self.executor._inflight[(SLOW_QUERY, ())]
+        deadline = time.monotonic() + 5
+        while job['conn'] is None and time.monotonic() < deadline:
+            time.sleep(0.001)
+        self.assertIsNotNone(job['conn'], "slow query never started")
+        self.slow_jobs.append(job)
+        return future, job
+
+    def submit_in_thread(self, *args, **kwargs):
+        """Submit from another thread so a deadlock fails the test instead of hanging it."""
+        result = {}
+        thread = threading.Thread(
+            target=lambda: result.setdefault('future', self.executor.submit(*args, **kwargs)), daemon=True
+        )
+        thread.start()
+        thread.join(5)
+        self.deadlocked = thread.is_alive()
+        self.assertFalse(thread.is_alive(), "submit() deadlocked")
+        return result['future']
+
+    def test_tagged_resubmit_while_worker_busy(self):
+        _, slow = self.start_slow_query()
+        first = self.submit_in_thread("SELECT COUNT(*) FROM t", tag='search')
+        second = self.submit_in_thread("SELECT COUNT(*) FROM t WHERE x > ?", (4,), tag='search')
+        self.assertTrue(first.cancelled())
+        slow['conn'].interrupt()
+        self.assertEqual(second.result(5), [(5,)])
+
+    def test_tagged_resubmit_after_completion(self):
+        first = self.executor.submit("SELECT COUNT(*) FROM t", tag='search')
+        self.assertEqual(first.result(5), [(10,)])
+        second = self.submit_in_thread("SELECT MAX(x) FROM t", tag='search')
+        self.assertEqual(second.result(5), [(9,)])
+
+    def test_identical_queries_share_one_execution(self):
+        _, slow = self.start_slow_query()
+        first = self.executor.submit("SELECT MIN(x) FROM t")
+        second = self.executor.submit("SELECT MIN(x) FROM t")
+        self.assertEqual(len(self.executor._inflight), 2)
+        slow['conn'].interrupt()
+        self.assertEqual(first.result(5), [(0,)])
+        self.assertEqual(second.result(5), [(0,)])
+
+    def test_superseded_running_query_is_interrupted(self):
+        stale, job = self.start_slow_query(tag='search')
+        fresh = self.submit_in_thread("SELECT COUNT(*) FROM t", tag='search')
+        self.assertTrue(stale.cancelled())
+        self.assertEqual(fresh.result(5), [(10,)])
+        self.assertTrue(job['future'].done())
+
+if __name__ == '__main__':
+    unittest.main()
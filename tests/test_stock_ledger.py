@@ -0,0 +1,62 @@
+import sqlite3
+import unittest
+
+from database import stock_ledger
+
+
+class SnapshotInvalidationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.execute('''
+        CREATE TABLE movimientos (
+            id_movimiento INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_articulo INTEGER NOT NULL,
+            cantidad INTEGER NOT NULL,
+            tipo_movimiento TEXT NOT NULL,
+            fecha_movimiento DATE
+        )
+        ''')
+        stock_ledger.install(self.conn)
+        self.move(1, 10, '2025-01-15')
+        self.move(2, 10, '2025-01-15')
+        self.move(1, 5, '2025-02-15')
+        stock_ledger.build_snapshot(self.conn, '2025-01-31')
+        stock_ledger.build_snapshot(self.conn, '2025-02-28')
+
+    def tearDown(self):
+        self.conn.close()
+
+    def move(self, id_articulo, cantidad, fecha):
+        self.conn.execute(
+            "INSERT INTO movimientos (id_articulo, cantidad, tipo_movimiento, fecha_movimiento) "
+            "VALUES (?, ?, 'entrada', ?)", (id_articulo, cantidad, fecha)
+        )
+
+    def test_backdated_movements_for_several_articles(self):
+        self.move(1, 1, '2025-02-10')
+        self.move(2, 1, '2025-02-10')
+        self.assertEqual(stock_ledger.last_cut(self.conn), '2025-01-31')
+        self.assertEqual(stock_ledger.stock_at(self.conn, 1, '2025-03-15'), 16)
+        self.assertEqual(stock_ledger.stock_at(self.conn, 2, '2025-03-15'), 11)
+        self.assertEqual(stock_ledger.stock_at(self.conn, 2, '2025-02-09'), 10)
+
+    def test_invalidated_cut_leaves_no_rows(self):
+        self.move(1, 1, '2025-02-10')
+        self.assertEqual(self.conn.execute(
+            "SELECT COUNT(*) FROM stock_snapshot WHERE fecha_corte = '2025-02-28'"
+        ).fetchone()[0], 0)
+
+    def test_orphaned_rows_are_ignored_and_dropped(self):
+        # Rows left behind by the old trigger, which only deleted one article's rows
+        self.conn.execute("DELETE FROM stock_snapshot_cortes WHERE fecha_corte = '2025-02-28'")
+        self.move(2, 1, '2025-02-10')
+        self.assertEqual(stock_ledger.stock_at(self.conn, 2, '2025-03-15'), 11)
+        self.assertEqual(stock_ledger.drop_orphaned_snapshots(self.conn), 4)
+        stock_ledger.build_snapshot(self.conn, '2025-02-28')
+        self.assertEqual(stock_ledger.stock_at(self.conn, 2, '2025-03-15'), 11)
+        self.assertEqual(stock_ledger.stock_at_location(self.conn, None, '2025-03-15'), {1: 15, 2: 11})
+
+
+if __name__ == '__main__':
+    unittest.main()
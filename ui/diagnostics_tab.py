@@ -0,0 +1,144 @@
+import logging
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    ('sql', "Consulta", 420),
+    ('count', "Llamadas", 70),
+    ('total_ms', "Total ms", 80),
+    ('mean_ms', "Media ms", 80),
+    ('p95_ms', "p95 ms", 70),
+    ('max_ms', "Máx ms", 80),
+    ('errors', "Errores", 60),
+    ('full_scans', "Scans", 60),
+)
+
+ORDER_OPTIONS = {
+    "Tiempo total": 'total_ms',
+    "Tiempo máximo": 'max_ms',
+    "Llamadas": 'count',
+    "Media": 'mean_ms',
+}
+
+REFRESH_MS = 2000
+
+
+def create_diagnostics_tab(app):
+    """Build the Diagnostics tab showing app.query_profiler's per-statement timings."""
+    profiler = app.query_profiler
+    frame = ttk.Frame(app.notebook, padding=5)
+    app.notebook.add(frame, text="Diagnóstico")
+
+    toolbar = ttk.Frame(frame)
+    toolbar.pack(fill=tk.X, pady=(0, 5))
+    ttk.Label(toolbar, text="Ordenar por:").pack(side=tk.LEFT)
+    order_var = tk.StringVar(value="Tiempo total")
+    ttk.Combobox(
+        toolbar, textvariable=order_var, values=list(ORDER_OPTIONS), state='readonly', width=15
+    ).pack(side=tk.LEFT, padx=5)
+    auto_var = tk.BooleanVar(value=True)
+    ttk.Checkbutton(toolbar, text="Actualizar automáticamente", variable=auto_var).pack(side=tk.LEFT, padx=5)
+
+    summary_var = tk.StringVar()
+    ttk.Label(toolbar, textvariable=summary_var).pack(side=tk.RIGHT)
+
+    panes = ttk.PanedWindow(frame, orient=tk.VERTICAL)
+    panes.pack(fill=tk.BOTH, expand=True)
+
+    table_frame = ttk.Frame(panes)
+    tree = ttk.Treeview(table_frame, columns=[c[0] for c in COLUMNS], show='headings')
+    for name, heading, width in COLUMNS:
+        tree.heading(name, text=heading)
+        tree.column(name, width=width, stretch=(name == 'sql'), anchor=tk.W if name == 'sql' else tk.E)
+    scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=tree.yview)
+    tree.configure(yscrollcommand=scrollbar.set)
+    tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    tree.tag_configure('scan', foreground='#b00000')
+    panes.add(table_frame, weight=3)
+
+    detail = tk.Text(panes, height=10, wrap=tk.WORD, state=tk.DISABLED)
+    panes.add(detail, weight=1)
+
+    state = {'rows': {}}
+
+    def refresh():
+        rows = profiler.report(order_by=ORDER_OPTIONS[order_var.get()])
+        selected = tree.selection()
+        tree.delete(*tree.get_children())
+        state['rows'] = {}
+        for index, row in enumerate(rows):
+            iid = str(index)
+            state['rows'][iid] = row
+            values = [row[name] for name, _, _ in COLUMNS]
+            values[-1] = len(row['full_scans'])
+            tree.insert('', 'end', iid=iid, values=values, tags=('scan',) if row['full_scans'] else ())
+        if selected and tree.exists(selected[0]):
+            tree.selection_set(selected[0])
+        total_ms = sum(row['total_ms'] for row in rows)
+        scans = sum(1 for row in rows if row['full_scans'])
+        summary_var.set(f"{len(rows)} consultas, {total_ms:.0f} ms en total, {scans} con recorridos completos")
+
+    def show_detail(event=None):
+        selection = tree.selection()
+        row = state['rows'].get(selection[0]) if selection else None
+        detail.config(state=tk.NORMAL)
+        detail.delete('1.0', tk.END)
+        if row:
+            lines = [row['sample_query'] or row['sql'], '']
+            if row['sample_params']:
+                lines += [f"Parámetros: {row['sample_params']}", '']
+            if row['plan']:
+                lines.append("Plan de ejecución:")
+                lines += [f"  {step}" for step in row['plan']]
+            else:
+                lines.append("Plan de ejecución: (la consulta no superó el umbral)")
+            if row['full_scans']:
+                lines += ['', "Recorridos completos:"] + [f"  {step}" for step in row['full_scans']]
+            histogram = ', '.join(f"{bound}: {count}" for bound, count in row['histogram'].items() if count)
+            lines += ['', f"Histograma (ms): {histogram}"]
+            if row['last_error']:
+                lines += ['', f"Último error: {row['last_error']}"]
+            detail.insert('1.0', '\n'.join(lines))
+        detail.config(state=tk.DISABLED)
+
+    def export():
+        path = filedialog.asksaveasfilename(
+            defaultextension='.json',
+            filetypes=[("JSON", "*.json")],
+            initialfile='perfil_consultas.json',
+        )
+        if not path:
+            return
+        try:
+            count = profiler.export_json(path)
+            app.status_var.set(f"{count} consultas exportadas a {path}")
+        except Exception as e:
+            logger.error(f"Error exporting query profile: {str(e)}")
+            messagebox.showerror("Error", f"Error al exportar: {str(e)}")
+
+    def reset():
+        profiler.reset()
+        refresh()
+        show_detail()
+
+    def auto_refresh():
+        if not frame.winfo_exists():
+            return
+        if auto_var.get() and str(app.notebook.select()) == str(frame):
+            refresh()
+        frame.after(REFRESH_MS, auto_refresh)
+
+    buttons = ttk.Frame(frame)
+    buttons.pack(fill=tk.X, pady=(5, 0))
+    ttk.Button(buttons, text="Actualizar", command=refresh).pack(side=tk.LEFT)
+    ttk.Button(buttons, text="Reiniciar", command=reset).pack(side=tk.LEFT, padx=5)
+    ttk.Button(buttons, text="Exportar JSON...", command=export).pack(side=tk.LEFT)
+
+    tree.bind('<<TreeviewSelect>>', show_detail)
+    order_var.trace_add('write', lambda *args: refresh())
+    refresh()
+    frame.after(REFRESH_MS, auto_refresh)
+    return frame
@@ -0,0 +1,101 @@
+import logging
+import tkinter as tk
+from tkinter import ttk
+
+from database.search import build_search_query, is_installed, merge_results
+
+logger = logging.getLogger(__name__)
+
+ENTITY_LABELS = {
+    'articulo': "Artículo",
+    'agente': "Agente",
+    'proveedor': "Proveedor",
+    'numero_serie': "N° de serie",
+    'numero_patrimonio': "N° de patrimonio",
+}
+
+# Wait this long after the last keystroke before querying
+DEBOUNCE_MS = 120
+
+
+def create_global_search(app, parent):
+    """Build the search-as-you-type bar; queries run on app.query_executor."""
+    frame = ttk.Frame(parent)
+    frame.pack(fill=tk.X, pady=(0, 5))
+
+    ttk.Label(frame, text="Buscar:").pack(side=tk.LEFT)
+    app.global_search_var = tk.StringVar()
+    entry = ttk.Entry(frame, textvariable=app.global_search_var, width=60)
+    entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+
+    with app.db_manager.reader() as conn:
+        available = is_installed(conn)
+    if not available:
+        # Without the FTS tables every keystroke would fail; the search migration
+        # is retried at startup and installs them once there is something to index
+        entry.state(['disabled'])
+        ttk.Label(frame, text="(índice de búsqueda no disponible)").pack(side=tk.LEFT)
+        logger.warning("Search index not installed; global search disabled")
+
+    results_tree = ttk.Treeview(
+        parent, columns=('tipo', 'titulo', 'detalle'), show='headings', height=8
+    )
+    results_tree.heading('tipo', text="Tipo")
+    results_tree.heading('titulo', text="Nombre / Código")
+    results_tree.heading('detalle', text="Detalle")
+    results_tree.column('tipo', width=120, stretch=False)
+    results_tree.column('titulo', width=300)
+    results_tree.column('detalle', width=500)
+    app.global_search_tree = results_tree
+    app.selected_search_result = None
+
+    state = {'after_id': None, 'results': {}}
+
+    def show_results(rows):
+        results_tree.delete(*results_tree.get_children())
+        state['results'] = {}
+        rows = merge_results(rows)
+        for entidad, id_registro, id_articulo, titulo, detalle, _ in rows:
+            iid = f"{entidad}:{id_registro}"
+            state['results'][iid] = (entidad, id_registro, id_articulo)
+            results_tree.insert('', 'end', iid=iid, values=(ENTITY_LABELS.get(entidad, entidad), titulo, detalle))
+        if rows:
+            results_tree.pack(fill=tk.X, pady=(0, 5), before=app.notebook)
+        else:
+            results_tree.pack_forget()
+        app.status_var.set(f"{len(rows)} resultados")
+
+    def run_search():
+        state['after_id'] = None
+        sql, params = build_search_query(app.global_search_var.get())
+        if sql is None:
+            show_results([])
+            return
+        # The tag makes each keystroke supersede the previous, still running, search
+        app.query_executor.submit(
+            sql,
+            params,
+            callback=show_results,
+            error_callback=lambda e: logger.error(f"Search failed: {str(e)}"),
+            tag='global_search',
+        )
+
+    def on_change(*_):
+        if state['after_id'] is not None:
+            app.root.after_cancel(state['after_id'])
+        state['after_id'] = app.root.after(DEBOUNCE_MS, run_search)
+
+    def on_select(_event):
+        selection = results_tree.selection()
+        if not selection:
+            return
+        app.selected_search_result = state['results'].get(selection[0])
+        app.root.event_generate('<<GlobalSearchSelected>>')
+
+    def on_escape(_event):
+        app.global_search_var.set('')
+
+    app.global_search_var.trace_add('write', on_change)
+    results_tree.bind('<<TreeviewSelect>>', on_select)
+    entry.bind('<Escape>', on_escape)
+    return frame
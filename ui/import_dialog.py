@@ -0,0 +1,98 @@
+import logging
+import threading
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+from database.bulk_import import BulkImporter, IMPORT_SPECS
+
+logger = logging.getLogger(__name__)
+
+
+def open_import_dialog(app):
+    """Show the bulk import dialog; the import itself runs on a worker thread."""
+    dialog = tk.Toplevel(app.root)
+    dialog.title("Importación masiva")
+    dialog.transient(app.root)
+    dialog.resizable(False, False)
+
+    frame = ttk.Frame(dialog, padding=10)
+    frame.pack(fill=tk.BOTH, expand=True)
+
+    ttk.Label(frame, text="Tabla destino:").grid(row=0, column=0, sticky=tk.W, pady=2)
+    table_var = tk.StringVar(value='articulos')
+    ttk.Combobox(frame, textvariable=table_var, values=sorted(IMPORT_SPECS), state='readonly').grid(
+        row=0, column=1, sticky=tk.EW, pady=2
+    )
+
+    ttk.Label(frame, text="Archivo:").grid(row=1, column=0, sticky=tk.W, pady=2)
+    path_var = tk.StringVar()
+    ttk.Entry(frame, textvariable=path_var, width=50).grid(row=1, column=1, sticky=tk.EW, pady=2)
+
+    def browse():
+        path = filedialog.askopenfilename(
+            parent=dialog,
+            filetypes=[("CSV / Excel", "*.csv *.xlsx"), ("Todos los archivos", "*.*")],
+        )
+        if path:
+            path_var.set(path)
+
+    ttk.Button(frame, text="Examinar...", command=browse).grid(row=1, column=2, padx=5, pady=2)
+
+    defer_indexes_var = tk.BooleanVar(value=False)
+    defer_triggers_var = tk.BooleanVar(value=False)
+    ttk.Checkbutton(frame, text="Diferir índices secundarios", variable=defer_indexes_var).grid(
+        row=2, column=1, sticky=tk.W
+    )
+    ttk.Checkbutton(frame, text="Diferir triggers", variable=defer_triggers_var).grid(
+        row=3, column=1, sticky=tk.W
+    )
+
+    progress_var = tk.StringVar(value="")
+    ttk.Label(frame, textvariable=progress_var).grid(row=4, column=0, columnspan=3, sticky=tk.W, pady=5)
+
+    state = {'stats': None, 'done': False, 'error': None}
+
+    def poll():
+        if state['stats'] is not None:
+            progress_var.set(str(state['stats']))
+        if not state['done']:
+            dialog.after(200, poll)
+            return
+        start_button.config(state=tk.NORMAL)
+        if state['error']:
+            messagebox.showerror("Error", f"Error en la importación: {state['error']}", parent=dialog)
+        else:
+            app.status_var.set(f"Importación finalizada: {state['stats']}")
+            for lazy_view in getattr(app, 'lazy_views', {}).values():
+                lazy_view.reload()
+
+    def worker(importer, path):
+        try:
+            state['stats'] = importer.run(path)
+        except Exception as e:
+            logger.error(f"Bulk import failed: {str(e)}", exc_info=True)
+            state['error'] = str(e)
+        finally:
+            state['done'] = True
+
+    def start():
+        path = path_var.get().strip()
+        if not path:
+            messagebox.showwarning("Advertencia", "Seleccione un archivo para importar", parent=dialog)
+            return
+        importer = BulkImporter(
+            app.db_manager,
+            table_var.get(),
+            defer_indexes=defer_indexes_var.get(),
+            defer_triggers=defer_triggers_var.get(),
+            progress_callback=lambda stats: state.update(stats=stats),
+        )
+        state.update(stats=None, done=False, error=None)
+        start_button.config(state=tk.DISABLED)
+        progress_var.set("Importando...")
+        threading.Thread(target=worker, args=(importer, path), daemon=True).start()
+        dialog.after(200, poll)
+
+    start_button = ttk.Button(frame, text="Importar", command=start)
+    start_button.grid(row=5, column=1, sticky=tk.E, pady=5)
+    ttk.Button(frame, text="Cerrar", command=dialog.destroy).grid(row=5, column=2, pady=5)
@@ -0,0 +1,135 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LazyTreeview:
+    """Virtualize a ttk.Treeview over a KeysetDataSource.
+
+    Only a bounded window of rows is kept as Treeview items. Pages are appended
+    when the view approaches the bottom of the window and prepended when it
+    approaches the top, trimming the opposite end so the item count never grows
+    past ``window_size``.
+    """
+
+    def __init__(self, tree, data_source, page_size=100, window_size=500, on_count=None):
+        self.tree = tree
+        self.data_source = data_source
+        self.page_size = page_size
+        self.window_size = max(window_size, page_size * 2)
+        self.on_count = on_count
+        self.first_key = None
+        self.last_key = None
+        self.at_start = True
+        self.at_end = False
+        self._loading = False
+
+        # Keep forwarding scroll updates to whatever scrollbar the tab wired up
+        self._scroll_command = tree.cget('yscrollcommand')
+        tree.configure(yscrollcommand=self._on_scroll)
+
+    def reload(self):
+        """Clear the window and load the first page from the data source."""
+        self.tree.delete(*self.tree.get_children())
+        self.first_key = None
+        self.last_key = None
+        self.at_start = True
+        self.at_end = False
+        self.data_source.invalidate()
+        self._append(self.data_source.fetch_after(None, self.page_size))
+        if self.on_count:
+            self.on_count(self.data_source.count())
+
+    def total_count(self):
+        """Return the total number of rows behind the view (cached by the data source)."""
+        return self.data_source.count()
+
+    def loaded_count(self):
+        """Return how many rows are currently materialized as Treeview items."""
+        return len(self.tree.get_children())
+
+    def _on_scroll(self, first, last):
+        if self._scroll_command:
+            if callable(self._scroll_command):
+                self._scroll_command(first, last)
+            else:
+                self.tree.tk.call(self._scroll_command, first, last)
+
+        if self._loading:
+            return
+        self._loading = True
+        try:
+            if float(last) >= 0.9 and not self.at_end:
+                self._load_next()
+            elif float(first) <= 0.1 and not self.at_start:
+                self._load_previous()
+        except Exception as e:
+            logger.error(f"Error loading treeview page: {str(e)}")
+        finally:
+            self._loading = False
+
+    def _append(self, rows):
+        for row in rows:
+            key = self.data_source.key_of(row)
+            self.tree.insert('', 'end', iid=str(key), values=tuple(row))
+        if rows:
+            if self.first_key is None:
+                self.first_key = self.data_source.key_of(rows[0])
+            self.last_key = self.data_source.key_of(rows[-1])
+        if len(rows) < self.page_size:
+            self.at_end = True
+
+    def _load_next(self):
+        rows = self.data_source.fetch_after(self.last_key, self.page_size)
+        if not rows:
+            self.at_end = True
+            return
+        anchor = self.tree.get_children()[-1] if self.tree.get_children() else None
+        self._append(rows)
+        self._trim_top()
+        if anchor:
+            self.tree.see(anchor)
+
+    def _load_previous(self):
+        rows = self.data_source.fetch_before(self.first_key, self.page_size)
+        if not rows:
+            self.at_start = True
+            return
+        children = self.tree.get_children()
+        anchor = children[0] if children else None
+        for index, row in enumerate(rows):
+            key = self.data_source.key_of(row)
+            self.tree.insert('', index, iid=str(key), values=tuple(row))
+        self.first_key = self.data_source.key_of(rows[0])
+        if len(rows) < self.page_size:
+            self.at_start = True
+        self._trim_bottom()
+        if anchor:
+            self.tree.see(anchor)
+
+    def _trim_top(self):
+        children = self.tree.get_children()
+        excess = len(children) - self.window_size
+        if excess <= 0:
+            return
+        self.tree.delete(*children[:excess])
+        remaining = self.tree.get_children()
+        self.first_key = self._key_from_iid(remaining[0]) if remaining else None
+        self.at_start = False
+
+    def _trim_bottom(self):
+        children = self.tree.get_children()
+        excess = len(children) - self.window_size
+        if excess <= 0:
+            return
+        self.tree.delete(*children[-excess:])
+        remaining = self.tree.get_children()
+        self.last_key = self._key_from_iid(remaining[-1]) if remaining else None
+        self.at_end = False
+
+    def _key_from_iid(self, iid):
+        # Treeview values come back as strings; the iid keeps the original key text
+        try:
+            return int(iid)
+        except ValueError:
+            return iid